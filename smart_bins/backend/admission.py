@@ -0,0 +1,234 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from database import engine, DB_POOL_SIZE, DB_MAX_OVERFLOW
+from password_pool import PASSWORD_WORKERS, PASSWORD_MAX_QUEUE
+
+# Postgres SQLSTATE for "canceling statement due to statement timeout".
+QUERY_CANCELED = "57014"
+WAIT_SAMPLES = 2000
+# Worker threads for sync endpoints (anyio's default is 40); main.py applies it at startup.
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+# Primary connections left for background threads: map grid, outbox, sketches,
+# retrain, alert queue, UDP ingest and admin rebuild/evaluation jobs.
+BACKGROUND_DB_CONNECTIONS = int(os.getenv("BACKGROUND_DB_CONNECTIONS", "6"))
+# Each class's default share of the requests that can run at once, after the
+# auth class has taken one slot per password worker.
+CLASS_SHARES = {"ingest": 0.5, "interactive": 0.35, "heavy": 0.15}
+
+_current: ContextVar["RouteClass | None"] = ContextVar("route_class", default=None)
+
+
+def _env(name: str, key: str, default):
+    return type(default)(os.getenv(f"ADMISSION_{name.upper()}_{key}", str(default)))
+
+
+class RouteClass:
+    """A concurrency limit with a bounded wait queue for one kind of request.
+
+    Up to `limit` requests run at once; up to `max_queue` more wait at most
+    `queue_timeout` seconds for a slot. Anything beyond that is shed with a
+    503 and Retry-After. Database statements issued while serving the
+    request get a `statement_timeout_ms` budget on PostgreSQL.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float,
+                 statement_timeout_ms: int, retry_after: int):
+        self.name = name
+        self.limit = _env(name, "CONCURRENCY", limit)
+        self.max_queue = _env(name, "MAX_QUEUE", max_queue)
+        self.queue_timeout = _env(name, "QUEUE_TIMEOUT", float(queue_timeout))
+        self.statement_timeout_ms = _env(name, "STATEMENT_TIMEOUT_MS", statement_timeout_ms)
+        self.retry_after = _env(name, "RETRY_AFTER", retry_after)
+        self.resize(self.limit)
+        self.running = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+        self.queue_timeouts = 0
+        self.statement_timeouts = 0
+        self.total_run = 0.0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+
+    def resize(self, limit: int):
+        """Set the limit; only before the first request, as running requests hold slots of the old one."""
+        self.limit = limit
+        self._slots = asyncio.Semaphore(limit)
+
+    async def acquire(self) -> bool:
+        if self.running < self.limit and self.queued == 0:
+            await self._slots.acquire()
+        else:
+            if self.queued >= self.max_queue:
+                self.shed += 1
+                return False
+            self.queued += 1
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.queue_timeouts += 1
+                self.shed += 1
+                return False
+            finally:
+                self.queued -= 1
+            self.waits.append(time.perf_counter() - started)
+        self.running += 1
+        self.admitted += 1
+        return True
+
+    def release(self, seconds: float):
+        self.running -= 1
+        self.total_run += seconds
+        self._slots.release()
+
+    def metrics(self) -> dict:
+        waits = sorted(self.waits)
+        pct = lambda p: round(waits[min(len(waits) - 1, int(len(waits) * p))] * 1000, 2) if waits else 0.0
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "queue_timeout_s": self.queue_timeout,
+            "statement_timeout_ms": self.statement_timeout_ms,
+            "running": self.running,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "queue_timeouts": self.queue_timeouts,
+            "statement_timeouts": self.statement_timeouts,
+            "queued_requests_waited": len(waits),
+            "wait_p50_ms": pct(0.50),
+            "wait_p99_ms": pct(0.99),
+            "avg_run_ms": round(self.total_run / self.admitted * 1000, 2) if self.admitted else 0.0,
+        }
+
+
+class AdmissionControl:
+    # (method or None for any, path prefix, class name); first match wins.
+    RULES = [
+        ("POST", "/readings", "ingest"),
+        ("POST", "/auth/login", "auth"),
+        ("POST", "/auth/register", "auth"),
+        (None, "/analytics", "heavy"),
+        (None, "/ml/hotspots", "heavy"),
+        (None, "/ml/patterns", "heavy"),
+        (None, "/ml/predictions", "heavy"),
+        (None, "/ml/plan", "heavy"),
+        (None, "/ml/eval", "heavy"),
+        (None, "/bins/import", "heavy"),
+        (None, "/bins/export", "heavy"),
+        (None, "/routing/matrix", "heavy"),
+        ("GET", "/readings", "heavy"),
+    ]
+
+    def __init__(self, capacity: int | None = None):
+        self.capacity = capacity or request_capacity()
+        # Login and register wait on the bcrypt pool, not a worker thread, but
+        # keep their session's connection meanwhile; one slot per password
+        # worker keeps that pool busy and its queue bounds the wait.
+        auth_limit = min(PASSWORD_WORKERS, self.capacity - len(CLASS_SHARES))
+        shared = self.capacity - auth_limit
+        share = lambda name: max(1, int(shared * CLASS_SHARES[name]))
+        self.classes = {
+            "ingest": RouteClass("ingest", limit=share("ingest"), max_queue=1024, queue_timeout=10,
+                                 statement_timeout_ms=5000, retry_after=1),
+            "interactive": RouteClass("interactive", limit=share("interactive"), max_queue=128, queue_timeout=5,
+                                      statement_timeout_ms=5000, retry_after=2),
+            "heavy": RouteClass("heavy", limit=share("heavy"), max_queue=8, queue_timeout=2,
+                                statement_timeout_ms=30000, retry_after=10),
+            "auth": RouteClass("auth", limit=auth_limit, max_queue=PASSWORD_MAX_QUEUE, queue_timeout=10,
+                               statement_timeout_ms=5000, retry_after=1),
+        }
+        # Admitting more than can hold a thread and a connection only moves the
+        # wait into the threadpool or the connection pool, where it is unbounded
+        # and never shed, so overrides that add up to more are scaled down.
+        total = sum(c.limit for c in self.classes.values())
+        if total > self.capacity:
+            print(f"Admission limits add up to {total} but only {self.capacity} requests can hold a worker "
+                  f"thread and a database connection at once; scaling them down")
+            for c in self.classes.values():
+                c.resize(max(1, c.limit * self.capacity // total))
+
+    def classify(self, method: str, path: str) -> RouteClass:
+        for rule_method, prefix, name in self.RULES:
+            if (rule_method is None or rule_method == method) and path.startswith(prefix):
+                return self.classes[name]
+        return self.classes["interactive"]
+
+    def metrics(self) -> dict:
+        return {name: c.metrics() for name, c in self.classes.items()}
+
+
+def request_capacity() -> int:
+    """Requests that can each hold a worker thread and a primary connection at the same time."""
+    capacity = THREADPOOL_SIZE
+    if isinstance(engine.pool, QueuePool):
+        capacity = min(capacity, DB_POOL_SIZE + DB_MAX_OVERFLOW - BACKGROUND_DB_CONNECTIONS)
+    return max(capacity, len(CLASS_SHARES) + 1)
+
+
+admission = AdmissionControl()
+
+
+@event.listens_for(Session, "after_begin")
+def _statement_timeout(session, transaction, connection):
+    route_class = _current.get()
+    if route_class is not None and route_class.statement_timeout_ms and connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(route_class.statement_timeout_ms)}")
+
+
+async def _unavailable(send, detail: str, retry_after: int):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        route_class = admission.classify(scope["method"], scope["path"])
+        if not await route_class.acquire():
+            return await _unavailable(send, f"Server busy ({route_class.name}), retry shortly", route_class.retry_after)
+
+        started_response = False
+
+        async def send_wrapper(message):
+            nonlocal started_response
+            if message["type"] == "http.response.start":
+                started_response = True
+            await send(message)
+
+        token = _current.set(route_class)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except OperationalError as e:
+            if getattr(e.orig, "pgcode", None) != QUERY_CANCELED or started_response:
+                raise
+            route_class.statement_timeouts += 1
+            await _unavailable(send, "Query took too long, retry later", route_class.retry_after)
+        finally:
+            _current.reset(token)
+            route_class.release(time.perf_counter() - started)
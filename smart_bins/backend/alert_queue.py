@@ -0,0 +1,288 @@
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timezone
+
+from forecaster import hours_to_full, calculate_bin_importance_score
+from model_registry import registry
+from models import DEFAULT_ZONE
+
+SYNC_INTERVAL_SECONDS = 5
+# Rebuild a heap once stale entries outnumber live ones by this factor.
+COMPACT_FACTOR = 2
+
+
+def score_bin(bin_id: str, fill: int | None, now: float | None = None) -> float:
+    """Importance score from the bin's fill and its stored model, as /ml/predict would rate it."""
+    fill = fill or 0
+    entry = registry.get(bin_id)
+    slope = float(entry["slope"]) if entry is not None else 0.0
+    hours_left, status = None, "slow_or_no_fill"
+    if fill >= 99:
+        hours_left, status = 0.0, "already_full"
+    elif entry is not None and slope > 0.05:
+        hours_left = hours_to_full(entry, fill, now or time.time())
+        if hours_left is not None:
+            status = "predicting" if hours_left > 0 else "already_full"
+    return round(calculate_bin_importance_score(fill, hours_left, status, slope), 3)
+
+
+class AlertQueue:
+    """Open alerts, and each worker's assigned tasks, ordered by bin importance.
+
+    Heaps hold (-score, seq, id) with lazy deletion: a rescored or removed
+    item just gets a new seq (or none), and stale entries are dropped when
+    they reach the top. Alerts are pushed to a fleet-wide heap and to their
+    zone's heap, so a zone's page does not skip over other zones' alerts.
+    Pushes and "next" are O(log n); a top-K page pops and restores
+    offset + K entries. Each process keeps its own queue, kept current by
+    the ingest and task routes and reconciled with the database every
+    SYNC_INTERVAL_SECONDS; scores are persisted to alerts.priority.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._scores = {}
+        self._alerts = {}
+        self._alert_heap = []
+        self._zone_heaps = {}
+        self._bin_alerts = {}
+        self._tasks = {}
+        self._task_heaps = {}
+        self._bin_tasks = {}
+        self._dirty = set()
+        self._synced_at = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def __len__(self):
+        return len(self._alerts)
+
+    def count(self, zone: str | None = None) -> int:
+        if zone is None:
+            return len(self._alerts)
+        with self._lock:
+            return sum(1 for entry in self._alerts.values() if entry[2] == zone)
+
+    def _push_alert(self, alert_id: int):
+        entry = self._alerts[alert_id]
+        entry[1] = next(self._seq)
+        item = (-self._scores.get(entry[0], 0.0), entry[1], alert_id)
+        heapq.heappush(self._alert_heap, item)
+        zone_heap = self._zone_heaps.setdefault(entry[2], [])
+        heapq.heappush(zone_heap, item)
+        self._dirty.add(alert_id)
+        if len(self._alert_heap) > COMPACT_FACTOR * len(self._alerts) + 64:
+            self._alert_heap = [e for e in self._alert_heap if self._alert_valid(e)]
+            heapq.heapify(self._alert_heap)
+        if len(zone_heap) > COMPACT_FACTOR * len(self._alerts) + 64:
+            zone_heap[:] = [e for e in zone_heap if self._alert_valid(e)]
+            heapq.heapify(zone_heap)
+
+    def _push_task(self, task_id: int):
+        entry = self._tasks[task_id]
+        entry[3] = next(self._seq)
+        heap = self._task_heaps.setdefault(entry[0], [])
+        heapq.heappush(heap, (-self._scores.get(entry[2], 0.0), entry[3], task_id))
+        if len(heap) > COMPACT_FACTOR * len(self._tasks) + 64:
+            heap[:] = [e for e in heap if self._task_valid(e)]
+            heapq.heapify(heap)
+
+    def _alert_valid(self, e) -> bool:
+        entry = self._alerts.get(e[2])
+        return entry is not None and entry[1] == e[1]
+
+    def _task_valid(self, e) -> bool:
+        entry = self._tasks.get(e[2])
+        return entry is not None and entry[3] == e[1]
+
+    def add_alert(self, alert_id: int, bin_id: str, fill: int | None, zone: str = DEFAULT_ZONE):
+        with self._lock:
+            if alert_id in self._alerts:
+                return
+            if bin_id not in self._scores:
+                self._scores[bin_id] = score_bin(bin_id, fill)
+            self._alerts[alert_id] = [bin_id, None, zone]
+            self._bin_alerts.setdefault(bin_id, set()).add(alert_id)
+            self._push_alert(alert_id)
+
+    def remove_alert(self, alert_id: int):
+        with self._lock:
+            entry = self._alerts.pop(alert_id, None)
+            self._dirty.discard(alert_id)
+            if entry is not None:
+                self._unlink(self._bin_alerts, entry[0], alert_id)
+
+    def add_task(self, task_id: int, worker_id: int, alert_id: int, bin_id: str, fill: int | None = None):
+        with self._lock:
+            if task_id in self._tasks:
+                return
+            if bin_id not in self._scores:
+                self._scores[bin_id] = score_bin(bin_id, fill)
+            self._tasks[task_id] = [worker_id, alert_id, bin_id, None]
+            self._bin_tasks.setdefault(bin_id, set()).add(task_id)
+            self._push_task(task_id)
+
+    def remove_task(self, task_id: int):
+        with self._lock:
+            entry = self._tasks.pop(task_id, None)
+            if entry is not None:
+                self._unlink(self._bin_tasks, entry[2], task_id)
+
+    def _unlink(self, index: dict, bin_id: str, item_id: int):
+        ids = index.get(bin_id)
+        if ids is not None:
+            ids.discard(item_id)
+            if not ids:
+                del index[bin_id]
+        if bin_id not in self._bin_alerts and bin_id not in self._bin_tasks:
+            self._scores.pop(bin_id, None)
+
+    def update_bin(self, bin_id: str, fill: int | None):
+        """Rescore a bin after a reading; a no-op unless it has open alerts or tasks."""
+        if bin_id not in self._bin_alerts and bin_id not in self._bin_tasks:
+            return
+        score = score_bin(bin_id, fill)
+        with self._lock:
+            if self._scores.get(bin_id) == score or bin_id not in self._scores:
+                return
+            self._scores[bin_id] = score
+            for alert_id in self._bin_alerts.get(bin_id, ()):
+                self._push_alert(alert_id)
+            for task_id in self._bin_tasks.get(bin_id, ()):
+                self._push_task(task_id)
+
+    def _take(self, heap: list, valid, n: int) -> list:
+        out = []
+        while heap and len(out) < n:
+            e = heapq.heappop(heap)
+            if valid(e):
+                out.append(e)
+        for e in out:
+            heapq.heappush(heap, e)
+        return out
+
+    def top_alerts(self, limit: int = 50, offset: int = 0, zone: str | None = None) -> list[dict]:
+        with self._lock:
+            heap = self._alert_heap if zone is None else self._zone_heaps.get(zone, [])
+            entries = self._take(heap, self._alert_valid, offset + limit)[offset:]
+            return [{"alert_id": a, "bin_id": self._alerts[a][0], "zone": self._alerts[a][2], "score": -s}
+                    for s, _, a in entries]
+
+    def top_tasks(self, worker_id: int, limit: int = 50, offset: int = 0) -> list[dict]:
+        with self._lock:
+            heap = self._task_heaps.get(worker_id, [])
+            entries = self._take(heap, self._task_valid, offset + limit)[offset:]
+            return [{"task_id": t, "alert_id": self._tasks[t][1], "bin_id": self._tasks[t][2], "score": -s}
+                    for s, _, t in entries]
+
+    def next_task(self, worker_id: int) -> dict | None:
+        with self._lock:
+            heap = self._task_heaps.get(worker_id)
+            while heap and not self._task_valid(heap[0]):
+                heapq.heappop(heap)
+            if not heap:
+                return None
+            s, _, t = heap[0]
+            return {"task_id": t, "alert_id": self._tasks[t][1], "bin_id": self._tasks[t][2], "score": -s}
+
+    def load(self, db):
+        from models import Alert, Bin, Task
+
+        synced_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        alerts = db.query(Alert.id, Alert.bin_id, Bin.current_fill_pct, Bin.zone).join(
+            Bin, Bin.bin_id == Alert.bin_id
+        ).filter(Alert.is_resolved == False).all()
+        tasks = db.query(Task.id, Task.worker_id, Task.alert_id, Alert.bin_id, Bin.current_fill_pct).join(
+            Alert, Alert.id == Task.alert_id
+        ).join(Bin, Bin.bin_id == Alert.bin_id).filter(Task.status == "assigned").all()
+
+        with self._lock:
+            self._scores, self._alerts, self._alert_heap, self._bin_alerts = {}, {}, [], {}
+            self._zone_heaps = {}
+            self._tasks, self._task_heaps, self._bin_tasks = {}, {}, {}
+        for alert_id, bin_id, fill, zone in alerts:
+            self.add_alert(alert_id, bin_id, fill, zone)
+        for task_id, worker_id, alert_id, bin_id, fill in tasks:
+            self.add_task(task_id, worker_id, alert_id, bin_id, fill)
+        self._synced_at = synced_at
+
+    def sync(self, db):
+        from models import Alert, Bin, Task
+
+        if self._synced_at is None:
+            self.load(db)
+        else:
+            since = self._synced_at
+            synced_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
+            for alert_id, bin_id, resolved, fill, zone in db.query(
+                Alert.id, Alert.bin_id, Alert.is_resolved, Bin.current_fill_pct, Bin.zone
+            ).join(Bin, Bin.bin_id == Alert.bin_id).filter(
+                (Alert.created_at >= since) | (Alert.resolved_at >= since)
+            ).all():
+                if resolved:
+                    self.remove_alert(alert_id)
+                else:
+                    self.add_alert(alert_id, bin_id, fill, zone)
+
+            for task_id, worker_id, alert_id, status, bin_id, fill in db.query(
+                Task.id, Task.worker_id, Task.alert_id, Task.status, Alert.bin_id, Bin.current_fill_pct
+            ).join(Alert, Alert.id == Task.alert_id).join(Bin, Bin.bin_id == Alert.bin_id).filter(
+                (Task.created_at >= since) | (Task.completed_at >= since)
+            ).all():
+                if status == "assigned":
+                    self.add_task(task_id, worker_id, alert_id, bin_id, fill)
+                else:
+                    self.remove_task(task_id)
+
+            for bin_id, fill in db.query(Bin.bin_id, Bin.current_fill_pct).filter(Bin.updated_at >= since).all():
+                self.update_bin(bin_id, fill)
+
+            open_alerts = db.query(Alert.id).filter(Alert.is_resolved == False).count()
+            if open_alerts != len(self._alerts):
+                self.load(db)
+            else:
+                self._synced_at = synced_at
+        self.persist(db)
+
+    def persist(self, db):
+        from sqlalchemy import update
+        from models import Alert
+
+        with self._lock:
+            rows = [{"id": a, "priority": self._scores.get(self._alerts[a][0], 0.0)}
+                    for a in self._dirty if a in self._alerts]
+            self._dirty.clear()
+        if rows:
+            db.execute(update(Alert), rows)
+            db.commit()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="alert-queue-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        from database import SessionLocal
+
+        while True:
+            db = SessionLocal()
+            try:
+                self.sync(db)
+            except Exception as e:
+                db.rollback()
+                print("Alert queue sync failed:", e)
+            finally:
+                db.close()
+            if self._stop.wait(SYNC_INTERVAL_SECONDS):
+                return
+
+
+alert_queue = AlertQueue()
@@ -14,6 +14,8 @@ load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
+ACCESS_TOKEN_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", "15"))
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "7"))
 
 oauth2_scheme = HTTPBearer()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -24,12 +26,34 @@ def hash_password(password: str):
 def verify_password(plain: str, hashed: str):
     return pwd_context.verify(plain, hashed)
 
-def create_token(data: dict):
-    expire = datetime.now(timezone.utc) + timedelta(hours=12)
+def create_token(data: dict, token_type: str = "access"):
+    if token_type == "refresh":
+        expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_DAYS)
+    else:
+        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_MINUTES)
     to_encode = data.copy()
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": token_type})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def issue_tokens(user: User):
+    claims = {"user_id": user.id, "role": user.role, "zone": user.zone}
+    return {
+        "token": create_token(claims),
+        "refresh_token": create_token({"user_id": user.id}, "refresh"),
+        "expires_in": ACCESS_TOKEN_MINUTES * 60,
+        "role": user.role,
+        "zone": user.zone,
+    }
+
+def decode_refresh_token(token: str) -> int:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    if payload.get("type") != "refresh" or payload.get("user_id") is None:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    return payload["user_id"]
+
 def get_db():
     db = SessionLocal()
     try:
@@ -37,17 +61,19 @@ def get_db():
     finally:
         db.close()
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(oauth2_scheme),
-                     db: Session = Depends(get_db)):
-    token = credentials.credentials
-
+def decode_access_token(token: str) -> dict:
+    """Claims of a valid access token; refresh and untyped tokens are refused."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("user_id")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("user_id") is None or payload.get("type") != "access":
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(oauth2_scheme),
+                     db: Session = Depends(get_db)):
+    user_id = decode_access_token(credentials.credentials)["user_id"]
 
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
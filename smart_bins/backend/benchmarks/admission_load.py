@@ -0,0 +1,107 @@
+import argparse
+import random
+import statistics
+import threading
+import time
+
+import requests
+
+BASE_URL = "http://127.0.0.1:8000"
+HEAVY_PATHS = ["/analytics/average-fill-time", "/ml/hotspots", "/ml/patterns", "/analytics/trend-30days"]
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def report(name, latencies, errors, elapsed, shed=0):
+    print(f"{name:8s} n={len(latencies):6d} err={errors:4d} shed={shed:5d} "
+          f"rps={len(latencies) / elapsed:8.1f} "
+          f"p50={percentile(latencies, 0.50) * 1000:7.1f}ms "
+          f"p99={percentile(latencies, 0.99) * 1000:7.1f}ms "
+          f"mean={statistics.mean(latencies) * 1000 if latencies else float('nan'):7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reading ingest latency before and during an analytics storm against a running backend.")
+    parser.add_argument("--url", default=BASE_URL)
+    parser.add_argument("--seconds", type=float, default=20, help="length of each phase")
+    parser.add_argument("--ingest-concurrency", type=int, default=8)
+    parser.add_argument("--storm-concurrency", type=int, default=64)
+    parser.add_argument("--token", help="admin access token, to print per-class admission metrics")
+    args = parser.parse_args()
+
+    bins = requests.get(f"{args.url}/bins/", timeout=10).json()
+    if not bins:
+        print("No bins found; ingest traffic needs at least one bin")
+        return
+
+    stop = threading.Event()
+    storming = threading.Event()
+    lock = threading.Lock()
+    ingest_lat = {False: [], True: []}
+    heavy_lat = []
+    counts = {"ingest_err": 0, "heavy_err": 0, "heavy_shed": 0}
+
+    def ingest_loop():
+        session = requests.Session()
+        while not stop.is_set():
+            b = random.choice(bins)
+            phase = storming.is_set()
+            start = time.perf_counter()
+            r = session.post(f"{args.url}/readings/", json={"bin_id": b["bin_id"], "fill_pct": random.randint(0, 100)}, timeout=60)
+            with lock:
+                if r.status_code == 200:
+                    ingest_lat[phase].append(time.perf_counter() - start)
+                else:
+                    counts["ingest_err"] += 1
+
+    def storm_loop():
+        session = requests.Session()
+        while not stop.is_set():
+            start = time.perf_counter()
+            r = session.get(f"{args.url}{random.choice(HEAVY_PATHS)}", timeout=120)
+            backoff = 0.0
+            with lock:
+                if r.status_code == 200:
+                    heavy_lat.append(time.perf_counter() - start)
+                elif r.status_code == 503:
+                    counts["heavy_shed"] += 1
+                    # a storm ignores most of Retry-After; that is the point of the test
+                    backoff = min(float(r.headers.get("Retry-After", "1")), 0.5)
+                else:
+                    counts["heavy_err"] += 1
+            if backoff:
+                stop.wait(backoff)
+
+    ingest_threads = [threading.Thread(target=ingest_loop, daemon=True) for _ in range(args.ingest_concurrency)]
+    for t in ingest_threads:
+        t.start()
+    time.sleep(args.seconds)
+
+    storming.set()
+    storm_threads = [threading.Thread(target=storm_loop, daemon=True) for _ in range(args.storm_concurrency)]
+    for t in storm_threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in ingest_threads + storm_threads:
+        t.join()
+
+    report("ingest0", ingest_lat[False], 0, args.seconds)
+    report("ingest", ingest_lat[True], counts["ingest_err"], args.seconds)
+    report("heavy", heavy_lat, counts["heavy_err"], args.seconds, counts["heavy_shed"])
+    p99_before, p99_during = percentile(ingest_lat[False], 0.99), percentile(ingest_lat[True], 0.99)
+    print(f"ingest p99 during storm: {p99_during / p99_before:.2f}x baseline")
+    if args.token:
+        metrics = requests.get(f"{args.url}/dashboard/admin/admission",
+                               headers={"Authorization": f"Bearer {args.token}"}, timeout=5).json()
+        for name, m in metrics.items():
+            print(f"{name:12s} {m}")
+
+
+if __name__ == "__main__":
+    main()
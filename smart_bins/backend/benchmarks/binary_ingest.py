@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from binary_ingest import encode_frame, decode_frame, to_readings, RECORD_DTYPE, FLAG_ZLIB
+
+
+def make_records(n, bins):
+    rng = np.random.default_rng(0)
+    records = np.zeros(n, dtype=RECORD_DTYPE)
+    records["bin"] = rng.integers(1, bins + 1, n)
+    records["ts"] = int(time.time()) - rng.integers(0, 3600, n)
+    records["fill"] = rng.integers(0, 101, n)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure binary frame size and decode throughput against JSON.")
+    parser.add_argument("--records", type=int, default=10_000, help="records per frame")
+    parser.add_argument("--bins", type=int, default=10_000)
+    parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+
+    records = make_records(args.records, args.bins)
+    frame = encode_frame(records)
+    packed = encode_frame(records, flags=FLAG_ZLIB)
+    as_json = json.dumps([{"bin_id": f"bin{b:06d}", "fill_pct": int(f)} for b, f in zip(records["bin"], records["fill"])]).encode()
+    names = {i: f"bin{i:06d}" for i in range(1, args.bins + 1)}
+
+    print(f"{args.records} readings per frame")
+    print(f"  binary frame {len(frame):>10} bytes  ({len(frame) / args.records:.1f} B/reading)")
+    print(f"  zlib frame   {len(packed):>10} bytes  ({len(packed) / args.records:.1f} B/reading, random fills compress worst)")
+    print(f"  JSON body    {len(as_json):>10} bytes  ({len(as_json) / args.records:.1f} B/reading)")
+
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        decode_frame(frame)
+    elapsed = time.perf_counter() - start
+    print(f"  verify+decode      {args.frames * args.records / elapsed / 1e6:8.2f} M readings/sec")
+
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        decode_frame(packed)
+    elapsed = time.perf_counter() - start
+    print(f"  verify+inflate     {args.frames * args.records / elapsed / 1e6:8.2f} M readings/sec")
+
+    start = time.perf_counter()
+    for _ in range(args.frames // 10 or 1):
+        _, _, decoded = decode_frame(frame)
+        to_readings(decoded, names)
+    elapsed = time.perf_counter() - start
+    print(f"  decode+map to rows {(args.frames // 10 or 1) * args.records / elapsed / 1e6:8.2f} M readings/sec")
+
+    start = time.perf_counter()
+    for _ in range(args.frames // 10 or 1):
+        json.loads(as_json)
+    elapsed = time.perf_counter() - start
+    print(f"  JSON parse         {(args.frames // 10 or 1) * args.records / elapsed / 1e6:8.2f} M readings/sec")
+
+
+if __name__ == "__main__":
+    main()
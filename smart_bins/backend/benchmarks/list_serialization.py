@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from schemas import BinOut
+
+KEYS = ["id", "bin_id", "latitude", "longitude", "capacity_litres", "current_fill_pct", "status", "created_at"]
+
+
+class Row:
+    __slots__ = KEYS
+
+    def __init__(self, values):
+        for k, v in zip(KEYS, values):
+            setattr(self, k, v)
+
+
+def make_rows(n):
+    base = datetime(2025, 1, 1)
+    return [
+        (i, f"bin{i:06d}", 17.0 + i * 1e-5, 78.0 + i * 1e-5, 240, i % 101,
+         "full" if i % 101 > 80 else "not full", base + timedelta(minutes=i))
+        for i in range(n)
+    ]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(fn())
+        best = min(best, time.perf_counter() - start)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare list response serialization paths.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tuples = make_rows(args.rows)
+    objects = [Row(t) for t in tuples]
+
+    def orm_pydantic_stdlib():
+        validated = [BinOut.model_validate(o, from_attributes=True) for o in objects]
+        return json.dumps(jsonable_encoder(validated)).encode()
+
+    def tuples_orjson():
+        return orjson.dumps([dict(zip(KEYS, t)) for t in tuples])
+
+    print(f"{args.rows} rows, best of {args.repeat}")
+    baseline = None
+    for name, fn in [("ORM objects + Pydantic + json", orm_pydantic_stdlib), ("column tuples + orjson", tuples_orjson)]:
+        seconds, size = timed(fn, args.repeat)
+        baseline = baseline or seconds
+        print(f"  {name:32s} {seconds * 1000:9.1f} ms  {size / 1e6:6.1f} MB  {baseline / seconds:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
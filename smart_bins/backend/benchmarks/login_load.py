@@ -0,0 +1,96 @@
+import argparse
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_URL = "http://127.0.0.1:8000"
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def report(name, latencies, errors, elapsed):
+    print(f"{name:8s} n={len(latencies):6d} err={errors:4d} "
+          f"rps={len(latencies) / elapsed:8.1f} "
+          f"p50={percentile(latencies, 0.50) * 1000:7.1f}ms "
+          f"p99={percentile(latencies, 0.99) * 1000:7.1f}ms "
+          f"mean={statistics.mean(latencies) * 1000 if latencies else float('nan'):7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent logins alongside reading ingest against a running backend.")
+    parser.add_argument("--url", default=BASE_URL)
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--login-concurrency", type=int, default=100)
+    parser.add_argument("--ingest-concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    bins = requests.get(f"{args.url}/bins/", timeout=10).json()
+    if not bins:
+        print("No bins found; ingest traffic needs at least one bin")
+        return
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    login_lat, ingest_lat = [], []
+    errors = {"login": 0, "ingest": 0}
+
+    def login_once(_):
+        start = time.perf_counter()
+        r = requests.post(f"{args.url}/auth/login", json={"username": args.username, "password": args.password}, timeout=60)
+        with lock:
+            if r.status_code == 200:
+                login_lat.append(time.perf_counter() - start)
+            else:
+                errors["login"] += 1
+
+    def ingest_loop():
+        session = requests.Session()
+        while not stop.is_set():
+            b = random.choice(bins)
+            start = time.perf_counter()
+            r = session.post(f"{args.url}/readings/", json={"bin_id": b["bin_id"], "fill_pct": random.randint(0, 100)}, timeout=30)
+            with lock:
+                if r.status_code == 200:
+                    ingest_lat.append(time.perf_counter() - start)
+                else:
+                    errors["ingest"] += 1
+
+    ingest_threads = [threading.Thread(target=ingest_loop, daemon=True) for _ in range(args.ingest_concurrency)]
+    for t in ingest_threads:
+        t.start()
+
+    time.sleep(2)
+    with lock:
+        baseline = list(ingest_lat)
+        ingest_lat.clear()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.login_concurrency) as pool:
+        list(pool.map(login_once, range(args.logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for t in ingest_threads:
+        t.join()
+
+    report("ingest0", baseline, 0, 2.0)
+    report("login", login_lat, errors["login"], elapsed)
+    report("ingest", ingest_lat, errors["ingest"], elapsed)
+    try:
+        print("password pool:", requests.get(f"{args.url}/auth/metrics", timeout=5).json())
+    except Exception:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from planner import simulate_overflow, recommend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the Monte Carlo pickup planner on synthetic bins.")
+    parser.add_argument("--bins", type=int, default=10_000)
+    parser.add_argument("--scenarios", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    current = rng.uniform(0, 90, args.bins)
+    mean = rng.uniform(2, 30, args.bins)
+    std = mean * rng.uniform(0.1, 0.8, args.bins)
+
+    start = time.perf_counter()
+    overflow = simulate_overflow(current, mean, std, args.days, args.scenarios, seed=0)
+    simulated = time.perf_counter()
+    best, _ = recommend(overflow, overflow_cost=10.0, pickup_cost=1.0)
+    done = time.perf_counter()
+
+    cells = args.bins * args.scenarios * args.days
+    print(f"{args.bins} bins x {args.scenarios} scenarios x {args.days} days = {cells / 1e6:.0f}M draws")
+    print(f"  simulate  {simulated - start:6.2f} s  ({cells / (simulated - start) / 1e6:.0f}M draws/sec)")
+    print(f"  recommend {(done - simulated) * 1000:6.1f} ms")
+    days, counts = np.unique(best, return_counts=True)
+    print("  pickups by day:", {("none" if d < 0 else int(d)): int(c) for d, c in zip(days, counts)})
+
+
+if __name__ == "__main__":
+    main()
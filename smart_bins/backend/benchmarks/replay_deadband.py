@@ -0,0 +1,95 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage_policy import apply_policy
+
+
+def simulate(bins: int, days: int, interval_seconds: int):
+    """Replay the generate_readings.py stream with a pickup whenever a bin
+    has sat at 100% for a few hours."""
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    steps = days * 86400 // interval_seconds
+    random.seed(0)
+    for b in range(bins):
+        fill, full_since = 0, None
+        for i in range(steps):
+            ts = start + timedelta(seconds=i * interval_seconds)
+            if fill >= 100:
+                full_since = full_since or ts
+                if ts - full_since > timedelta(hours=4):
+                    fill, full_since = 0, None
+            else:
+                fill = min(100, fill + random.choices([0, 1, 2, 3, 4, 5, 6, 7], weights=[5, 20, 15, 15, 15, 10, 10, 10])[0] // 3)
+            yield f"bin{b:04d}", ts, fill
+
+
+def from_db(limit: int):
+    from database import SessionLocal
+    from models import FillHistory
+
+    db = SessionLocal()
+    try:
+        q = db.query(FillHistory.bin_id, FillHistory.ts, FillHistory.fill_pct).order_by(FillHistory.bin_id, FillHistory.ts)
+        for bin_id, ts, fill in q.limit(limit).yield_per(10_000):
+            yield bin_id, ts, fill
+    finally:
+        db.close()
+
+
+def average_fill_time(rows):
+    by = {}
+    for bin_id, ts, fill in rows:
+        by.setdefault(bin_id, []).append((ts, fill))
+    durations = []
+    for recs in by.values():
+        start = None
+        for ts, fill in recs:
+            if start is None and fill <= 5:
+                start = ts
+            elif start is not None and fill >= 80:
+                durations.append((ts - start).total_seconds() / 3600)
+                start = None
+    return sum(durations) / len(durations) if durations else None
+
+
+def timed(fn, rows):
+    start = time.perf_counter()
+    value = fn(rows)
+    return value, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a reading stream through the history storage policy.")
+    parser.add_argument("--bins", type=int, default=200)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--interval", type=int, default=60, help="seconds between simulated readings")
+    parser.add_argument("--from-db", type=int, metavar="LIMIT", help="replay up to LIMIT stored rows instead")
+    args = parser.parse_args()
+
+    stream = from_db(args.from_db) if args.from_db else simulate(args.bins, args.days, args.interval)
+    full, kept = [], []
+    state = {}
+    for bin_id, ts, fill in stream:
+        full.append((bin_id, ts, fill))
+        bin_state = state.setdefault(bin_id, SimpleNamespace(last_persisted_fill=None, last_persisted_at=None))
+        kept.extend((bin_id, t, f) for t, f in apply_policy(bin_state, [(ts, fill)]))
+
+    print(f"replayed {len(full)} readings from {len(state)} bins")
+    print(f"  stored rows: {len(kept)} ({100 * (1 - len(kept) / len(full)):.1f}% fewer)")
+
+    avg_full, t_full = timed(average_fill_time, full)
+    avg_kept, t_kept = timed(average_fill_time, kept)
+    print(f"  average-fill-time scan: {t_full * 1000:.1f} ms -> {t_kept * 1000:.1f} ms")
+    fmt = lambda v: f"{v:.2f}h" if v is not None else "n/a"
+    print(f"  average fill time:      {fmt(avg_full)} (all rows) vs {fmt(avg_kept)} (stored rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from road_network import RoadNetwork
+
+
+def synthetic_extract(path: str, size: int, spacing_deg: float = 0.001, lat0: float = 17.38, lon0: float = 78.48):
+    """A size x size street grid as OSM XML, with every fifth street one-way and
+    every tenth a faster primary road."""
+    random.seed(0)
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n')
+        for i in range(size):
+            for j in range(size):
+                lat = lat0 + i * spacing_deg + random.uniform(-0.0002, 0.0002)
+                lon = lon0 + j * spacing_deg + random.uniform(-0.0002, 0.0002)
+                f.write(f'<node id="{i * size + j + 1}" lat="{lat:.7f}" lon="{lon:.7f}"/>\n')
+        way_id = 1
+        for i in range(size):
+            for row in (True, False):
+                refs = [(i * size + j + 1) if row else (j * size + i + 1) for j in range(size)]
+                tags = {"highway": "primary" if i % 10 == 0 else "residential"}
+                if i % 5 == 2:
+                    tags["oneway"] = "yes"
+                f.write(f'<way id="{way_id}">')
+                f.write("".join(f'<nd ref="{r}"/>' for r in refs))
+                f.write("".join(f'<tag k="{k}" v="{v}"/>' for k, v in tags.items()))
+                f.write("</way>\n")
+                way_id += 1
+        f.write("</osm>\n")
+    return lat0, lon0, lat0 + size * spacing_deg, lon0 + size * spacing_deg
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time offline road routing for a multi-stop pickup route.")
+    parser.add_argument("--osm", help="OSM XML extract to load; a synthetic street grid is generated when omitted")
+    parser.add_argument("--grid", type=int, default=300, help="synthetic grid size (streets per side)")
+    parser.add_argument("--stops", type=int, default=200)
+    parser.add_argument("--area-km", type=float, default=5.0, help="stops are spread over a square this wide")
+    parser.add_argument("--matrix", type=int, default=50, help="stops in the many-to-many matrix check")
+    parser.add_argument("--budget-ms", type=float, default=1000.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.osm:
+            path = args.osm
+        else:
+            path = os.path.join(tmp, "grid.osm")
+            synthetic_extract(path, args.grid)
+
+        network = RoadNetwork(path)
+        t0 = time.perf_counter()
+        network.load()
+        cold = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        RoadNetwork(path).load()
+        warm = time.perf_counter() - t0
+        status = network.status()
+        print(f"graph: {status['nodes']} nodes, {status['edges']} edges; "
+              f"load {cold:.2f}s from XML, {warm:.2f}s from cache")
+
+        lat, lon = float(network._graph["lat"].mean()), float(network._graph["lon"].mean())
+        half = args.area_km / 2 / 111.0
+        random.seed(1)
+        stops = [(lat + random.uniform(-half, half), lon + random.uniform(-half, half)) for _ in range(args.stops)]
+        # visit in nearest-neighbour order, as the pickup map does
+        ordered, rest = [stops[0]], stops[1:]
+        while rest:
+            last = ordered[-1]
+            rest.sort(key=lambda p: (p[0] - last[0]) ** 2 + (p[1] - last[1]) ** 2)
+            ordered.append(rest.pop(0))
+
+        t0 = time.perf_counter()
+        route = network.route(ordered)
+        cold_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        network.route(ordered)
+        cached_ms = (time.perf_counter() - t0) * 1000
+        missing = sum(1 for leg in route["legs"] if leg["seconds"] is None)
+        print(f"route: {len(ordered)} stops, {route['meters'] / 1000:.1f} km, {route['seconds'] / 60:.0f} min, "
+              f"{len(route['geometry'])} points, {missing} unroutable legs")
+        print(f"  {cold_ms:.0f} ms uncached, {cached_ms:.1f} ms from the leg cache (budget {args.budget_ms:.0f} ms)")
+
+        t0 = time.perf_counter()
+        matrix = network.matrix(ordered[:args.matrix], ordered[:args.matrix])
+        matrix_ms = (time.perf_counter() - t0) * 1000
+        reachable = sum(v is not None for row in matrix["seconds"] for v in row)
+        print(f"matrix: {args.matrix}x{args.matrix} in {matrix_ms:.0f} ms, {reachable} reachable pairs")
+
+        if cold_ms > args.budget_ms:
+            print("over budget")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
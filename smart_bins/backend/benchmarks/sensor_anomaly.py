@@ -0,0 +1,112 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sensor_health import SensorMonitor
+
+
+def simulate(bins: int, seconds: int, rate: int, faulty_pct: float, interval: int):
+    """`seconds` worth of an interleaved stream at `rate` readings/sec, each bin
+    reporting every `interval` sensor seconds, with spiking and frozen sensors.
+
+    Yields (bin index, ts, fill, fault) where fault is "spike" or "stuck" for
+    readings a faulty sensor made up and None otherwise.
+    """
+    random.seed(0)
+    fill = [random.randint(0, 60) for _ in range(bins)]
+    faulty = set(random.sample(range(bins), int(bins * faulty_pct / 100)))
+    spikers = {b for b in faulty if b % 2 == 0}
+    frozen = {b: None for b in faulty if b % 2 == 1}
+    for n in range(seconds * rate):
+        b = n % bins
+        ts = 1_700_000_000 + (n // bins) * interval
+        fill[b] = min(100, fill[b] + random.choice((0, 0, 1, 1, 2)))
+        if fill[b] >= 100 and random.random() < 0.05:
+            fill[b] = random.randint(0, 3)
+        if b in spikers and random.random() < 0.02:
+            yield b, ts, 100 if fill[b] < 50 else 0, "spike"
+            continue
+        if b in frozen:
+            if frozen[b] is None and random.random() < 0.001:
+                frozen[b] = fill[b]
+            if frozen[b] is not None:
+                yield b, ts, frozen[b], "stuck"
+                continue
+        yield b, ts, fill[b], None
+
+
+def full_bin_regression(days: int = 14, interval: int = 600) -> tuple[int, float]:
+    """A bin filling at 1%/h that then sits at 100% uncollected: (readings flagged, health score)."""
+    monitor = SensorMonitor(1)
+    baseline = None
+    flagged = 0
+    for k in range(days * 86400 // interval):
+        ts = 1_700_000_000 + k * interval
+        fill = min(100, k * interval // 3600)
+        if monitor.check(0, ts, fill, baseline):
+            flagged += 1
+        else:
+            baseline = fill
+    return flagged, monitor.score(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure sensor anomaly checks on a synthetic ingest stream.")
+    parser.add_argument("--bins", type=int, default=10_000)
+    parser.add_argument("--rate", type=int, default=10_000, help="readings per second to budget for")
+    parser.add_argument("--seconds", type=int, default=60, help="seconds of stream to replay")
+    parser.add_argument("--faulty-pct", type=float, default=2.0)
+    parser.add_argument("--interval", type=int, default=600, help="sensor seconds between readings of one bin")
+    parser.add_argument("--budget-pct", type=float, default=float(os.getenv("ANOMALY_BUDGET_PCT", "10")),
+                        help="max share of one core the checks may use at --rate")
+    args = parser.parse_args()
+
+    stream = list(simulate(args.bins, args.seconds, args.rate, args.faulty_pct, args.interval))
+    monitor = SensorMonitor(args.bins)
+    baseline = [None] * args.bins
+    flagged = false_alarms = 0
+    injected = {"spike": 0, "stuck": 0}
+    caught = {"spike": 0, "stuck": 0}
+    timings = []
+
+    for b, ts, fill, fault in stream:
+        t0 = time.perf_counter_ns()
+        flags = monitor.check(b, ts, fill, baseline[b])
+        timings.append(time.perf_counter_ns() - t0)
+        if not flags:
+            baseline[b] = fill
+        flagged += bool(flags)
+        if fault:
+            injected[fault] += 1
+            caught[fault] += bool(flags)
+        else:
+            false_alarms += bool(flags)
+
+    timings.sort()
+    mean_us = sum(timings) / len(timings) / 1000
+    p99_us = timings[int(len(timings) * 0.99)] / 1000
+    core_pct = mean_us * args.rate / 1e6 * 100
+    print(f"replayed {len(stream)} readings from {args.bins} bins")
+    print(f"  check latency: mean {mean_us:.2f} us, p99 {p99_us:.2f} us")
+    print(f"  at {args.rate} readings/sec: {core_pct:.1f}% of one core (budget {args.budget_pct:.0f}%)")
+    print(f"  injected faults: {sum(injected.values())}, flagged: {flagged}, "
+          f"caught: {sum(caught.values())}, false alarms: {false_alarms}")
+    for fault in injected:
+        print(f"    {fault}: {caught[fault]} of {injected[fault]} caught")
+
+    full_flagged, full_health = full_bin_regression()
+    print(f"  full bin left 14 days without pickup: {full_flagged} readings flagged, sensor health {full_health}")
+    if full_flagged:
+        print("full bin flagged as faulty")
+        sys.exit(1)
+    if core_pct > args.budget_pct:
+        print("over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
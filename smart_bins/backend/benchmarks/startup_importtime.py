@@ -0,0 +1,67 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def measure(module: str) -> list[tuple[int, int, str]]:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///./importtime.db")
+    env.setdefault("SECRET_KEY", "importtime")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        sys.exit(proc.returncode)
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            self_us, cumulative_us, indent, name = m.groups()
+            rows.append((len(indent) // 2, int(cumulative_us), name))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of the API app.")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    totals = []
+    children = {}
+    seen = set()
+    for _ in range(args.runs):
+        rows = measure(args.module)
+        totals.append(next(us for depth, us, name in rows if name == args.module) / 1000)
+        for depth, us, name in rows:
+            seen.add(name)
+            if depth == 1:
+                children.setdefault(name, []).append(us / 1000)
+
+    totals.sort()
+    median = totals[len(totals) // 2]
+    print(f"import {args.module}: median {median:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print(f"slowest direct imports of {args.module} (median ms):")
+    medians = sorted(((sorted(v)[len(v) // 2], k) for k, v in children.items()), reverse=True)
+    for ms, name in medians[:args.top]:
+        print(f"  {ms:8.1f}  {name}")
+
+    heavy = sorted(name for name in seen if name in ("sklearn", "matplotlib", "scipy", "pandas", "joblib"))
+    if heavy:
+        print("heavy modules imported at startup:", ", ".join(heavy))
+    if median > args.budget_ms or heavy:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import argparse
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from config import HISTORY_HEARTBEAT_SECONDS
+from sketches import (_Delta, _summary, hll_add, percentiles, fill_distribution, fold_history,
+                      active_bins, top_full_bins, FILL_LEVELS, HLL_M, HLL_RELATIVE_ERROR, TOP_CAPACITY)
+from storage_policy import should_persist
+
+ENDPOINTS = ["/analytics/fill-percentiles?hours=720", "/analytics/active-bins?hours=720",
+             "/analytics/frequent-full-bins?days=30", "/analytics/trend-30days"]
+
+
+def synthetic(bins, days, interval_minutes, seed=0):
+    """Readings every interval for `bins` bins, with a skewed share of bins filling fast."""
+    rng = np.random.default_rng(seed)
+    steps = days * 24 * 60 // interval_minutes
+    rate = rng.pareto(2.0, bins) + 0.2
+    active = rng.random((steps, bins)) < 0.8
+    fills = np.zeros(bins)
+    t0 = datetime(2026, 1, 1)
+    ts, bin_idx, fill, alerts = [], [], [], []
+    for s in range(steps):
+        fills = fills + rate * rng.random(bins) * interval_minutes / 60
+        full = fills > 100
+        fills[full] = 0
+        idx = np.flatnonzero(active[s])
+        ts.append(np.full(len(idx), s * interval_minutes * 60))
+        bin_idx.append(idx)
+        fill.append(np.minimum(fills[idx], 100).astype(np.int64))
+        alerts.extend((s * interval_minutes * 60, b) for b in np.flatnonzero(full))
+    return t0, np.concatenate(ts), np.concatenate(bin_idx), np.concatenate(fill), alerts
+
+
+def by_bin(ts, bin_idx):
+    return np.lexsort((ts, bin_idx))
+
+
+def stream(t0, ts, bin_idx, fill, names, order):
+    """(zone, bin_id, ts, fill) rows ordered by bin and time, as fold_history() expects."""
+    for i in order.tolist():
+        yield "default", names[bin_idx[i]], t0 + timedelta(seconds=int(ts[i])), int(fill[i])
+
+
+def stored(t0, ts, bin_idx, fill, order):
+    """Indexes of the readings the deadband and heartbeat would keep in fill_history."""
+    keep, last_bin, last_fill, last_ts = [], None, None, None
+    for i in order.tolist():
+        at = t0 + timedelta(seconds=int(ts[i]))
+        if bin_idx[i] != last_bin:
+            last_bin, last_fill, last_ts = bin_idx[i], None, None
+        if should_persist(last_fill, last_ts, int(fill[i]), at):
+            keep.append(i)
+            last_fill, last_ts = int(fill[i]), at
+    return np.array(keep, dtype=np.int64)
+
+
+def build_rows(t0, ts, bin_idx, fill, alerts, names):
+    """Per-hour sketch rows shaped like load_window() output, folded from every reading as ingest does."""
+    deltas = {hour: d for (_, hour), d in fold_history(stream(t0, ts, bin_idx, fill, names, by_bin(ts, bin_idx))).items()}
+    for t, b in alerts:
+        deltas.setdefault(t0 + timedelta(hours=t // 3600), _Delta()).alerts[names[b]] += 1
+    rows = []
+    for h in sorted(deltas):
+        d = deltas[h]
+        hll = np.zeros(HLL_M, dtype=np.uint8)
+        hll_add(hll, d.bins)
+        rows.append((h, d.hist.tobytes(), hll.tobytes(), _summary(d.alerts), sum(d.alerts.values())))
+    return rows
+
+
+def exact(ts, bin_idx, fill, alerts, names):
+    """Time-weighted fill histogram and active bins per hour, computed directly with numpy."""
+    order = by_bin(ts, bin_idx)
+    ts, bin_idx, fill = ts[order], bin_idx[order], fill[order]
+    same = np.append(bin_idx[1:] == bin_idx[:-1], False)
+    held = np.where(same, np.minimum(np.diff(ts, append=0), HISTORY_HEARTBEAT_SECONDS), 0)
+    hist = np.bincount(fill, weights=held, minlength=FILL_LEVELS).astype(np.int64)
+    first, last = ts // 3600, (ts + np.maximum(held, 1) - 1) // 3600
+    width = int(bin_idx.max()) + 1
+    pairs = np.unique(np.concatenate([first * width + bin_idx, last * width + bin_idx]))
+    hours, counts = np.unique(pairs // width, return_counts=True)
+    distinct = len(np.unique(bin_idx))
+    top = Counter(names[b] for _, b in alerts).most_common(10)
+    return hist, dict(zip(hours.tolist(), counts.tolist())), distinct, top
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare hourly sketches with exact scans: build time, query time and error.")
+    parser.add_argument("--bins", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--interval", type=int, default=15, help="minutes between readings of a bin")
+    parser.add_argument("--url", help="also time the live endpoints with and without exact=true")
+    args = parser.parse_args()
+
+    names = [f"bin{i:06d}" for i in range(args.bins)]
+    t0, ts, bin_idx, fill, alerts = synthetic(args.bins, args.days, args.interval)
+    print(f"{len(ts)} readings, {len(alerts)} alerts, {args.bins} bins over {args.days} days")
+
+    started = time.perf_counter()
+    ex_hist, ex_hours, ex_distinct, ex_top = exact(ts, bin_idx, fill, alerts, names)
+    exact_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rows = build_rows(t0, ts, bin_idx, fill, alerts, names)
+    build_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    hist, _ = fill_distribution(rows)
+    by_hour, distinct = active_bins(rows)
+    top, floor, total = top_full_bins(rows)
+    query_s = time.perf_counter() - started
+
+    print(f"exact scan            {exact_s * 1000:9.1f} ms  (O(readings))")
+    print(f"sketch build          {build_s * 1000:9.1f} ms  (once, spread over ingest)")
+    print(f"sketch merge on read  {query_s * 1000:9.1f} ms  ({len(rows)} hourly buckets)")
+
+    qs = (0.5, 0.9, 0.99)
+    print(f"time-weighted percentiles exact {percentiles(ex_hist, qs)} sketch {percentiles(hist, qs)}")
+    levels = np.arange(FILL_LEVELS)
+    print(f"time-weighted mean fill exact {ex_hist @ levels / ex_hist.sum():.2f} sketch {hist @ levels / hist.sum():.2f}")
+
+    # exact=true folds the stored, deadband-thinned rows instead of every reading
+    kept = stored(t0, ts, bin_idx, fill, by_bin(ts, bin_idx))
+    thin = fold_history(stream(t0, ts[kept], bin_idx[kept], fill[kept], names, by_bin(ts[kept], bin_idx[kept])))
+    thin_hist = sum(d.hist for d in thin.values())
+    thin_hours = {}
+    for (_, h), d in thin.items():
+        thin_hours[h] = len(d.bins)
+    hour_diff = np.array([abs(thin_hours.get(t0 + timedelta(hours=h), 0) - n) / n for h, n in ex_hours.items()])
+    print(f"stored rows ({len(kept)} of {len(ts)}): percentiles {percentiles(thin_hist, qs)}, "
+          f"mean fill {thin_hist @ levels / thin_hist.sum():.2f}, active bins per hour mean rel diff {hour_diff.mean():.4f}")
+    errors = np.array([abs(by_hour[t0 + timedelta(hours=h)] - n) / n for h, n in ex_hours.items()])
+    print(f"active bins per hour: mean rel error {errors.mean():.4f}, max {errors.max():.4f} "
+          f"(expected std {HLL_RELATIVE_ERROR:.4f})")
+    print(f"distinct bins over window: exact {ex_distinct}, sketch {distinct:.0f}")
+
+    sketch_top = {b: (c, e) for b, (c, e) in top}
+    within = all(b not in sketch_top or sketch_top[b][0] - sketch_top[b][1] <= c <= sketch_top[b][0]
+                 for b, c in Counter(names[b] for _, b in alerts).items())
+    overlap = len({b for b, _ in ex_top} & set(sketch_top))
+    print(f"top-10 full bins: {overlap}/10 match exact, counts within reported error: {within}, "
+          f"unlisted bins at most {floor} alerts (bound {total / TOP_CAPACITY:.1f})")
+
+    if args.url:
+        import requests
+
+        for path in ENDPOINTS:
+            timings = []
+            for flag in ("", "exact=true"):
+                url = f"{args.url}{path}{'&' if '?' in path else '?'}{flag}" if flag else f"{args.url}{path}"
+                started = time.perf_counter()
+                requests.get(url, timeout=300).raise_for_status()
+                timings.append(time.perf_counter() - started)
+            print(f"{path:45s} sketch {timings[0] * 1000:8.1f} ms  exact {timings[1] * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
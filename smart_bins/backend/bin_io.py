@@ -0,0 +1,249 @@
+import csv
+import io
+import json
+import math
+import tempfile
+import time
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from models import Bin, DEFAULT_ZONE, ZONE_PATTERN
+
+IMPORT_FIELDS = ("bin_id", "latitude", "longitude", "capacity_litres", "zone")
+EXPORT_FIELDS = ("bin_id", "latitude", "longitude", "capacity_litres", "zone", "current_fill_pct", "status", "created_at")
+CHUNK_ROWS = 5000
+MAX_REPORTED_ERRORS = 1000
+MAX_BIN_ID_LENGTH = 64
+
+STAGING_DDL = """
+CREATE TEMP TABLE bins_import (
+    bin_id text, latitude double precision, longitude double precision, capacity_litres integer, zone text
+) ON COMMIT DROP
+"""
+UPSERT_FROM_STAGING = """
+INSERT INTO bins (bin_id, latitude, longitude, capacity_litres, zone, current_fill_pct, status,
+                  readings_since_train, sensor_health, updated_at)
+SELECT bin_id, latitude, longitude, capacity_litres, zone, 0, 'not full', 0, 100, :now FROM bins_import
+ON CONFLICT (bin_id) DO UPDATE SET
+    latitude = EXCLUDED.latitude,
+    longitude = EXCLUDED.longitude,
+    capacity_litres = EXCLUDED.capacity_litres,
+    updated_at = EXCLUDED.updated_at
+"""
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def parse_rows(lines: Iterable[str], fmt: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """Yield (line number, raw row, parse error) from CSV or NDJSON text lines."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        missing = {"bin_id", "latitude", "longitude"} - set(reader.fieldnames or ())
+        if missing:
+            raise ImportFormatError(f"missing CSV columns: {', '.join(sorted(missing))}")
+        for row in reader:
+            yield reader.line_num, row, None
+    elif fmt == "ndjson":
+        for n, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield n, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield n, None, "expected a JSON object"
+                continue
+            yield n, row, None
+    else:
+        raise ImportFormatError(f"unsupported format {fmt!r}")
+
+
+def validate(row: dict, scope: str | None = None) -> tuple[tuple | None, str | None]:
+    bin_id = str(row.get("bin_id") or "").strip()
+    if not bin_id:
+        return None, "bin_id is required"
+    if len(bin_id) > MAX_BIN_ID_LENGTH:
+        return None, "bin_id is too long"
+    try:
+        lat = float(row.get("latitude"))
+        lon = float(row.get("longitude"))
+    except (TypeError, ValueError):
+        return None, "latitude and longitude must be numbers"
+    if not (math.isfinite(lat) and -90 <= lat <= 90 and math.isfinite(lon) and -180 <= lon <= 180):
+        return None, "latitude/longitude out of range"
+    capacity = row.get("capacity_litres")
+    if capacity in (None, ""):
+        capacity = None
+    else:
+        try:
+            capacity = int(float(capacity))
+        except (TypeError, ValueError):
+            return None, "capacity_litres must be a number"
+        if capacity < 0:
+            return None, "capacity_litres must not be negative"
+    zone = str(row.get("zone") or "").strip() or scope or DEFAULT_ZONE
+    if not ZONE_PATTERN.match(zone):
+        return None, "zone must be 1-32 lowercase letters, digits or underscores"
+    if scope is not None and zone != scope:
+        return None, f"zone must be {scope}"
+    return (bin_id, lat, lon, capacity, zone), None
+
+
+def _copy_upsert(db: Session, rows: list[tuple], now: datetime):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    db.execute(text(STAGING_DDL))
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert("COPY bins_import (bin_id, latitude, longitude, capacity_litres, zone) FROM STDIN WITH CSV", buf)
+    finally:
+        cursor.close()
+    db.execute(text(UPSERT_FROM_STAGING), {"now": now})
+
+
+def _executemany_upsert(db: Session, rows: list[tuple], now: datetime):
+    from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(Bin)
+    stmt = stmt.on_conflict_do_update(index_elements=[Bin.bin_id], set_={
+        "latitude": stmt.excluded.latitude,
+        "longitude": stmt.excluded.longitude,
+        "capacity_litres": stmt.excluded.capacity_litres,
+        "updated_at": stmt.excluded.updated_at,
+    })
+    db.execute(stmt, [{
+        "bin_id": b, "latitude": lat, "longitude": lon, "capacity_litres": cap, "zone": zone,
+        "current_fill_pct": 0, "status": "not full", "readings_since_train": 0,
+        "sensor_health": 100.0, "updated_at": now,
+    } for b, lat, lon, cap, zone in rows])
+
+
+def _upsert_chunk(db: Session, rows: dict) -> tuple[int, int, list[str]]:
+    """Upsert one chunk; bins that already exist in another zone are left alone and returned."""
+    existing = dict(db.query(Bin.bin_id, Bin.zone).filter(Bin.bin_id.in_(list(rows))).all())
+    moved = [b for b, zone in existing.items() if zone != rows[b][4]]
+    for b in moved:
+        del rows[b]
+    if rows:
+        now = datetime.utcnow()
+        if db.get_bind().dialect.name == "postgresql":
+            _copy_upsert(db, list(rows.values()), now)
+        else:
+            _executemany_upsert(db, list(rows.values()), now)
+        db.commit()
+    updated = len(existing) - len(moved)
+    return len(rows) - updated, updated, moved
+
+
+def import_bins(db: Session, lines: Iterable[str], fmt: str = "csv",
+                chunk_rows: int = CHUNK_ROWS, on_chunk=None, zone: str | None = None) -> dict:
+    """Validate and upsert bins on bin_id, one transaction per chunk.
+
+    Invalid rows are skipped and reported by line; a bin_id repeated within
+    a chunk keeps its last row. Rows without a zone go to `zone` (or the
+    default zone), and a row may not move an existing bin to another zone.
+    on_chunk(bin_ids) runs after each commit.
+    """
+    started = time.perf_counter()
+    report = {"rows": 0, "inserted": 0, "updated": 0, "error_count": 0, "errors": []}
+    chunk = {}
+    chunk_lines = {}
+
+    def error(line, message):
+        report["error_count"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line, "error": message})
+
+    def flush():
+        inserted, updated, moved = _upsert_chunk(db, chunk)
+        report["inserted"] += inserted
+        report["updated"] += updated
+        for b in moved:
+            error(chunk_lines[b], "bin_id already exists in another zone")
+        if on_chunk is not None and chunk:
+            on_chunk(list(chunk))
+        chunk.clear()
+        chunk_lines.clear()
+
+    for line, row, message in parse_rows(lines, fmt):
+        report["rows"] += 1
+        clean = None
+        if message is None:
+            clean, message = validate(row, zone)
+        if message is not None:
+            error(line, message)
+            continue
+        chunk.pop(clean[0], None)
+        chunk[clean[0]] = clean
+        chunk_lines[clean[0]] = line
+        if len(chunk) >= chunk_rows:
+            flush()
+    if chunk:
+        flush()
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def export_bins(db: Session, fmt: str = "csv", zone: str | None = None) -> Iterator[bytes]:
+    if fmt not in ("csv", "ndjson"):
+        raise ImportFormatError(f"unsupported format {fmt!r}")
+    if fmt == "csv" and db.get_bind().dialect.name == "postgresql":
+        yield from _copy_export(db, zone)
+        return
+
+    columns = [getattr(Bin, f) for f in EXPORT_FIELDS]
+    query = db.query(*columns)
+    if zone is not None:
+        query = query.filter(Bin.zone == zone)
+    rows = query.order_by(Bin.id).yield_per(CHUNK_ROWS)
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(EXPORT_FIELDS)
+        for n, row in enumerate(rows, 1):
+            writer.writerow(v.isoformat() if isinstance(v, datetime) else v for v in row)
+            if n % CHUNK_ROWS == 0:
+                yield buf.getvalue().encode()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue().encode()
+    else:
+        batch = []
+        for row in rows:
+            item = dict(zip(EXPORT_FIELDS, row))
+            if item["created_at"] is not None:
+                item["created_at"] = item["created_at"].isoformat()
+            batch.append(json.dumps(item))
+            if len(batch) >= CHUNK_ROWS:
+                yield ("\n".join(batch) + "\n").encode()
+                batch = []
+        if batch:
+            yield ("\n".join(batch) + "\n").encode()
+
+
+def _copy_export(db: Session, zone: str | None = None) -> Iterator[bytes]:
+    if zone is not None and not ZONE_PATTERN.match(zone):
+        raise ImportFormatError(f"invalid zone {zone!r}")
+    where = f" WHERE zone = '{zone}'" if zone is not None else ""
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024, mode="w+b") as spool:
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY (SELECT {', '.join(EXPORT_FIELDS)} FROM bins{where} ORDER BY id) TO STDOUT WITH CSV HEADER", spool
+            )
+        finally:
+            cursor.close()
+        spool.seek(0)
+        while True:
+            block = spool.read(256 * 1024)
+            if not block:
+                return
+            yield block
@@ -0,0 +1,85 @@
+import argparse
+import random
+import socket
+import time
+
+import numpy as np
+import requests
+
+from binary_ingest import encode_frame, RECORD_DTYPE, MAX_RECORDS, MAX_UDP_RECORDS, FLAG_IDEMPOTENT
+from generate_readings import BASE_URL, fetch_bins
+
+BINARY_ENDPOINT = f"{BASE_URL}/readings/binary"
+
+
+def build_records(bins, per_bin: int = 1) -> np.ndarray:
+    now = int(time.time())
+    records = np.zeros(len(bins) * per_bin, dtype=RECORD_DTYPE)
+    i = 0
+    for b in bins:
+        current = b.get("current_fill_pct") or 0
+        for k in range(per_bin):
+            current = min(100, current + random.choices([0, 1, 2, 3, 4, 5, 6, 7], weights=[5, 20, 15, 15, 15, 10, 10, 10])[0])
+            records[i] = (b["id"], now - (per_bin - 1 - k) * 60, current)
+            i += 1
+    return records
+
+
+def send_http(frame: bytes) -> bool:
+    try:
+        r = requests.post(BINARY_ENDPOINT, data=frame, headers={"Content-Type": "application/octet-stream"}, timeout=10)
+        if r.status_code != 200:
+            print("Bad response while posting frame:", r.status_code, r.text)
+            return False
+        return True
+    except Exception as e:
+        print("Error posting frame:", e)
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send packed binary reading frames to the backend.")
+    parser.add_argument("--udp", metavar="HOST:PORT", help="send over UDP instead of HTTP")
+    parser.add_argument("--frames", type=int, default=1)
+    parser.add_argument("--per-bin", type=int, default=1, help="readings per bin in each frame")
+    parser.add_argument("--gateway-id", type=int, default=1)
+    args = parser.parse_args()
+
+    bins = fetch_bins()
+    if not bins:
+        print("No bins found")
+        return
+
+    sock = None
+    limit = MAX_RECORDS
+    if args.udp:
+        host, port = args.udp.rsplit(":", 1)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        limit = MAX_UDP_RECORDS
+
+    sent_records = 0
+    sent_bytes = 0
+    # The backend remembers (gateway_id, seq) for days, so start somewhere new each run.
+    first_seq = seq = random.SystemRandom().randrange(2 ** 32)
+    started = time.perf_counter()
+    for _ in range(args.frames):
+        records = build_records(bins, args.per_bin)
+        # One frame per datagram/request, so a large fleet is split across several.
+        for start in range(0, len(records), limit):
+            chunk = records[start:start + limit]
+            frame = encode_frame(chunk, gateway_id=args.gateway_id, seq=seq % 2 ** 32, flags=FLAG_IDEMPOTENT)
+            seq += 1
+            if sock is not None:
+                sock.sendto(frame, (host, int(port)))
+            elif not send_http(frame):
+                continue
+            sent_records += len(chunk)
+            sent_bytes += len(frame)
+    elapsed = time.perf_counter() - started
+
+    print(f"sent {sent_records} readings in {seq - first_seq} frames, {sent_bytes} bytes, "
+          f"{sent_records / elapsed:.0f} readings/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import hmac
+import socket
+import struct
+import time
+import zlib
+from datetime import datetime, timezone
+
+import numpy as np
+
+from config import IOT_SECRET_KEY
+
+# Frame layout, little endian:
+#   header  magic "SBF1" | version u8 | flags u8 | gateway_id u16 | seq u32 | count u32
+#   records count x (bin index u32 = bins.id | unix seconds u32 | fill_pct u8)
+#   trailer first 16 bytes of HMAC-SHA256(frame key, header + records)
+# With FLAG_ZLIB the records are sent column by column (all bin indexes, then
+# all timestamps, then all fills) and zlib-compressed; the MAC covers the
+# compressed bytes. FLAG_IDEMPOTENT is required: (gateway_id, seq) identifies
+# the batch and a replay of an already stored batch is acknowledged but ignored.
+MAGIC = b"SBF1"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHII")
+RECORD_DTYPE = np.dtype([("bin", "<u4"), ("ts", "<u4"), ("fill", "u1")])
+MAC_SIZE = 16
+MAX_RECORDS = 65535
+# Largest uncompressed frame that fits in one UDP datagram (65507-byte payload).
+MAX_UDP_RECORDS = (65507 - HEADER.size - MAC_SIZE) // RECORD_DTYPE.itemsize
+# Largest frame accepted on any transport: a full uncompressed frame, plus
+# zlib's worst-case growth for records that do not compress.
+MAX_FRAME_BYTES = HEADER.size + MAX_RECORDS * RECORD_DTYPE.itemsize * 1001 // 1000 + 64 + MAC_SIZE
+FLAG_ZLIB = 0x01
+FLAG_IDEMPOTENT = 0x02
+
+FRAME_KEY = hmac.new(IOT_SECRET_KEY.encode(), b"smart-bins/binary-ingest/v1", hashlib.sha256).digest()
+
+
+class FrameError(ValueError):
+    pass
+
+
+def sign(payload: bytes | memoryview, key: bytes = FRAME_KEY) -> bytes:
+    return hmac.new(key, payload, hashlib.sha256).digest()[:MAC_SIZE]
+
+
+def _columns(records: np.ndarray) -> bytes:
+    return b"".join(np.ascontiguousarray(records[name]).tobytes() for name in RECORD_DTYPE.names)
+
+
+def _from_columns(raw: bytes, count: int) -> np.ndarray:
+    records = np.empty(count, dtype=RECORD_DTYPE)
+    offset = 0
+    for name in RECORD_DTYPE.names:
+        dtype = RECORD_DTYPE[name]
+        records[name] = np.frombuffer(raw, dtype=dtype, count=count, offset=offset)
+        offset += count * dtype.itemsize
+    return records
+
+
+def encode_frame(records: np.ndarray, gateway_id: int = 0, seq: int = 0, key: bytes = FRAME_KEY,
+                 flags: int = 0) -> bytes:
+    records = np.ascontiguousarray(records, dtype=RECORD_DTYPE)
+    body = zlib.compress(_columns(records)) if flags & FLAG_ZLIB else records.tobytes()
+    payload = HEADER.pack(MAGIC, VERSION, flags, gateway_id, seq, len(records)) + body
+    return payload + sign(payload, key)
+
+
+def decode_frame(buf: bytes | memoryview, key: bytes = FRAME_KEY) -> tuple[int, int, np.ndarray]:
+    view = memoryview(buf)
+    if len(view) < HEADER.size + MAC_SIZE:
+        raise FrameError("frame too short")
+    if len(view) > MAX_FRAME_BYTES:
+        raise FrameError("frame too large")
+
+    magic, version, flags, gateway_id, seq, count = HEADER.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise FrameError("unsupported frame")
+    if count > MAX_RECORDS:
+        raise FrameError("too many records")
+
+    size = count * RECORD_DTYPE.itemsize
+    body_end = len(view) - MAC_SIZE if flags & FLAG_ZLIB else HEADER.size + size
+    if len(view) != body_end + MAC_SIZE:
+        raise FrameError("length does not match record count")
+    if not hmac.compare_digest(sign(view[:body_end], key), view[body_end:]):
+        raise FrameError("bad signature")
+
+    if flags & FLAG_ZLIB:
+        inflater = zlib.decompressobj()
+        try:
+            raw = inflater.decompress(view[HEADER.size:body_end], size)
+        except zlib.error:
+            raise FrameError("bad compressed body")
+        if len(raw) != size or not inflater.eof:
+            raise FrameError("length does not match record count")
+        records = _from_columns(raw, count)
+    else:
+        records = np.frombuffer(view, dtype=RECORD_DTYPE, count=count, offset=HEADER.size)
+    if count and records["fill"].max() > 100:
+        raise FrameError("fill_pct out of range")
+    return gateway_id, seq, records
+
+
+def to_readings(records: np.ndarray, bin_ids_by_index: dict[int, str]) -> list[tuple[str, datetime, int]]:
+    readings = []
+    for index, ts, fill in zip(records["bin"].tolist(), records["ts"].tolist(), records["fill"].tolist()):
+        bin_id = bin_ids_by_index.get(index)
+        if bin_id is not None:
+            readings.append((bin_id, datetime.fromtimestamp(ts, tz=timezone.utc), fill))
+    return readings
+
+
+def ingest_frame(buf: bytes | memoryview, db) -> dict:
+    from sqlalchemy.exc import IntegrityError
+    from models import Bin, GatewayBatch
+    from routes.readings import ingest_readings
+
+    gateway_id, seq, records = decode_frame(buf)
+    # Without a batch key a captured frame could be replayed until its readings age out.
+    if not HEADER.unpack_from(buf)[2] & FLAG_IDEMPOTENT:
+        raise FrameError("frame must set FLAG_IDEMPOTENT")
+    duplicate = {"accepted": 0, "stored": 0, "rejected": 0, "duplicate": True, "gateway_id": gateway_id, "seq": seq}
+    if db.get(GatewayBatch, (gateway_id, seq)) is not None:
+        return duplicate
+    # Committed by ingest_readings together with the readings themselves.
+    db.add(GatewayBatch(gateway_id=gateway_id, seq=seq, records=len(records),
+                        received_at=datetime.utcnow()))
+
+    indexes = np.unique(records["bin"]).tolist()
+    bin_ids_by_index = dict(db.query(Bin.id, Bin.bin_id).filter(Bin.id.in_(indexes)).all())
+    try:
+        result = ingest_readings(db, to_readings(records, bin_ids_by_index))
+    except IntegrityError:
+        db.rollback()
+        if db.get(GatewayBatch, (gateway_id, seq)) is not None:
+            return duplicate
+        raise
+    result["unknown_bin_indexes"] = sorted(set(indexes) - set(bin_ids_by_index))
+    result.update(gateway_id=gateway_id, seq=seq, duplicate=False)
+    return result
+
+
+# Shared by every UDP listener in the process; served at /dashboard/admin/udp-ingest.
+udp_stats = {"frames": 0, "records": 0, "rejected_frames": 0, "failed_frames": 0, "shed_frames": 0, "last_error": None}
+
+
+class UdpIngestProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.stats = udp_stats
+        self._pending = set()
+
+    def datagram_received(self, data, addr):
+        task = asyncio.ensure_future(self._admit(data, addr))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _admit(self, data, addr):
+        from fastapi.concurrency import run_in_threadpool
+        from admission import admission
+
+        # Same slots, threadpool and connection budget as POST /readings/binary.
+        # UDP has no way to push back, so a shed datagram is dropped and counted.
+        route_class = admission.classes["ingest"]
+        if not await route_class.acquire():
+            self.stats["shed_frames"] += 1
+            return
+        started = time.perf_counter()
+        try:
+            await run_in_threadpool(self._ingest, data, addr)
+        finally:
+            route_class.release(time.perf_counter() - started)
+
+    def _ingest(self, data, addr):
+        from database import SessionLocal
+
+        # Nothing awaits this executor future, so every error has to be handled here.
+        db = SessionLocal()
+        try:
+            result = ingest_frame(data, db)
+            self.stats["frames"] += 1
+            self.stats["records"] += result["accepted"]
+        except FrameError as e:
+            self.stats["rejected_frames"] += 1
+            self.stats["last_error"] = f"{addr[0]}: {e}"
+        except Exception as e:
+            db.rollback()
+            self.stats["failed_frames"] += 1
+            self.stats["last_error"] = f"{addr[0]}: {e!r}"
+            print("UDP frame ingest failed:", addr, repr(e))
+        finally:
+            db.close()
+
+
+async def start_udp_listener(host: str, port: int):
+    loop = asyncio.get_running_loop()
+    return await loop.create_datagram_endpoint(
+        UdpIngestProtocol, local_addr=(host, port), reuse_port=hasattr(socket, "SO_REUSEPORT")
+    )
@@ -0,0 +1,46 @@
+import argparse
+import json
+import sys
+
+from database import SessionLocal
+from bin_io import import_bins, export_bins, CHUNK_ROWS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import or export the bin fleet as CSV or NDJSON.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="upsert bins on bin_id")
+    imp.add_argument("path", help="file to read, - for stdin")
+    imp.add_argument("--format", choices=("csv", "ndjson"))
+    imp.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    imp.add_argument("--zone", help="zone for rows that do not name one, and the only zone accepted")
+    exp = sub.add_parser("export")
+    exp.add_argument("path", help="file to write, - for stdout")
+    exp.add_argument("--format", choices=("csv", "ndjson"))
+    exp.add_argument("--zone", help="only export this zone")
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    db = SessionLocal()
+    try:
+        if args.command == "import":
+            f = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8-sig", newline="")
+            with f:
+                def progress(ids):
+                    print(f"upserted {len(ids)} bins", file=sys.stderr)
+
+                report = import_bins(db, f, fmt, args.chunk_rows, on_chunk=progress, zone=args.zone)
+            print(json.dumps(report, indent=2))
+            if report["error_count"]:
+                sys.exit(1)
+        else:
+            f = sys.stdout.buffer if args.path == "-" else open(args.path, "wb")
+            with f:
+                for block in export_bins(db, fmt, args.zone):
+                    f.write(block)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
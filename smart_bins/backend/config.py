@@ -1,2 +1,17 @@
 USE_HARDWARE = False
-IOT_SECRET_KEY = "12345" 
+IOT_SECRET_KEY = "12345"
+BINARY_UDP_HOST = "0.0.0.0"
+BINARY_UDP_PORT = 0
+# How long (gateway_id, seq) keys of idempotent binary frames are remembered.
+GATEWAY_BATCH_RETENTION_DAYS = 7
+# Readings are accepted only inside this window around server time. The lower
+# bound matches the batch key retention, so a frame old enough for its key to
+# have been pruned cannot be replayed into the history.
+READING_MAX_AGE_DAYS = GATEWAY_BATCH_RETENTION_DAYS
+READING_MAX_SKEW_SECONDS = 300
+# Fill history storage: a reading is stored only if it moves more than the
+# deadband, crosses an alert threshold, empties the bin, or the heartbeat
+# interval has passed since the last stored row.
+HISTORY_KEEP_ALL = False
+HISTORY_DEADBAND_PCT = 2
+HISTORY_HEARTBEAT_SECONDS = 3600
@@ -1,13 +1,139 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "5"))
+
+# Connections each process may open per engine; admission limits are sized from these.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+
+def _pool_args(url: str) -> dict:
+    # in-memory SQLite gets a per-thread pool that takes no size arguments
+    u = make_url(url)
+    if u.get_backend_name() == "sqlite" and u.database in (None, "", ":memory:"):
+        return {}
+    return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+
+
+engine = create_engine(DATABASE_URL, **_pool_args(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+read_engine = create_engine(READ_DATABASE_URL, pool_pre_ping=True, **_pool_args(READ_DATABASE_URL)) if READ_DATABASE_URL else None
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine) if read_engine else None
+
+# Seconds since the last replayed transaction, or 0 when the replica has
+# replayed everything it received (an idle primary sends nothing new).
+PG_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+class ReplicaMonitor:
+    """Cached replica health, refreshed at most every REPLICA_CHECK_SECONDS.
+
+    Only one request thread runs the check; the others keep using the last
+    result, so a hung replica never stalls more than one request.
+    """
+
+    def __init__(self, bind):
+        self.bind = bind
+        self.healthy = bind is not None
+        self.lag_seconds = None
+        self.error = None
+        self.checked_at = float("-inf")
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+
+    def check(self) -> bool:
+        from sqlalchemy import text
+
+        try:
+            with self.bind.connect() as conn:
+                lag = conn.execute(text(PG_LAG_SQL if self.bind.dialect.name == "postgresql" else "SELECT 0")).scalar()
+            self.lag_seconds = float(lag or 0)
+            self.error = None
+            self.healthy = self.lag_seconds <= REPLICA_MAX_LAG_SECONDS
+        except Exception as e:
+            self.lag_seconds = None
+            self.error = str(e)
+            self.healthy = False
+        self.checked_at = time.monotonic()
+        return self.healthy
+
+    def available(self) -> bool:
+        if self.bind is None:
+            return False
+        if time.monotonic() - self.checked_at >= REPLICA_CHECK_SECONDS and self._lock.acquire(blocking=False):
+            try:
+                self.check()
+            finally:
+                self._lock.release()
+        return self.healthy
+
+    def status(self) -> dict:
+        return {
+            "configured": self.bind is not None,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "max_lag_seconds": REPLICA_MAX_LAG_SECONDS,
+            "error": self.error,
+            "fallbacks": self.fallbacks,
+        }
+
+
+replica = ReplicaMonitor(read_engine)
+
+
+def read_session():
+    """Session for read-only queries: the replica when healthy, else the primary."""
+    if replica.available():
+        return ReadSessionLocal()
+    if replica.bind is not None:
+        replica.fallbacks += 1
+    return SessionLocal()
+
+
+def sync_schema(bind=engine):
+    from sqlalchemy import inspect, text
+    import models
+
+    Base.metadata.create_all(bind=bind)
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=bind.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'
+                if column.default is not None and column.default.is_scalar:
+                    default = column.default.arg
+                    if isinstance(default, bool):
+                        default = str(default).upper() if bind.dialect.name != "sqlite" else int(default)
+                    elif isinstance(default, str):
+                        default = f"'{default}'"
+                    ddl += f" DEFAULT {default}"
+                conn.execute(text(ddl))
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn, checkfirst=True)
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from database import SessionLocal
+from models import Bin
+from forecaster import fit_bin_model, hours_to_full, cycle_starts, MIN_SAMPLES
+from model_training import iter_history_chunks, REBUILD_WORKERS
+
+EVAL_DIR = "eval_runs"
+MAX_ORIGINS_PER_CYCLE = 10
+MAX_ORIGINS_PER_BIN = 50
+FULL_PCT = 99
+HORIZON_BUCKETS = [(0, 6), (6, 24), (24, 72), (72, None)]
+
+
+def bucket_label(lo, hi):
+    return f"{lo}-{hi}h" if hi is not None else f"{lo}h+"
+
+
+def backtest_bin(ts: np.ndarray, fill: np.ndarray) -> list[tuple[float, float | None]]:
+    """Rolling-origin replay of one bin's history.
+
+    Each origin is a reading inside a fill cycle that later reached FULL_PCT.
+    The model is fitted on everything up to and including the origin, and
+    its time-to-full is compared with the time the cycle actually went full.
+    Cycles that never filled are censored and skipped.
+    """
+    pairs = []
+    starts = list(cycle_starts(fill)) + [len(fill)]
+    for start, end in zip(starts[:-1], starts[1:]):
+        full = np.flatnonzero(fill[start:end] >= FULL_PCT)
+        if len(full) == 0:
+            continue
+        full_idx = start + int(full[0])
+        candidates = np.arange(max(start, MIN_SAMPLES - 1), full_idx)
+        if len(candidates) == 0:
+            continue
+        step = max(1, len(candidates) // MAX_ORIGINS_PER_CYCLE)
+        for j in candidates[::step]:
+            entry = fit_bin_model(ts[:j + 1], fill[:j + 1])
+            if entry is None:
+                continue
+            predicted = hours_to_full(entry, fill[j], ts[j])
+            actual = (ts[full_idx] - ts[j]) / 3600.0
+            pairs.append((float(actual), None if predicted is None else float(predicted)))
+    return pairs[-MAX_ORIGINS_PER_BIN:]
+
+
+def backtest_many(batch: list[tuple[str, np.ndarray, np.ndarray]]) -> dict:
+    return {bin_id: backtest_bin(ts, fill) for bin_id, ts, fill in batch}
+
+
+def _errors(pairs):
+    scored = [(a, p) for a, p in pairs if p is not None]
+    if not scored:
+        return {"n": 0, "coverage": 0.0 if pairs else None, "MAE_hours": None, "RMSE_hours": None}
+    err = np.array([p - a for a, p in scored])
+    return {
+        "n": len(scored),
+        "coverage": round(len(scored) / len(pairs), 3),
+        "MAE_hours": round(float(np.mean(np.abs(err))), 3),
+        "RMSE_hours": round(float(np.sqrt(np.mean(err ** 2))), 3),
+    }
+
+
+def summarize(per_bin: dict) -> dict:
+    all_pairs = [p for pairs in per_bin.values() for p in pairs]
+    horizons = {}
+    for lo, hi in HORIZON_BUCKETS:
+        in_bucket = [(a, p) for a, p in all_pairs if a >= lo and (hi is None or a < hi)]
+        horizons[bucket_label(lo, hi)] = _errors(in_bucket)
+
+    bins = {}
+    for bin_id, pairs in per_bin.items():
+        if not pairs:
+            continue
+        scored = [(a, p) for a, p in pairs if p is not None]
+        bins[bin_id] = {
+            **_errors(pairs),
+            "mean_actual_hours": round(float(np.mean([a for a, _ in pairs])), 3),
+            "mean_predicted_hours": round(float(np.mean([p for _, p in scored])), 3) if scored else None,
+        }
+
+    return {
+        "bins_evaluated": len(bins),
+        "origins": len(all_pairs),
+        "overall": _errors(all_pairs),
+        "horizons": horizons,
+        "per_bin": bins,
+    }
+
+
+def run_evaluation(workers: int = REBUILD_WORKERS, progress=None) -> dict:
+    started = time.time()
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    per_bin = {}
+
+    db = SessionLocal()
+    try:
+        zone_of = dict(db.query(Bin.bin_id, Bin.zone).all())
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(backtest_many, batch) for _, batch in iter_history_chunks(db)]
+            for i, f in enumerate(futures):
+                per_bin.update(f.result())
+                if progress:
+                    progress(chunks_done=i + 1, chunks_total=len(futures))
+    finally:
+        db.close()
+
+    by_zone = {}
+    for bin_id, pairs in per_bin.items():
+        by_zone.setdefault(zone_of.get(bin_id), {})[bin_id] = pairs
+    run = {
+        "run_id": run_id,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "seconds": round(time.time() - started, 3),
+        **summarize(per_bin),
+        # zone-bound users only see their own zone's summary
+        "zones": {z: summarize(bins) for z, bins in by_zone.items() if z is not None},
+    }
+    save_run(run)
+    return run
+
+
+def save_run(run: dict):
+    os.makedirs(EVAL_DIR, exist_ok=True)
+    path = os.path.join(EVAL_DIR, f"{run['run_id']}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(run, f)
+    os.replace(tmp, path)
+
+
+def list_runs() -> list[str]:
+    if not os.path.isdir(EVAL_DIR):
+        return []
+    return sorted((f[:-5] for f in os.listdir(EVAL_DIR) if f.endswith(".json")), reverse=True)
+
+
+def load_run(run_id: str | None = None, zone: str | None = None) -> dict | None:
+    """A saved run (the latest when run_id is None), or just one zone's part of it.
+
+    Runs saved before per-zone summaries existed have nothing to show a
+    single zone and are skipped for it.
+    """
+    runs = list_runs()
+    if run_id is not None:
+        runs = [run_id] if run_id in runs else []
+    for rid in runs:
+        with open(os.path.join(EVAL_DIR, f"{rid}.json")) as f:
+            run = json.load(f)
+        zones = run.pop("zones", {})
+        if zone is None:
+            return run
+        if zone in zones:
+            return {"run_id": run["run_id"], "created_at": run["created_at"], "seconds": run["seconds"],
+                    "zone": zone, **zones[zone]}
+    return None
+
+
+def render_plot(run: dict) -> str:
+    name = f"{run['run_id']}.{run['zone']}" if run.get("zone") else run["run_id"]
+    path = os.path.join(EVAL_DIR, f"{name}.png")
+    if os.path.exists(path):
+        return path
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    per_bin = sorted(run["per_bin"].items(), key=lambda kv: kv[1]["mean_actual_hours"])[:50]
+    labels = [b for b, _ in per_bin]
+    actual = [m["mean_actual_hours"] for _, m in per_bin]
+    predicted = [m["mean_predicted_hours"] if m["mean_predicted_hours"] is not None else np.nan for _, m in per_bin]
+
+    horizon_labels = list(run["horizons"].keys())
+    mae = [run["horizons"][h]["MAE_hours"] or 0 for h in horizon_labels]
+    rmse = [run["horizons"][h]["RMSE_hours"] or 0 for h in horizon_labels]
+
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 10))
+    ax1.plot(labels, actual, marker='o')
+    ax1.plot(labels, predicted, marker='o')
+    ax1.tick_params(axis='x', rotation=45)
+    ax1.set_xlabel("Bin ID")
+    ax1.set_ylabel("Time-to-Full (Hours)")
+    ax1.set_title(f"Actual vs Predicted Time-to-Full (run {run['run_id']})")
+    ax1.legend(["Actual", "Predicted"])
+
+    x = np.arange(len(horizon_labels))
+    ax2.bar(x - 0.2, mae, width=0.4)
+    ax2.bar(x + 0.2, rmse, width=0.4)
+    ax2.set_xticks(x, horizon_labels)
+    ax2.set_xlabel("Actual horizon")
+    ax2.set_ylabel("Error (Hours)")
+    ax2.set_title("Error by Horizon")
+    ax2.legend(["MAE", "RMSE"])
+    fig.tight_layout()
+
+    tmp = f"{path}.tmp"
+    fig.savefig(tmp, format="png")
+    plt.close(fig)
+    os.replace(tmp, path)
+    return path
+
@@ -0,0 +1,13 @@
+from fastapi.responses import ORJSONResponse
+
+
+def column_keys(columns) -> list[str]:
+    return [c.key for c in columns]
+
+
+def rows_response(rows, keys: list[str]) -> ORJSONResponse:
+    return ORJSONResponse([dict(zip(keys, r)) for r in rows])
+
+
+def query_response(query, columns) -> ORJSONResponse:
+    return rows_response(query.with_entities(*columns).all(), column_keys(columns))
@@ -0,0 +1,307 @@
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from forecaster import EMPTY_DROP_PCT
+from model_registry import to_epoch
+from models import Bin, BinFeatures, FillHistory, Alert, Task
+from outbox import ALERT_CREATED, ALERT_RESOLVED, TASK_COMPLETED
+
+# Time constants of the two fill-rate averages; a reading dt hours after the
+# previous one gets weight 1 - exp(-dt / tau).
+SHORT_TAU_HOURS = 6.0
+LONG_TAU_HOURS = 168.0
+# Same fill-time rule as /analytics/average-fill-time: from the first reading
+# at or below EMPTY_LEVEL to the next one at or above FULL_LEVEL.
+EMPTY_LEVEL = 5
+FULL_LEVEL = 80
+BACKFILL_BATCH = 10000
+
+FRAME_COLUMNS = [
+    Bin.bin_id, Bin.latitude, Bin.longitude, Bin.current_fill_pct,
+    BinFeatures.fill, BinFeatures.samples, BinFeatures.first_ts, BinFeatures.last_ts,
+    BinFeatures.cycle_start_ts, BinFeatures.cycle_start_fill,
+    BinFeatures.ewma_rate_short, BinFeatures.ewma_rate_long, BinFeatures.cycles,
+    BinFeatures.fill_time_hours_sum, BinFeatures.fill_time_count,
+    BinFeatures.alerts_total, BinFeatures.alerts_open, BinFeatures.last_emptied_at,
+]
+
+
+def _blank(bin_id: str) -> BinFeatures:
+    return BinFeatures(bin_id=bin_id, fill=0, samples=0, cycle_start_fill=0, cycles=0,
+                       fill_time_hours_sum=0.0, fill_time_count=0, alerts_total=0, alerts_open=0)
+
+
+def _ewma(previous: float | None, rate: float, hours: float, tau: float) -> float:
+    if previous is None:
+        return rate
+    alpha = 1.0 - math.exp(-hours / tau)
+    return previous + alpha * (rate - previous)
+
+
+def _track_fill_time(f: BinFeatures, ts: datetime, fill: int):
+    if f.fill_start_ts is None:
+        if fill <= EMPTY_LEVEL:
+            f.fill_start_ts = ts
+    elif fill >= FULL_LEVEL:
+        hours = (to_epoch(ts) - to_epoch(f.fill_start_ts)) / 3600
+        if hours > 0:
+            f.fill_time_hours_sum += hours
+            f.fill_time_count += 1
+        f.fill_start_ts = None
+
+
+def _empty(f: BinFeatures, ts: datetime, fill: int = 0):
+    if f.last_ts is not None and f.fill - fill >= EMPTY_DROP_PCT:
+        f.cycles += 1
+        f.last_emptied_at = ts
+    f.cycle_start_ts, f.cycle_start_fill = ts, fill
+    f.fill = fill
+    _track_fill_time(f, ts, fill)
+
+
+def observe(f: BinFeatures, ts: datetime, fill: int):
+    """Fold one accepted reading into the bin's features; late readings are ignored."""
+    if f.last_ts is None:
+        f.first_ts = f.cycle_start_ts = f.last_ts = ts
+        f.fill = f.cycle_start_fill = fill
+        f.samples = 1
+        _track_fill_time(f, ts, fill)
+        return
+    hours = (to_epoch(ts) - to_epoch(f.last_ts)) / 3600
+    if hours <= 0:
+        return
+    f.samples += 1
+    if f.fill - fill >= EMPTY_DROP_PCT:
+        _empty(f, ts, fill)
+    else:
+        rate = max(fill - f.fill, 0) / hours
+        f.ewma_rate_short = _ewma(f.ewma_rate_short, rate, hours, SHORT_TAU_HOURS)
+        f.ewma_rate_long = _ewma(f.ewma_rate_long, rate, hours, LONG_TAU_HOURS)
+        f.fill = fill
+        _track_fill_time(f, ts, fill)
+    f.last_ts = ts
+
+
+def _locked(db: Session, bin_ids: list[str]) -> dict[str, BinFeatures]:
+    return {f.bin_id: f for f in db.query(BinFeatures).filter(
+        BinFeatures.bin_id.in_(bin_ids)
+    ).order_by(BinFeatures.bin_id).with_for_update().all()}
+
+
+def _insert_missing(db: Session, rows):
+    """INSERT ... ON CONFLICT DO NOTHING, so concurrent first readings of a bin do not collide."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    values = [{c.name: getattr(f, c.name) for c in BinFeatures.__table__.columns} for f in rows]
+    if values:
+        db.execute(insert(BinFeatures).on_conflict_do_nothing(index_elements=[BinFeatures.bin_id]), values)
+
+
+def features_for(db: Session, bin_ids) -> dict[str, BinFeatures]:
+    """Feature rows for bin_ids, locked for this transaction.
+
+    Missing rows (new bins, or bins with history from before the feature
+    store) are built from stored history first.
+    """
+    bin_ids = sorted(set(bin_ids))
+    if not bin_ids:
+        return {}
+    rows = _locked(db, bin_ids)
+    missing = [b for b in bin_ids if b not in rows]
+    if missing:
+        _insert_missing(db, _build(db, missing if len(missing) <= BACKFILL_BATCH else None).values())
+        rows.update(_locked(db, missing))
+    return rows
+
+
+def rename(db: Session, bin_obj, new_id: str):
+    """Give a bin a new bin_id, moving its feature row with it.
+
+    bin_features references bins.bin_id without ON UPDATE CASCADE, so the
+    row is taken out before the rename and put back under the new id after
+    it, keeping the foreign key valid at every statement.
+    """
+    row = _locked(db, [bin_obj.bin_id]).get(bin_obj.bin_id)
+    values = {c.name: getattr(row, c.name) for c in BinFeatures.__table__.columns} if row is not None else None
+    if row is not None:
+        db.delete(row)
+        db.flush()
+    bin_obj.bin_id = new_id
+    db.flush()
+    if values is not None:
+        db.add(BinFeatures(**{**values, "bin_id": new_id}))
+
+
+def apply_events(db: Session, events: list[tuple[str, str, dict]], now: datetime,
+                 features: dict[str, BinFeatures] | None = None):
+    """Update alert counters and pickups from the outbox events of the caller's transaction."""
+    features = dict(features or {})
+    missing = {b for _, b, _ in events if b not in features}
+    features.update(features_for(db, missing))
+    for event_type, bin_id, _ in events:
+        f = features.get(bin_id)
+        if f is None:
+            continue
+        if event_type == ALERT_CREATED:
+            f.alerts_total += 1
+            f.alerts_open += 1
+        elif event_type == ALERT_RESOLVED:
+            f.alerts_open = max(f.alerts_open - 1, 0)
+        elif event_type == TASK_COMPLETED:
+            _empty(f, now)
+
+
+def _alert_counts(db: Session, bin_ids: list[str] | None = None) -> dict[str, tuple[int, int]]:
+    open_count = func.sum(case((Alert.is_resolved == False, 1), else_=0))
+    query = db.query(Alert.bin_id, func.count(Alert.id), open_count)
+    if bin_ids is not None:
+        query = query.filter(Alert.bin_id.in_(bin_ids))
+    return {b: (total, int(open_ or 0)) for b, total, open_ in query.group_by(Alert.bin_id).all()}
+
+
+def _build(db: Session, bin_ids: list[str] | None = None) -> dict[str, BinFeatures]:
+    """Features replayed from stored history, completed tasks and alerts; every bin when bin_ids is None."""
+    pickup_query = db.query(Alert.bin_id, Task.completed_at).join(Task, Task.alert_id == Alert.id).filter(
+        Task.status == "completed", Task.completed_at.isnot(None)
+    )
+    bin_query = db.query(Bin.bin_id)
+    history = db.query(FillHistory.bin_id, FillHistory.ts, FillHistory.fill_pct).filter(
+        FillHistory.quarantined == False
+    )
+    if bin_ids is not None:
+        pickup_query = pickup_query.filter(Alert.bin_id.in_(bin_ids))
+        bin_query = bin_query.filter(Bin.bin_id.in_(bin_ids))
+        history = history.filter(FillHistory.bin_id.in_(bin_ids))
+
+    pickups = {}
+    for bin_id, ts in pickup_query.all():
+        pickups.setdefault(bin_id, []).append(ts)
+    rows = {b: _blank(b) for (b,) in bin_query.all()}
+
+    def replay(bin_id, readings):
+        f = rows.get(bin_id)
+        if f is None:
+            return
+        events = [(to_epoch(ts), 0, ts, fill) for ts, fill in readings]
+        events += [(to_epoch(ts), 1, ts, 0) for ts in pickups.pop(bin_id, [])]
+        for _, is_pickup, ts, fill in sorted(events, key=lambda e: e[:2]):
+            if is_pickup:
+                _empty(f, ts)
+            else:
+                observe(f, ts, fill)
+
+    current, readings = None, []
+    for bin_id, ts, fill in history.order_by(FillHistory.bin_id, FillHistory.ts).yield_per(BACKFILL_BATCH):
+        if bin_id != current:
+            if current is not None:
+                replay(current, readings)
+            current, readings = bin_id, []
+        readings.append((ts, fill))
+    if current is not None:
+        replay(current, readings)
+    for bin_id in list(pickups):
+        replay(bin_id, [])
+
+    for bin_id, (total, open_) in _alert_counts(db, bin_ids).items():
+        if bin_id in rows:
+            rows[bin_id].alerts_total, rows[bin_id].alerts_open = total, open_
+    return rows
+
+
+def backfill(db: Session) -> int:
+    """Rebuild every bin's features from stored history, completed tasks and alerts."""
+    rows = _build(db)
+    db.query(BinFeatures).delete(synchronize_session=False)
+    db.add_all(rows.values())
+    db.commit()
+    return len(rows)
+
+
+def ensure_features(bin_ids: list[str]):
+    """Build and store the missing feature rows of bin_ids on the primary."""
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        features_for(db, bin_ids)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _epochs(values) -> np.ndarray:
+    return np.array([to_epoch(v) if v is not None else np.nan for v in values], dtype=np.float64)
+
+
+def _floats(values) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def load_frame(db: Session, zone: str | None = None, bin_ids: list[str] | None = None,
+               now: datetime | None = None) -> dict[str, np.ndarray]:
+    """Every bin's location and features as numpy columns, from a single query.
+
+    Times are epoch seconds and missing values are NaN; bins that never
+    reported have has_data False. Bins without a feature row yet (history
+    from before the feature store) get one built from history on the
+    primary, once, so their predictions do not depend on an operator
+    having run migrate.py --rebuild-features.
+    """
+    def fetch(session):
+        query = session.query(*FRAME_COLUMNS).outerjoin(BinFeatures, BinFeatures.bin_id == Bin.bin_id)
+        if zone is not None:
+            query = query.filter(Bin.zone == zone)
+        if bin_ids is not None:
+            query = query.filter(Bin.bin_id.in_(bin_ids))
+        return query.order_by(Bin.bin_id).all()
+
+    rows = fetch(db)
+    missing = [r.bin_id for r in rows if r.samples is None]
+    if missing:
+        from database import SessionLocal
+
+        ensure_features(missing)
+        # read back from the primary: a replica may not have the new rows yet
+        primary = SessionLocal()
+        try:
+            rows = fetch(primary)
+        finally:
+            primary.close()
+    cols = list(zip(*rows)) if rows else [()] * len(FRAME_COLUMNS)
+    (bin_id, lat, lon, bin_fill, fill, samples, first_ts, last_ts, cycle_start_ts, cycle_start_fill,
+     ewma_short, ewma_long, cycles, fill_hours_sum, fill_count, alerts_total, alerts_open, last_emptied) = cols
+
+    now = (now or datetime.now(timezone.utc)).timestamp()
+    frame = {
+        "bin_id": np.array(bin_id, dtype=object),
+        "latitude": _floats(lat),
+        "longitude": _floats(lon),
+        "last_ts": _epochs(last_ts),
+        "first_ts": _epochs(first_ts),
+        "cycle_start_ts": _epochs(cycle_start_ts),
+        "last_emptied_at": _epochs(last_emptied),
+        "ewma_rate_short": _floats(ewma_short),
+        "ewma_rate_long": _floats(ewma_long),
+        "samples": np.nan_to_num(_floats(samples)).astype(np.int64),
+        "cycles": np.nan_to_num(_floats(cycles)).astype(np.int64),
+        "alerts_total": np.nan_to_num(_floats(alerts_total)).astype(np.int64),
+        "alerts_open": np.nan_to_num(_floats(alerts_open)).astype(np.int64),
+    }
+    frame["has_data"] = ~np.isnan(frame["last_ts"])
+    frame["fill"] = np.where(frame["has_data"], _floats(fill), np.nan_to_num(_floats(bin_fill)))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cycle_hours = (frame["last_ts"] - frame["cycle_start_ts"]) / 3600
+        frame["cycle_rate"] = np.where(cycle_hours > 0, (frame["fill"] - _floats(cycle_start_fill)) / cycle_hours, np.nan)
+        weeks = (now - frame["first_ts"]) / (7 * 86400)
+        frame["cycles_per_week"] = np.where(weeks > 0, frame["cycles"] / weeks, np.nan)
+        count = _floats(fill_count)
+        frame["avg_fill_hours"] = np.where(count > 0, _floats(fill_hours_sum) / count, np.nan)
+    return frame
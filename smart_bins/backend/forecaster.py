@@ -0,0 +1,195 @@
+import numpy as np
+
+SLOTS = 168
+MIN_SAMPLES = 5
+# A drop of more than this many points between two readings is treated as
+# the bin being emptied, which starts a new fill cycle.
+EMPTY_DROP_PCT = 20
+# Hours of current-cycle data needed before its rate fully replaces the
+# long-run rate.
+CYCLE_TRUST_HOURS = 6.0
+MAX_HORIZON_WEEKS = 8
+
+
+def hour_of_week(epoch_seconds):
+    # Epoch 0 was a Thursday; shift so slot 0 is Monday 00:00 UTC.
+    return ((np.floor_divide(epoch_seconds, 3600) + 72) % SLOTS).astype(np.int64)
+
+
+def cycle_starts(fill: np.ndarray) -> np.ndarray:
+    drops = np.flatnonzero(np.diff(fill) <= -EMPTY_DROP_PCT) + 1
+    return np.concatenate([[0], drops])
+
+
+def profile_integral(profile: np.ndarray, start: float, end: float) -> float:
+    if end <= start:
+        return 0.0
+    hours = np.arange(np.floor(start / 3600), np.ceil(end / 3600))
+    weights = np.ones(len(hours))
+    weights[0] -= (start / 3600) - hours[0]
+    weights[-1] -= hours[-1] + 1 - (end / 3600)
+    slots = ((hours + 72) % SLOTS).astype(np.int64)
+    return float(np.sum(profile[slots] * weights))
+
+
+def fit_bin_model(ts: np.ndarray, fill: np.ndarray) -> dict | None:
+    """Fit a current-cycle fill rate scaled by an hour-of-week profile.
+
+    Rates are learned only from intervals inside a fill cycle, so a pickup
+    never shows up as negative fill. The profile holds each hour-of-week's
+    rate relative to the bin's long-run rate (mean 1.0); slots without data
+    borrow the same hour-of-day from other days.
+    """
+    if len(ts) < MIN_SAMPLES:
+        return None
+
+    dt = np.diff(ts) / 3600.0
+    df = np.diff(fill)
+    valid = (dt > 0) & (df >= 0) & (fill[:-1] < 100)
+    dt, df = dt[valid], df[valid]
+    mid = (ts[:-1][valid] + ts[1:][valid]) / 2
+
+    total_hours = float(np.sum(dt))
+    base_rate = float(np.sum(df) / total_hours) if total_hours > 0 else 0.0
+
+    profile = np.ones(SLOTS)
+    if base_rate > 0:
+        slots = hour_of_week(mid)
+        slot_fill = np.bincount(slots, weights=df, minlength=SLOTS)
+        slot_hours = np.bincount(slots, weights=dt, minlength=SLOTS)
+
+        day_fill = slot_fill.reshape(7, 24).sum(axis=0)
+        day_hours = slot_hours.reshape(7, 24).sum(axis=0)
+        day_rate = np.where(day_hours > 0, day_fill / np.maximum(day_hours, 1e-9), base_rate)
+
+        slot_rate = np.where(
+            slot_hours > 0,
+            slot_fill / np.maximum(slot_hours, 1e-9),
+            np.tile(day_rate, 7),
+        )
+        profile = slot_rate / base_rate
+        profile /= profile.mean() if profile.mean() > 0 else 1.0
+
+    start = int(cycle_starts(fill)[-1])
+    cycle_t0 = float(ts[start])
+    cycle_fill0 = float(fill[start])
+    expected = profile_integral(profile, cycle_t0, float(ts[-1]))
+    level = base_rate
+    if expected > 0 and len(ts) - start >= 2:
+        cycle_level = max(float(fill[-1]) - cycle_fill0, 0.0) / expected
+        w = min((ts[-1] - cycle_t0) / 3600.0 / CYCLE_TRUST_HOURS, 1.0)
+        level = w * cycle_level + (1 - w) * base_rate
+
+    return {
+        "slope": float(level),
+        "intercept": cycle_fill0,
+        "t0": cycle_t0,
+        "window_start": float(ts[0]),
+        "window_end": float(ts[-1]),
+        "n_samples": int(len(ts)),
+        "profile": profile.astype(np.float32),
+    }
+
+
+def hours_to_full(entry: dict, current_fill: float, now: float, target_fill: float = 100.0) -> float | None:
+    remaining = target_fill - current_fill
+    if remaining <= 0:
+        return 0.0
+    level = entry["slope"]
+    if not level > 0:
+        return None
+
+    rates = level * np.asarray(entry["profile"], dtype=np.float64)
+    week = float(rates.sum())
+    full_weeks = int(remaining // week)
+    if full_weeks >= MAX_HORIZON_WEEKS:
+        return None
+    remaining -= full_weeks * week
+
+    frac = now / 3600.0 - np.floor(now / 3600.0)
+    ordered = np.roll(rates, -int(hour_of_week(now)))
+    ordered = np.concatenate([ordered, ordered[:1]])
+    steps = ordered.copy()
+    steps[0] *= 1 - frac
+    cum = np.cumsum(steps)
+
+    i = int(np.searchsorted(cum, remaining))
+    if i == 0:
+        hours = remaining / ordered[0] if ordered[0] > 0 else 0.0
+    else:
+        hours = (1 - frac) + (i - 1) + (remaining - cum[i - 1]) / ordered[i]
+    return full_weeks * SLOTS + float(hours)
+
+
+def hours_to_full_many(slope: np.ndarray, profile: np.ndarray, fill: np.ndarray, now: float,
+                       target_fill: float = 100.0) -> np.ndarray:
+    """hours_to_full for many bins at once; NaN where it would return None."""
+    remaining = target_fill - np.asarray(fill, dtype=np.float64)
+    hours = np.where(remaining <= 0, 0.0, np.nan)
+    ok = (remaining > 0) & (slope > 0)
+    if not ok.any():
+        return hours
+
+    rates = slope[ok, None] * np.asarray(profile[ok], dtype=np.float64)
+    week = rates.sum(axis=1)
+    rem = remaining[ok]
+    full_weeks = np.floor_divide(rem, week)
+    rem = rem - full_weeks * week
+
+    frac = now / 3600.0 - np.floor(now / 3600.0)
+    ordered = np.roll(rates, -int(hour_of_week(now)), axis=1)
+    ordered = np.concatenate([ordered, ordered[:, :1]], axis=1)
+    steps = ordered.copy()
+    steps[:, 0] *= 1 - frac
+    cum = np.cumsum(steps, axis=1)
+
+    rows = np.arange(len(rem))
+    i = np.minimum((cum < rem[:, None]).sum(axis=1), cum.shape[1] - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        first = np.where(ordered[:, 0] > 0, rem / ordered[:, 0], 0.0)
+        later = (1 - frac) + (i - 1) + (rem - cum[rows, np.maximum(i - 1, 0)]) / ordered[rows, i]
+    found = np.where(i == 0, first, later) + full_weeks * SLOTS
+    hours[ok] = np.where(full_weeks >= MAX_HORIZON_WEEKS, np.nan, found)
+    return hours
+
+
+def importance_scores(current_fill: np.ndarray, hours_left: np.ndarray, status: np.ndarray,
+                      slope: np.ndarray) -> np.ndarray:
+    """calculate_bin_importance_score over arrays; hours_left is NaN where unknown."""
+    fill = np.asarray(current_fill, dtype=np.float64)
+    score = fill * 0.5
+    known = ~np.isnan(hours_left)
+    score += np.select(
+        [status == "already_full", known & (hours_left <= 48), ~known & (fill >= 90)],
+        [100.0, (48 - np.nan_to_num(hours_left)) * (100 / 48.0), 50.0],
+        0.0,
+    )
+    score += np.where(slope > 0, np.minimum(slope * 10, 20), 0.0)
+    floor = (score < 1.0) & ((fill > 0) | (slope > 0) | (status == "predicting"))
+    return np.minimum(np.where(floor, 1.0, score), 150.0)
+
+
+def calculate_bin_importance_score(
+    current_fill: float,
+    hours_left: float | None,
+    status: str,
+    slope: float
+) -> float:
+    score = 0.0
+
+    score += current_fill * 0.5
+
+    if status == "already_full":
+        score += 100
+    elif hours_left is not None and hours_left <= 48:
+        score += (48 - hours_left) * (100 / 48.0)
+    elif hours_left is None and current_fill >= 90:
+        score += 50
+
+    if slope > 0:
+        score += min(slope * 10, 20)
+
+    if score < 1.0 and (current_fill > 0 or slope > 0 or status == "predicting"):
+        score = 1.0
+
+    return min(score, 150.0)
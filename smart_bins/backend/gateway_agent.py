@@ -0,0 +1,282 @@
+import argparse
+import random
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import requests
+
+from binary_ingest import encode_frame, RECORD_DTYPE, FLAG_ZLIB, FLAG_IDEMPOTENT
+from generate_readings import BASE_URL, SLEEP_BETWEEN_CYCLES, fetch_bins, next_fill
+
+BINARY_ENDPOINT = f"{BASE_URL}/readings/binary"
+BUFFER_PATH = "gateway_buffer.db"
+BATCH_SIZE = 5000
+MAX_BUFFERED = 2_000_000
+RETRY_MIN_SECONDS = 1.0
+RETRY_MAX_SECONDS = 60.0
+SEQ_LIMIT = 2 ** 32
+# A drop this large in the backend's fill means the bin was emptied.
+PICKUP_DROP_PCT = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    id INTEGER PRIMARY KEY,
+    bin INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    fill INTEGER NOT NULL,
+    seq INTEGER
+);
+CREATE INDEX IF NOT EXISTS readings_seq ON readings (seq);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id INTEGER PRIMARY KEY,
+    bin INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    fill INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    reason TEXT,
+    rejected_at INTEGER NOT NULL
+);
+"""
+
+
+class ReadingBuffer:
+    """Readings waiting to be forwarded, kept in a SQLite WAL file so they survive outages and restarts.
+
+    Readings are cut into batches oldest first. A batch keeps its seq until
+    the backend acknowledges it, so a resend after a timeout or a crash
+    carries the same idempotency key and the backend stores it only once.
+    When more than max_buffered readings pile up the oldest unsent ones are
+    dropped. Batches the backend rejects outright are moved to dead_letters
+    for inspection instead of being resent forever.
+    """
+
+    def __init__(self, path: str = BUFFER_PATH, max_buffered: int = MAX_BUFFERED):
+        self.max_buffered = max_buffered
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        with self._conn:
+            # Start from a random seq so a gateway that lost its buffer file
+            # does not reuse keys the backend still remembers.
+            self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('next_seq', ?)",
+                               (random.SystemRandom().randrange(SEQ_LIMIT),))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+
+    def _size(self) -> int:
+        # Upper bound from the id range; COUNT(*) scans the whole table.
+        lo, hi = self._conn.execute("SELECT MIN(id), MAX(id) FROM readings").fetchone()
+        return 0 if lo is None else hi - lo + 1
+
+    def add(self, readings: list[tuple[int, int, int]]):
+        """Buffer (bins.id, unix seconds, fill_pct) tuples."""
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO readings (bin, ts, fill) VALUES (?, ?, ?)",
+                                   [(b, ts, max(0, min(int(f), 100))) for b, ts, f in readings])
+            excess = self._size() - self.max_buffered
+            if excess > 0:
+                cur = self._conn.execute(
+                    "DELETE FROM readings WHERE id IN (SELECT id FROM readings WHERE seq IS NULL ORDER BY id LIMIT ?)",
+                    (excess,))
+                self.dropped += cur.rowcount
+
+    def next_batch(self, limit: int = BATCH_SIZE) -> tuple[int, np.ndarray] | None:
+        """The unacknowledged batch, or a new one cut from the oldest readings."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT seq FROM readings WHERE seq IS NOT NULL LIMIT 1").fetchone()
+            if row is not None:
+                seq = row[0]
+            else:
+                (seq,) = self._conn.execute("SELECT value FROM meta WHERE key = 'next_seq'").fetchone()
+                cur = self._conn.execute(
+                    "UPDATE readings SET seq = ? WHERE id IN (SELECT id FROM readings WHERE seq IS NULL ORDER BY id LIMIT ?)",
+                    (seq, limit))
+                if cur.rowcount == 0:
+                    return None
+                self._conn.execute("UPDATE meta SET value = ? WHERE key = 'next_seq'", ((seq + 1) % SEQ_LIMIT,))
+            rows = self._conn.execute("SELECT bin, ts, fill FROM readings WHERE seq = ? ORDER BY id", (seq,)).fetchall()
+        return seq, np.array(rows, dtype=RECORD_DTYPE)
+
+    def ack(self, seq: int):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM readings WHERE seq = ?", (seq,))
+
+    def dead_letter(self, seq: int, status: int, reason: str):
+        """Move a rejected batch out of the send queue, keeping its readings and the server's reason."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO dead_letters (bin, ts, fill, seq, status, reason, rejected_at) "
+                "SELECT bin, ts, fill, seq, ?, ?, ? FROM readings WHERE seq = ? ORDER BY id",
+                (status, reason, int(time.time()), seq))
+            self._conn.execute("DELETE FROM readings WHERE seq = ?", (seq,))
+
+    def dead_lettered(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class BatchRejected(Exception):
+    """The backend refused a batch in a way a resend cannot fix (a 4xx other than 429)."""
+
+    def __init__(self, status: int, reason: str):
+        super().__init__(f"{status}: {reason}")
+        self.status = status
+        self.reason = reason
+
+
+class Forwarder:
+    """Sends buffered batches as compressed, idempotent binary frames.
+
+    Network errors, 5xx and 429 back off exponentially with jitter (and
+    honour Retry-After), so a fleet of gateways coming back from an outage
+    does not retry in lockstep. Any other rejection (a malformed frame, a
+    batch too large) would fail the same way every time, so the batch is
+    dead-lettered and draining moves on. max_rate caps readings per second
+    while a backlog drains.
+    """
+
+    def __init__(self, buffer: ReadingBuffer, gateway_id: int, url: str = BINARY_ENDPOINT,
+                 batch_size: int = BATCH_SIZE, max_rate: float | None = None):
+        self.buffer = buffer
+        self.gateway_id = gateway_id
+        self.url = url
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+        self.stats = {"batches": 0, "readings": 0, "bytes": 0, "duplicates": 0, "failures": 0, "rejected": 0}
+        self._session = requests.Session()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="gateway-forwarder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def send(self, seq: int, records: np.ndarray) -> float | None:
+        """Post one batch; None on success, otherwise seconds the server asked us to wait (0 if it did not say).
+
+        Raises BatchRejected when retrying cannot help.
+        """
+        frame = encode_frame(records, gateway_id=self.gateway_id, seq=seq, flags=FLAG_ZLIB | FLAG_IDEMPOTENT)
+        try:
+            r = self._session.post(self.url, data=frame, headers={"Content-Type": "application/octet-stream"}, timeout=30)
+        except requests.RequestException as e:
+            print("Error posting batch:", e)
+            return 0.0
+        if r.status_code != 200:
+            print("Bad response while posting batch:", r.status_code, r.text[:200])
+            if r.status_code == 429 or r.status_code >= 500:
+                return float(r.headers.get("Retry-After", 0))
+            raise BatchRejected(r.status_code, r.text[:500])
+
+        self.stats["batches"] += 1
+        self.stats["readings"] += len(records)
+        self.stats["bytes"] += len(frame)
+        if r.json().get("duplicate"):
+            self.stats["duplicates"] += 1
+        return None
+
+    def drain(self) -> float | None:
+        """Forward batches until the buffer is empty (None) or a send fails (seconds to wait)."""
+        while not self._stop.is_set():
+            batch = self.buffer.next_batch(self.batch_size)
+            if batch is None:
+                return None
+            started = time.monotonic()
+            try:
+                wait = self.send(*batch)
+            except BatchRejected as e:
+                self.buffer.dead_letter(batch[0], e.status, e.reason)
+                self.stats["rejected"] += 1
+                continue
+            if wait is not None:
+                self.stats["failures"] += 1
+                return wait
+            self.buffer.ack(batch[0])
+            if self.max_rate:
+                self._stop.wait(max(0.0, len(batch[1]) / self.max_rate - (time.monotonic() - started)))
+        return None
+
+    def _loop(self):
+        delay = RETRY_MIN_SECONDS
+        while not self._stop.is_set():
+            wait = self.drain()
+            if wait is None:
+                delay = RETRY_MIN_SECONDS
+                self._stop.wait(RETRY_MIN_SECONDS)
+            else:
+                self._stop.wait(max(wait, delay * random.uniform(0.5, 1.0)))
+                delay = min(delay * 2, RETRY_MAX_SECONDS)
+
+
+def simulate(buffer: ReadingBuffer, stop: threading.Event, interval: float):
+    """generate_readings.py, except that readings go to the local buffer and the last
+    known bin list is reused while the backend is unreachable."""
+    bins, fills = [], {}
+    while not stop.is_set():
+        fresh = fetch_bins()
+        if fresh:
+            bins = fresh
+            for b in fresh:
+                backend = b.get("current_fill_pct") or 0
+                local = fills.setdefault(b["id"], backend)
+                if local - backend >= PICKUP_DROP_PCT:
+                    fills[b["id"]] = backend
+        now = int(time.time())
+        readings = []
+        for b in bins:
+            fills[b["id"]], _ = next_fill(fills[b["id"]])
+            readings.append((b["id"], now, fills[b["id"]]))
+        if readings:
+            buffer.add(readings)
+        stop.wait(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated field gateway: buffer readings locally and forward them in batches.")
+    parser.add_argument("--buffer", default=BUFFER_PATH, help="SQLite buffer file")
+    parser.add_argument("--gateway-id", type=int, default=1)
+    parser.add_argument("--url", default=BINARY_ENDPOINT)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-rate", type=float, default=None, help="readings per second while draining a backlog")
+    parser.add_argument("--interval", type=float, default=SLEEP_BETWEEN_CYCLES, help="seconds between sensor sweeps")
+    args = parser.parse_args()
+
+    buffer = ReadingBuffer(args.buffer)
+    forwarder = Forwarder(buffer, args.gateway_id, args.url, args.batch_size, args.max_rate)
+    stop = threading.Event()
+    forwarder.start()
+    print(f"Gateway {args.gateway_id} buffering to {args.buffer}. Press Ctrl+C to stop.")
+    sweeper = threading.Thread(target=simulate, args=(buffer, stop, args.interval), daemon=True)
+    sweeper.start()
+    try:
+        while True:
+            time.sleep(args.interval)
+            print(f"buffered {len(buffer)}  dropped {buffer.dropped}  dead-lettered {buffer.dead_lettered()}  {forwarder.stats}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        sweeper.join(timeout=args.interval + 10)
+        forwarder.stop()
+        buffer.close()
+
+
+if __name__ == "__main__":
+    main()
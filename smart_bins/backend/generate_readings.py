@@ -32,6 +32,12 @@ def send_reading(bin_id, fill_pct):
         print("Error posting reading:", e)
         return False
 
+def next_fill(current):
+    if current >= 100:
+        return 100, 0
+    step = random.choices([0,1,2,3,4,5,6,7], weights=[5,20,15,15,15,10,10,10])[0]
+    return min(current + step, 100), step
+
 def simulate_once():
     bins = fetch_bins()
     if not bins:
@@ -48,15 +54,8 @@ def simulate_once():
             current = 0
 
 
-        if current >= 100:
-            new_val =100
-            reason = "increased by 0"
-        else:
-            step = random.choices([0,1,2,3,4,5,6,7], weights=[5,20,15,15,15,10,10,10])[0]
-            new_val = current + step
-            if new_val > 100:
-                new_val = 100
-            reason = f"increased by {step}"
+        new_val, step = next_fill(current)
+        reason = f"increased by {step}"
 
         print(f"Bin {bin_id}: {current}% -> {new_val}% ({reason})")
         success = send_reading(bin_id, new_val)
@@ -1,21 +1,36 @@
 from fastapi import FastAPI
-from database import Base, engine
 from fastapi.middleware.cors import CORSMiddleware
 from routes import bins, readings,auth,alerts,tasks,dashboard
 from routes.analytics import router as analytics_router
 from routes.ml import router as ml_router
-
-Base.metadata.create_all(bind=engine)
+from routes.profiling import router as profiling_router
+from routes.routing import router as routing_router
+from model_registry import registry
+from model_training import scheduler
+from binary_ingest import start_udp_listener
+from config import BINARY_UDP_HOST, BINARY_UDP_PORT
+from map_grid import grid
+from outbox import dispatcher
+from alert_queue import alert_queue
+from road_network import road_network
+from sketches import sketches
+from profiling import profiler, ProfilingMiddleware
+from admission import AdmissionMiddleware, THREADPOOL_SIZE
+from database import engine, read_engine
 
 app = FastAPI()
 
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"], 
     allow_headers=["*"],
+    expose_headers=["X-Next-After-Id"],
 )
+app.add_middleware(ProfilingMiddleware)
+profiler.attach(engine, *([read_engine] if read_engine is not None else []))
 
 app.include_router(bins.router, prefix="/bins", tags=["bins"])
 app.include_router(readings.router, prefix="/readings", tags=["readings"])
@@ -25,6 +40,49 @@ app.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
 app.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
 app.include_router(analytics_router)  
 app.include_router(ml_router)
+app.include_router(profiling_router)
+app.include_router(routing_router)
+
+@app.on_event("startup")
+def load_model_registry():
+    registry.load()
+    if len(registry) == 0:
+        registry.import_legacy_pickles()
+    scheduler.start()
+    grid.start()
+    dispatcher.start()
+    alert_queue.start()
+    road_network.start()
+    sketches.start()
+    profiler.start_polling()
+
+@app.on_event("startup")
+async def size_threadpool():
+    import anyio.to_thread
+
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+@app.on_event("startup")
+async def start_binary_ingest():
+    if BINARY_UDP_PORT:
+        app.state.udp_transport, _ = await start_udp_listener(BINARY_UDP_HOST, BINARY_UDP_PORT)
+
+@app.on_event("shutdown")
+def stop_binary_ingest():
+    transport = getattr(app.state, "udp_transport", None)
+    if transport is not None:
+        transport.close()
+
+@app.on_event("shutdown")
+def flush_model_registry():
+    scheduler.stop()
+    grid.stop()
+    dispatcher.stop()
+    alert_queue.stop()
+    sketches.stop()
+    profiler.stop_polling()
+    registry.flush()
+
 @app.get("/")
 def get():
     return {"message":"Server started"}
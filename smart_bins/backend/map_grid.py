@@ -0,0 +1,243 @@
+import math
+import threading
+from array import array
+from datetime import datetime, timezone
+
+from models import DEFAULT_ZONE
+
+MAX_CLUSTER_ZOOM = 16
+# Cells per map tile edge; 4 gives roughly 64px clusters on 256px tiles.
+CELLS_PER_TILE = 4
+SYNC_INTERVAL_SECONDS = 5
+# Cells up to this zoom can hold thousands of bins and keep a fill histogram;
+# finer cells hold a handful and keep a plain list of their bins' fills.
+HISTOGRAM_MAX_ZOOM = 10
+FILL_LEVELS = 101
+
+
+def cell_of(lat: float, lon: float, zoom: int) -> tuple[int, int]:
+    n = (2 ** zoom) * CELLS_PER_TILE
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+class Cell:
+    __slots__ = ("count", "sum_lat", "sum_lon", "alerts", "fills")
+
+    def __init__(self, histogram: bool):
+        self.count = 0
+        self.sum_lat = 0.0
+        self.sum_lon = 0.0
+        self.alerts = 0
+        self.fills = array("I", bytes(4 * FILL_LEVELS)) if histogram else []
+
+    def add_fill(self, fill: int, sign: int):
+        if type(self.fills) is list:
+            if sign > 0:
+                self.fills.append(fill)
+            else:
+                self.fills.remove(fill)
+        else:
+            self.fills[fill] += sign
+
+    def max_fill(self) -> int:
+        if type(self.fills) is list:
+            return max(self.fills, default=0)
+        for f in range(FILL_LEVELS - 1, -1, -1):
+            if self.fills[f]:
+                return f
+        return 0
+
+
+class MapGrid:
+    """Per-zoom grid of bin aggregates for map clustering.
+
+    Every zoom level from 0 to MAX_CLUSTER_ZOOM keeps a dict of non-empty
+    cells. A fill or alert change touches one cell per level, so updates are
+    O(levels) and a viewport query only visits the cells it covers. Max fill
+    stays exact when a bin is emptied: cells up to HISTOGRAM_MAX_ZOOM keep a
+    101-slot uint32 fill histogram, finer cells (a few bins each, and nearly
+    all of the cells) keep their bins' fills and take the max on read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._zones = {}
+        self._bins = {}
+        self._synced_at = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _apply(self, bin_id: str, sign: int):
+        lat, lon, fill, alert, (x, y), zone = self._bins[bin_id]
+        fill = min(max(int(fill or 0), 0), 100)
+        levels = self._zones.get(zone)
+        if levels is None:
+            levels = self._zones[zone] = [dict() for _ in range(MAX_CLUSTER_ZOOM + 1)]
+        for zoom in range(MAX_CLUSTER_ZOOM + 1):
+            # cell edges halve per zoom, so coarser cells are the finest cell shifted right
+            shift = MAX_CLUSTER_ZOOM - zoom
+            key = (x >> shift, y >> shift)
+            level = levels[zoom]
+            cell = level.get(key)
+            if cell is None:
+                cell = level[key] = Cell(zoom <= HISTOGRAM_MAX_ZOOM)
+            cell.count += sign
+            cell.sum_lat += sign * lat
+            cell.sum_lon += sign * lon
+            cell.alerts += sign * int(alert)
+            cell.add_fill(fill, sign)
+            if cell.count == 0:
+                del level[key]
+
+    def upsert_bin(self, bin_id: str, lat: float, lon: float, fill: int | None, alert: bool | None = None,
+                   zone: str = DEFAULT_ZONE):
+        with self._lock:
+            if bin_id in self._bins:
+                if alert is None:
+                    alert = self._bins[bin_id][3]
+                self._apply(bin_id, -1)
+            self._bins[bin_id] = (lat, lon, fill or 0, bool(alert), cell_of(lat, lon, MAX_CLUSTER_ZOOM), zone)
+            self._apply(bin_id, 1)
+
+    def remove_bin(self, bin_id: str):
+        with self._lock:
+            if bin_id in self._bins:
+                self._apply(bin_id, -1)
+                del self._bins[bin_id]
+
+    def update_fill(self, bin_id: str, fill: int):
+        self._update(bin_id, fill=fill)
+
+    def set_alert(self, bin_id: str, alert: bool):
+        self._update(bin_id, alert=alert)
+
+    def _update(self, bin_id: str, fill: int | None = None, alert: bool | None = None):
+        with self._lock:
+            state = self._bins.get(bin_id)
+            if state is None:
+                return
+            lat, lon, old_fill, old_alert, cell, zone = state
+            new_fill = old_fill if fill is None else fill
+            new_alert = old_alert if alert is None else alert
+            if new_fill == old_fill and new_alert == old_alert:
+                return
+            self._apply(bin_id, -1)
+            self._bins[bin_id] = (lat, lon, new_fill, new_alert, cell, zone)
+            self._apply(bin_id, 1)
+
+    def clusters(self, south: float, west: float, north: float, east: float, zoom: int,
+                 zone: str | None = None) -> list[dict]:
+        zoom = min(max(int(zoom), 0), MAX_CLUSTER_ZOOM)
+        with self._lock:
+            zones = [zone] if zone is not None else list(self._zones)
+            merged = {}
+            for z in zones:
+                levels = self._zones.get(z)
+                if levels is None:
+                    continue
+                for key, c in self._visible(levels[zoom], south, west, north, east, zoom):
+                    acc = merged.get(key)
+                    if acc is None:
+                        merged[key] = [c.count, c.sum_lat, c.sum_lon, c.max_fill(), c.alerts]
+                    else:
+                        acc[0] += c.count
+                        acc[1] += c.sum_lat
+                        acc[2] += c.sum_lon
+                        acc[3] = max(acc[3], c.max_fill())
+                        acc[4] += c.alerts
+            return [{
+                "latitude": sum_lat / count,
+                "longitude": sum_lon / count,
+                "count": count,
+                "max_fill": max_fill,
+                "alert_count": alerts,
+            } for count, sum_lat, sum_lon, max_fill, alerts in merged.values()]
+
+    def _visible(self, level: dict, south: float, west: float, north: float, east: float, zoom: int):
+        x0, y0 = cell_of(north, west, zoom)
+        x1, y1 = cell_of(south, east, zoom)
+        if x1 < x0:
+            # bbox crosses the antimeridian
+            xs = lambda x: x >= x0 or x <= x1
+            n_cells = ((2 ** zoom) * CELLS_PER_TILE - x0 + x1 + 1) * (y1 - y0 + 1)
+        else:
+            xs = lambda x: x0 <= x <= x1
+            n_cells = (x1 - x0 + 1) * (y1 - y0 + 1)
+
+        if n_cells < len(level):
+            n = (2 ** zoom) * CELLS_PER_TILE
+            x_range = range(x0, x1 + 1) if x1 >= x0 else list(range(x0, n)) + list(range(0, x1 + 1))
+            keys = ((x, y) for x in x_range for y in range(y0, y1 + 1))
+            return [(k, level[k]) for k in keys if k in level]
+        return [(k, c) for k, c in level.items() if xs(k[0]) and y0 <= k[1] <= y1]
+
+    def load(self, db):
+        from models import Bin, Alert
+
+        alerts = {b for (b,) in db.query(Alert.bin_id).filter(Alert.is_resolved == False).distinct().all()}
+        synced_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        rows = db.query(Bin.bin_id, Bin.latitude, Bin.longitude, Bin.current_fill_pct, Bin.zone).all()
+        with self._lock:
+            self._zones = {}
+            self._bins = {}
+        for bin_id, lat, lon, fill, zone in rows:
+            if lat is not None and lon is not None:
+                self.upsert_bin(bin_id, lat, lon, fill, bin_id in alerts, zone or DEFAULT_ZONE)
+        self._synced_at = synced_at
+
+    def sync(self, db):
+        from models import Bin, Alert
+
+        if self._synced_at is None:
+            return self.load(db)
+        since = self._synced_at
+        synced_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        changed = db.query(Bin.bin_id, Bin.latitude, Bin.longitude, Bin.current_fill_pct, Bin.zone).filter(
+            Bin.updated_at >= since
+        ).all()
+        alert_bins = {b for (b,) in db.query(Alert.bin_id).filter(
+            (Alert.created_at >= since) | (Alert.resolved_at >= since)
+        ).distinct().all()}
+        open_alerts = {b for (b,) in db.query(Alert.bin_id).filter(
+            Alert.bin_id.in_(list(alert_bins)), Alert.is_resolved == False
+        ).distinct().all()} if alert_bins else set()
+
+        for bin_id, lat, lon, fill, zone in changed:
+            if lat is not None and lon is not None:
+                alert = (bin_id in open_alerts) if bin_id in alert_bins else None
+                self.upsert_bin(bin_id, lat, lon, fill, alert, zone or DEFAULT_ZONE)
+        for bin_id in alert_bins:
+            self.set_alert(bin_id, bin_id in open_alerts)
+        if db.query(Bin.id).count() != len(self._bins):
+            return self.load(db)
+        self._synced_at = synced_at
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="map-grid-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        from database import SessionLocal
+
+        while True:
+            db = SessionLocal()
+            try:
+                self.sync(db)
+            except Exception as e:
+                print("Map grid sync failed:", e)
+            finally:
+                db.close()
+            if self._stop.wait(SYNC_INTERVAL_SECONDS):
+                return
+
+
+grid = MapGrid()
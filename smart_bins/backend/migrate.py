@@ -0,0 +1,38 @@
+import argparse
+
+from database import engine, sync_schema
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or update the database schema.")
+    parser.add_argument("--partition-history", action="store_true",
+                        help="partition fill_history by zone (PostgreSQL); rerun after adding zones")
+    parser.add_argument("--rebuild-features", action="store_true",
+                        help="recompute the per-bin ML feature store from stored readings, tasks and alerts")
+    parser.add_argument("--rebuild-sketches", action="store_true",
+                        help="recompute the hourly dashboard sketches from stored readings and alerts")
+    args = parser.parse_args()
+
+    sync_schema(engine)
+    print("Schema is up to date.")
+    if args.partition_history:
+        from zones import partition_history
+
+        created = partition_history(engine)
+        print(f"fill_history partitions added for: {', '.join(created) or 'no new zones'}")
+    if args.rebuild_features:
+        from database import SessionLocal
+        from feature_store import backfill
+
+        with SessionLocal() as db:
+            print(f"Features rebuilt for {backfill(db)} bins")
+    if args.rebuild_sketches:
+        from database import SessionLocal
+        from sketches import backfill
+
+        with SessionLocal() as db:
+            print(f"Sketches rebuilt for {backfill(db)} zone-hours")
+
+
+if __name__ == "__main__":
+    main()
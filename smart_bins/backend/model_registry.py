@@ -0,0 +1,275 @@
+import os
+import glob
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MODEL_DIR = "models_store"
+REGISTRY_PATH = os.path.join(MODEL_DIR, "registry.npy")
+LOCK_PATH = os.path.join(MODEL_DIR, "registry.lock")
+
+# Pending in-process writes are flushed to disk once either limit is hit.
+FLUSH_MAX_PENDING = 256
+FLUSH_INTERVAL_SECONDS = 5.0
+# How often a worker checks whether another worker replaced the file.
+RELOAD_CHECK_SECONDS = 1.0
+
+REGISTRY_DTYPE = np.dtype([
+    ("bin_id", "U32"),
+    ("slope", "f8"),
+    ("intercept", "f8"),
+    ("t0", "f8"),
+    ("window_start", "f8"),
+    ("window_end", "f8"),
+    ("n_samples", "i4"),
+    ("version", "i4"),
+    ("trained_at", "f8"),
+    ("profile", "f4", (168,)),
+])
+
+FIELDS = [name for name in REGISTRY_DTYPE.names if name != "bin_id"]
+
+
+def to_epoch(ts: datetime) -> float:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def from_epoch(value: float) -> datetime | None:
+    if value is None or np.isnan(value):
+        return None
+    return datetime.fromtimestamp(float(value), tz=timezone.utc)
+
+
+class ModelRegistry:
+    """All per-bin model parameters in one memory-mapped structured array.
+
+    The array is sorted by bin_id and lives in a single .npy file that every
+    uvicorn worker maps read-only, so the pages are shared through the OS
+    cache. Writers merge their rows into a fresh copy and swap it in with
+    os.replace, which readers pick up on their next reload check.
+    """
+
+    def __init__(self, path: str = REGISTRY_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._table = np.zeros(0, dtype=REGISTRY_DTYPE)
+        self._index = {}
+        self._pending = {}
+        self._stat = None
+        self._last_check = 0.0
+        self._last_flush = time.monotonic()
+
+    def load(self):
+        with self._lock:
+            if not os.path.exists(self.path):
+                self._table = np.zeros(0, dtype=REGISTRY_DTYPE)
+                self._index = {}
+                self._stat = None
+                return
+            st = os.stat(self.path)
+            table = np.load(self.path, mmap_mode="r")
+            if table.dtype != REGISTRY_DTYPE:
+                table = self._upgrade(table)
+            self._table = table
+            self._index = {str(b): i for i, b in enumerate(table["bin_id"])}
+            self._stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+            self._last_check = time.monotonic()
+
+    @staticmethod
+    def _upgrade(old: np.ndarray) -> np.ndarray:
+        table = np.zeros(len(old), dtype=REGISTRY_DTYPE)
+        table["profile"] = 1.0
+        for name in REGISTRY_DTYPE.names:
+            if old.dtype.names and name in old.dtype.names:
+                table[name] = old[name]
+        return table
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check < RELOAD_CHECK_SECONDS:
+            return
+        self._last_check = now
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if (st.st_ino, st.st_mtime_ns, st.st_size) != self._stat:
+            self.load()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._index) + sum(1 for b in self._pending if b not in self._index)
+
+    def get(self, bin_id: str) -> dict | None:
+        with self._lock:
+            if bin_id in self._pending:
+                return dict(self._pending[bin_id])
+            self._maybe_reload()
+            i = self._index.get(bin_id)
+            if i is None:
+                return None
+            row = self._table[i]
+            entry = {}
+            for name in FIELDS:
+                value = row[name]
+                entry[name] = value.item() if value.ndim == 0 else np.array(value)
+            entry["bin_id"] = bin_id
+            return entry
+
+    def get_many(self, bin_ids: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(slope, profile, found) arrays aligned with bin_ids; missing bins get NaN and a flat profile."""
+        n = len(bin_ids)
+        slope = np.full(n, np.nan)
+        profile = np.ones((n, 168), dtype=np.float32)
+        found = np.zeros(n, dtype=bool)
+        with self._lock:
+            self._maybe_reload()
+            rows = np.array([self._index.get(b, -1) for b in bin_ids], dtype=np.int64)
+            hit = rows >= 0
+            if hit.any():
+                table = self._table[rows[hit]]
+                slope[hit] = table["slope"]
+                profile[hit] = table["profile"]
+                found[hit] = True
+            if self._pending:
+                for i, b in enumerate(bin_ids):
+                    entry = self._pending.get(b)
+                    if entry is not None:
+                        slope[i] = entry["slope"]
+                        profile[i] = entry["profile"]
+                        found[i] = True
+        return slope, profile, found
+
+    def put(self, bin_id: str, **params) -> dict:
+        with self._lock:
+            current = self.get(bin_id)
+            entry = {name: np.nan for name in FIELDS}
+            entry.update(n_samples=0, version=0, profile=np.ones(168, dtype=np.float32))
+            entry.update(params)
+            entry["bin_id"] = bin_id
+            entry["version"] = (current["version"] if current else 0) + 1
+            entry["trained_at"] = time.time()
+            self._pending[bin_id] = entry
+            if (len(self._pending) >= FLUSH_MAX_PENDING
+                    or time.monotonic() - self._last_flush >= FLUSH_INTERVAL_SECONDS):
+                self.flush()
+            return dict(entry)
+
+    def put_many(self, entries: list[dict]):
+        with self._lock:
+            for entry in entries:
+                params = {k: v for k, v in entry.items() if k not in ("bin_id", "version", "trained_at")}
+                current = self._pending.get(entry["bin_id"]) or self.get(entry["bin_id"])
+                row = {name: np.nan for name in FIELDS}
+                row.update(n_samples=0, profile=np.ones(168, dtype=np.float32))
+                row.update(params)
+                row["bin_id"] = entry["bin_id"]
+                row["version"] = (current["version"] if current else 0) + 1
+                row["trained_at"] = time.time()
+                self._pending[entry["bin_id"]] = row
+            self.flush()
+
+    def delete(self, bin_ids: list[str]):
+        with self._lock, self._file_lock():
+            self.load()
+            drop = set(bin_ids)
+            for b in drop:
+                self._pending.pop(b, None)
+            keep = np.array([str(b) not in drop for b in self._table["bin_id"]], dtype=bool)
+            self._write(np.array(self._table[keep]))
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            with self._file_lock():
+                self.load()
+                merged = self._merge(self._pending)
+                self._write(merged)
+            self._pending = {}
+            self._last_flush = time.monotonic()
+
+    def _merge(self, rows: dict) -> np.ndarray:
+        table = np.array(self._table)
+        updates = np.zeros(len(rows), dtype=REGISTRY_DTYPE)
+        for i, (bin_id, entry) in enumerate(sorted(rows.items())):
+            updates[i]["bin_id"] = bin_id
+            for name in FIELDS:
+                updates[i][name] = entry[name]
+        if len(table):
+            keep = ~np.isin(table["bin_id"], updates["bin_id"])
+            table = np.concatenate([table[keep], updates])
+        else:
+            table = updates
+        return table[np.argsort(table["bin_id"], kind="stable")]
+
+    def _write(self, table: np.ndarray):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, table)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.load()
+
+    def _file_lock(self):
+        return _FileLock(LOCK_PATH if self.path == REGISTRY_PATH else f"{self.path}.lock")
+
+    def import_legacy_pickles(self, model_dir: str = MODEL_DIR) -> int:
+        import joblib
+
+        entries = []
+        for path in glob.glob(os.path.join(model_dir, "*.pkl")):
+            bin_id = os.path.splitext(os.path.basename(path))[0]
+            if self.get(bin_id) is not None:
+                continue
+            try:
+                packed = joblib.load(path)
+                model = packed["model"]
+                t0 = to_epoch(packed["t0"])
+            except Exception:
+                continue
+            entries.append({
+                "bin_id": bin_id,
+                "slope": float(model.coef_[0]),
+                "intercept": float(model.intercept_),
+                "t0": t0,
+                "window_start": np.nan,
+                "window_end": t0,
+            })
+        if entries:
+            self.put_many(entries)
+        return len(entries)
+
+
+class _FileLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return self
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+registry = ModelRegistry()
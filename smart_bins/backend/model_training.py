@@ -0,0 +1,318 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Bin, FillHistory
+from model_registry import registry, to_epoch, MODEL_DIR
+from forecaster import fit_bin_model, MIN_SAMPLES
+
+HISTORY_LIMIT = 2000
+
+RETRAIN_INTERVAL_SECONDS = int(os.getenv("RETRAIN_INTERVAL_SECONDS", "60"))
+RETRAIN_WORKERS = int(os.getenv("RETRAIN_WORKERS", "2"))
+RETRAIN_BATCH_SIZE = int(os.getenv("RETRAIN_BATCH_SIZE", "200"))
+MODEL_MAX_AGE_HOURS = float(os.getenv("MODEL_MAX_AGE_HOURS", "24"))
+MODEL_MAX_NEW_READINGS = int(os.getenv("MODEL_MAX_NEW_READINGS", "100"))
+# A bin whose fit fails waits this long before the next try, doubling per failure up to MODEL_MAX_AGE_HOURS.
+RETRAIN_FAILURE_BACKOFF_SECONDS = float(os.getenv("RETRAIN_FAILURE_BACKOFF_SECONDS", "300"))
+
+REBUILD_WORKERS = int(os.getenv("REBUILD_WORKERS", str(os.cpu_count() or 2)))
+REBUILD_CHUNK_BINS = int(os.getenv("REBUILD_CHUNK_BINS", "1000"))
+
+METRICS_PATH = os.path.join(MODEL_DIR, "retrain_metrics.json")
+LEADER_LOCK_PATH = os.path.join(MODEL_DIR, "scheduler.lock")
+
+
+def fit_many(batch: list[tuple[str, np.ndarray, np.ndarray]]) -> list[dict]:
+    results = []
+    for bin_id, ts, fill in batch:
+        params = fit_bin_model(ts, fill)
+        if params is not None:
+            params["bin_id"] = bin_id
+            results.append(params)
+    return results
+
+
+def fetch_history(db: Session, bin_ids: list[str], limit: int = HISTORY_LIMIT) -> dict:
+    rn = func.row_number().over(
+        partition_by=FillHistory.bin_id, order_by=FillHistory.ts.desc()
+    ).label("rn")
+    sub = db.query(FillHistory.bin_id, FillHistory.ts, FillHistory.fill_pct, rn).filter(
+        FillHistory.bin_id.in_(bin_ids),
+        FillHistory.fill_pct >= 0,
+        FillHistory.quarantined == False
+    ).subquery()
+    rows = db.query(sub.c.bin_id, sub.c.ts, sub.c.fill_pct).filter(
+        sub.c.rn <= limit
+    ).order_by(sub.c.bin_id, sub.c.ts).all()
+
+    grouped = {}
+    for bin_id, ts, fill_pct in rows:
+        grouped.setdefault(bin_id, ([], []))
+        grouped[bin_id][0].append(to_epoch(ts))
+        grouped[bin_id][1].append(fill_pct)
+    return {
+        b: (np.array(ts, dtype=np.float64), np.array(fill, dtype=np.float64))
+        for b, (ts, fill) in grouped.items()
+    }
+
+
+def history_counts(db: Session, bin_ids: list[str], chunk_bins: int = REBUILD_CHUNK_BINS) -> dict[str, int]:
+    counts = {}
+    for i in range(0, len(bin_ids), chunk_bins):
+        counts.update(db.query(FillHistory.bin_id, func.count(FillHistory.id)).filter(
+            FillHistory.bin_id.in_(bin_ids[i:i + chunk_bins]),
+            FillHistory.fill_pct >= 0,
+            FillHistory.quarantined == False
+        ).group_by(FillHistory.bin_id).all())
+    return counts
+
+
+def stale_bins(db: Session, now: float | None = None, backoff: dict | None = None) -> list[tuple[float, str, int]]:
+    """(priority, bin_id, readings_since_train) of bins due for a fit, highest priority first.
+
+    Bins listed in backoff as {bin_id: (failures, retry_at)} are skipped
+    until retry_at.
+    """
+    now = now or time.time()
+    backoff = backoff or {}
+    bins = [b for b in db.query(Bin.bin_id, Bin.current_fill_pct, Bin.readings_since_train).all()
+            if b[0] not in backoff or backoff[b[0]][1] <= now]
+    # readings_since_train starts at 0 for bins that predate the column and
+    # only counts stored rows, so untrained bins are judged by their history.
+    untrained = history_counts(db, [b for b, _, _ in bins if registry.get(b) is None])
+
+    candidates = []
+    for bin_id, current_fill, new_readings in bins:
+        new_readings = new_readings or 0
+        current_fill = current_fill or 0
+        entry = registry.get(bin_id)
+        if entry is None:
+            if untrained.get(bin_id, 0) >= MIN_SAMPLES:
+                candidates.append((1000.0 + current_fill, bin_id, new_readings))
+            continue
+
+        age_hours = (now - entry["trained_at"]) / 3600.0
+        if age_hours < MODEL_MAX_AGE_HOURS and new_readings < MODEL_MAX_NEW_READINGS:
+            continue
+
+        hours_since_t0 = (now - entry["t0"]) / 3600.0
+        predicted = entry["intercept"] + entry["slope"] * hours_since_t0
+        error = abs(predicted - current_fill) if np.isfinite(predicted) else 100.0
+
+        priority = min(error, 100.0)
+        if current_fill >= 70:
+            priority += current_fill
+        priority += min(age_hours / MODEL_MAX_AGE_HOURS, 5.0) * 10
+        priority += min(new_readings / MODEL_MAX_NEW_READINGS, 5.0) * 10
+        candidates.append((priority, bin_id, new_readings))
+
+    candidates.sort(reverse=True)
+    return candidates
+
+
+def consume_readings(db: Session, seen: dict[str, int]):
+    """Subtract the counters read before a fit, keeping readings that arrived while it ran."""
+    if not seen:
+        return
+    remaining = func.coalesce(Bin.readings_since_train, 0) - case(seen, value=Bin.bin_id, else_=0)
+    db.query(Bin).filter(Bin.bin_id.in_(list(seen))).update(
+        {Bin.readings_since_train: case((remaining > 0, remaining), else_=0)}, synchronize_session=False
+    )
+
+
+def iter_history_chunks(db: Session, chunk_bins: int = REBUILD_CHUNK_BINS):
+    bin_ids = [b for (b,) in db.query(Bin.bin_id).order_by(Bin.bin_id).all()]
+    for i in range(0, len(bin_ids), chunk_bins):
+        chunk = bin_ids[i:i + chunk_bins]
+        history = fetch_history(db, chunk)
+        yield chunk, [(b, *history[b]) for b in chunk if b in history]
+
+
+def rebuild_all(workers: int = REBUILD_WORKERS, chunk_bins: int = REBUILD_CHUNK_BINS,
+                clear: bool = False, progress=None) -> dict:
+    started = time.time()
+    total_bins = 0
+    results = []
+
+    db = SessionLocal()
+    try:
+        seen = {b: n for b, n in db.query(Bin.bin_id, Bin.readings_since_train).all() if n}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            for chunk, batch in iter_history_chunks(db, chunk_bins):
+                total_bins += len(chunk)
+                futures.append(pool.submit(fit_many, batch))
+                if progress:
+                    progress(exported=total_bins)
+            for f in futures:
+                results.extend(f.result())
+                if progress:
+                    progress(trained=len(results))
+
+        if clear:
+            trained = {r["bin_id"] for r in results}
+            registry.delete([b for (b,) in db.query(Bin.bin_id).all() if b not in trained])
+        registry.put_many(results)
+        consume_readings(db, seen)
+        db.commit()
+    finally:
+        db.close()
+
+    elapsed = time.time() - started
+    return {
+        "bins": total_bins,
+        "trained": len(results),
+        "skipped": total_bins - len(results),
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "bins_per_sec": round(total_bins / elapsed, 2) if elapsed > 0 else None,
+    }
+
+
+class RetrainScheduler:
+    def __init__(self):
+        self._thread = None
+        self._stop = threading.Event()
+        self._pool = None
+        self._leader_fd = None
+        self.backoff = {}
+        self.metrics = {
+            "running": False,
+            "runs": 0,
+            "bins_retrained_total": 0,
+            "failures": 0,
+            "fit_failures": 0,
+            "backed_off_bins": 0,
+            "stale_bins": 0,
+            "last_batch_size": 0,
+            "last_run_started": None,
+            "last_run_seconds": None,
+            "last_throughput_bins_per_sec": None,
+        }
+
+    def start(self):
+        if self._thread is not None or not self._acquire_leadership():
+            return
+        self._pool = ProcessPoolExecutor(max_workers=RETRAIN_WORKERS)
+        self._thread = threading.Thread(target=self._loop, name="retrain-scheduler", daemon=True)
+        self._thread.start()
+        self.metrics["running"] = True
+        self._write_metrics()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self.metrics["running"] = False
+        if self._leader_fd is not None:
+            self._write_metrics()
+            os.close(self._leader_fd)
+            self._leader_fd = None
+
+    def _acquire_leadership(self) -> bool:
+        try:
+            import fcntl
+        except ImportError:
+            return True
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        fd = os.open(LEADER_LOCK_PATH, os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._leader_fd = fd
+        return True
+
+    def _loop(self):
+        while not self._stop.wait(RETRAIN_INTERVAL_SECONDS):
+            try:
+                self.run_once()
+            except Exception as e:
+                self.metrics["failures"] += 1
+                print("Retrain run failed:", e)
+
+    def run_once(self) -> int:
+        started = time.time()
+        self.metrics["last_run_started"] = datetime.now(timezone.utc).isoformat()
+
+        db = SessionLocal()
+        try:
+            candidates = stale_bins(db, started, self.backoff)
+            self.metrics["stale_bins"] = len(candidates)
+            seen = {b: n for _, b, n in candidates[:RETRAIN_BATCH_SIZE]}
+            if not seen:
+                self._finish(started, 0)
+                return 0
+
+            history = fetch_history(db, list(seen))
+            batch = [(b, *history[b]) for b in seen if b in history]
+            chunk = max(1, len(batch) // (RETRAIN_WORKERS * 4))
+            futures = [
+                self._pool.submit(fit_many, batch[i:i + chunk])
+                for i in range(0, len(batch), chunk)
+            ]
+            results = []
+            for f in futures:
+                try:
+                    results.extend(f.result())
+                except Exception as e:
+                    print("Retrain chunk failed:", e)
+
+            registry.put_many(results)
+            trained = {r["bin_id"] for r in results}
+            consume_readings(db, {b: n for b, n in seen.items() if b in trained})
+            db.commit()
+        finally:
+            db.close()
+
+        self._record_failures(started, trained, [b for b in seen if b not in trained])
+        self._finish(started, len(results))
+        return len(results)
+
+    def _record_failures(self, now: float, trained: set, failed: list[str]):
+        for bin_id in trained:
+            self.backoff.pop(bin_id, None)
+        for bin_id in failed:
+            failures = self.backoff.get(bin_id, (0, 0.0))[0] + 1
+            delay = min(RETRAIN_FAILURE_BACKOFF_SECONDS * 2 ** (failures - 1), MODEL_MAX_AGE_HOURS * 3600)
+            self.backoff[bin_id] = (failures, now + delay)
+        self.metrics["fit_failures"] += len(failed)
+        self.metrics["backed_off_bins"] = len(self.backoff)
+
+    def _finish(self, started: float, retrained: int):
+        elapsed = time.time() - started
+        self.metrics["runs"] += 1
+        self.metrics["bins_retrained_total"] += retrained
+        self.metrics["last_batch_size"] = retrained
+        self.metrics["last_run_seconds"] = round(elapsed, 3)
+        self.metrics["last_throughput_bins_per_sec"] = round(retrained / elapsed, 2) if elapsed > 0 else None
+        self._write_metrics()
+
+    def _write_metrics(self):
+        tmp = f"{METRICS_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.metrics, f)
+        os.replace(tmp, METRICS_PATH)
+
+
+def read_metrics() -> dict:
+    try:
+        with open(METRICS_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"running": False}
+
+
+scheduler = RetrainScheduler()
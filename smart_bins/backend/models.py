@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime,Boolean,ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime,Boolean,ForeignKey, Date, JSON, Index, LargeBinary
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime, timezone
+import re
+
+DEFAULT_ZONE = "default"
+ZONE_PATTERN = re.compile(r"^[a-z0-9_]{1,32}$")
 
 class Bin(Base):
     __tablename__ = "bins"
@@ -15,6 +19,12 @@ class Bin(Base):
     current_fill_pct = Column(Integer, default=0)
     status = Column(String, default="not full")
     created_at = Column(DateTime, server_default=func.now())
+    readings_since_train = Column(Integer, default=0)
+    last_persisted_fill = Column(Integer, nullable=True)
+    last_persisted_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    sensor_health = Column(Float, default=100.0)
+    zone = Column(String, nullable=False, default=DEFAULT_ZONE, index=True)
 
 class FillHistory(Base):
     __tablename__ = "fill_history"
@@ -23,6 +33,32 @@ class FillHistory(Base):
     bin_id = Column(String, nullable=False, index=True)
     ts = Column(DateTime, server_default=func.now())
     fill_pct = Column(Integer, nullable=False)
+    quarantined = Column(Boolean, default=False, nullable=False)
+    zone = Column(String, nullable=False, default=DEFAULT_ZONE)
+
+    __table_args__ = (
+        Index("ix_fill_history_zone_ts", "zone", "ts"),
+    )
+
+class BinFeatures(Base):
+    __tablename__ = "bin_features"
+
+    bin_id = Column(String, ForeignKey("bins.bin_id", ondelete="CASCADE"), primary_key=True)
+    fill = Column(Integer, default=0)
+    samples = Column(Integer, default=0)
+    first_ts = Column(DateTime, nullable=True)
+    last_ts = Column(DateTime, nullable=True)
+    cycle_start_ts = Column(DateTime, nullable=True)
+    cycle_start_fill = Column(Integer, default=0)
+    ewma_rate_short = Column(Float, nullable=True)
+    ewma_rate_long = Column(Float, nullable=True)
+    cycles = Column(Integer, default=0)
+    fill_start_ts = Column(DateTime, nullable=True)
+    fill_time_hours_sum = Column(Float, default=0.0)
+    fill_time_count = Column(Integer, default=0)
+    alerts_total = Column(Integer, default=0)
+    alerts_open = Column(Integer, default=0)
+    last_emptied_at = Column(DateTime, nullable=True)
 
 class User(Base):
     __tablename__ = "users"
@@ -31,6 +67,7 @@ class User(Base):
     username=Column(String,unique=True,nullable=False)
     password=Column(String,nullable=False)
     role=Column(String,nullable=False)
+    zone = Column(String, nullable=True)
 
 class Alert(Base):
     __tablename__ = "alerts"
@@ -39,17 +76,66 @@ class Alert(Base):
     is_resolved = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.now(timezone.utc))
     resolved_at = Column(DateTime, nullable=True)
+    priority = Column(Float, nullable=True)
+    zone = Column(String, nullable=False, default=DEFAULT_ZONE)
+
+    __table_args__ = (
+        Index("ix_alerts_zone_resolved", "zone", "is_resolved"),
+    )
 
 class Task(Base):
     __tablename__ = "tasks"
 
     id = Column(Integer, primary_key=True, index=True)
-    alert_id = Column(Integer, ForeignKey("alerts.id"))
-    worker_id = Column(Integer, ForeignKey("users.id"))
-    status = Column(String, default="assigned") 
+    alert_id = Column(Integer, ForeignKey("alerts.id"), index=True)
+    worker_id = Column(Integer, ForeignKey("users.id"), index=True)
+    status = Column(String, default="assigned", index=True)
     created_at = Column(DateTime, server_default=func.now())
     completed_at = Column(DateTime)
+    zone = Column(String, nullable=False, default=DEFAULT_ZONE)
+
+    __table_args__ = (
+        Index("ix_tasks_zone_status", "zone", "status"),
+    )
 
     alert = relationship("Alert", backref="task")
     worker = relationship("User")
-    
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, nullable=False)
+    bin_id = Column(String, index=True)
+    payload = Column(JSON, nullable=False, default=dict)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True, index=True)
+
+class GatewayBatch(Base):
+    __tablename__ = "gateway_batches"
+
+    gateway_id = Column(Integer, primary_key=True, autoincrement=False)
+    seq = Column(BigInteger, primary_key=True, autoincrement=False)
+    records = Column(Integer, nullable=False)
+    received_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class DailyServiceStats(Base):
+    __tablename__ = "daily_service_stats"
+
+    day = Column(Date, primary_key=True)
+    alerts_created = Column(Integer, default=0, nullable=False)
+    alerts_resolved = Column(Integer, default=0, nullable=False)
+    tasks_completed = Column(Integer, default=0, nullable=False)
+    resolve_seconds_total = Column(Float, default=0, nullable=False)
+
+class StatSketch(Base):
+    __tablename__ = "stat_sketches"
+
+    zone = Column(String, primary_key=True)
+    hour = Column(DateTime, primary_key=True, index=True)
+    readings = Column(Integer, default=0, nullable=False)
+    alerts = Column(Integer, default=0, nullable=False)
+    fill_hist = Column(LargeBinary, nullable=False)
+    hll = Column(LargeBinary, nullable=False)
+    top_bins = Column(JSON, nullable=False)
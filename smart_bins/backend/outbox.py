@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, delete, func
+from sqlalchemy.orm import Session
+
+from config import GATEWAY_BATCH_RETENTION_DAYS
+from models import OutboxEvent, DailyServiceStats, GatewayBatch
+from model_registry import MODEL_DIR
+
+OUTBOX_INTERVAL_SECONDS = float(os.getenv("OUTBOX_INTERVAL_SECONDS", "2"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+LEADER_LOCK_PATH = os.path.join(MODEL_DIR, "outbox.lock")
+
+ALERT_CREATED = "alert.created"
+ALERT_RESOLVED = "alert.resolved"
+TASK_COMPLETED = "task.completed"
+TASK_CANCELLED = "task.cancelled"
+
+
+def record(db: Session, event_type: str, bin_id: str, **payload):
+    """Queue an event in the caller's transaction; it is only visible once they commit."""
+    db.add(OutboxEvent(event_type=event_type, bin_id=bin_id, payload=payload, created_at=datetime.utcnow()))
+
+
+def record_many(db: Session, events: list[tuple[str, str, dict]]):
+    if not events:
+        return
+    now = datetime.utcnow()
+    db.execute(insert(OutboxEvent), [
+        {"event_type": t, "bin_id": b, "payload": p, "created_at": now} for t, b, p in events
+    ])
+
+
+def resolve_seconds(alert, now: datetime) -> float | None:
+    if alert.created_at is None:
+        return None
+    return max((now - alert.created_at.replace(tzinfo=None)).total_seconds(), 0.0)
+
+
+def update_daily_stats(db: Session, events: list[OutboxEvent]):
+    deltas = defaultdict(lambda: [0, 0, 0, 0.0])
+    for e in events:
+        d = deltas[e.created_at.date()]
+        if e.event_type == ALERT_CREATED:
+            d[0] += 1
+        elif e.event_type == ALERT_RESOLVED:
+            d[1] += 1
+            d[3] += e.payload.get("resolve_seconds") or 0.0
+        elif e.event_type == TASK_COMPLETED:
+            d[2] += 1
+    if not deltas:
+        return
+
+    rows = {s.day: s for s in db.query(DailyServiceStats).filter(
+        DailyServiceStats.day.in_(list(deltas))
+    ).with_for_update().all()}
+    for day, (created, resolved, completed, seconds) in deltas.items():
+        row = rows.get(day)
+        if row is None:
+            row = DailyServiceStats(day=day, alerts_created=0, alerts_resolved=0,
+                                    tasks_completed=0, resolve_seconds_total=0.0)
+            db.add(row)
+        row.alerts_created += created
+        row.alerts_resolved += resolved
+        row.tasks_completed += completed
+        row.resolve_seconds_total += seconds
+
+
+def backlog(db: Session) -> dict:
+    pending, oldest = db.query(func.count(OutboxEvent.id), func.min(OutboxEvent.created_at)).filter(
+        OutboxEvent.processed_at == None
+    ).one()
+    return {
+        "pending": pending,
+        "oldest_pending_seconds": round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else None,
+    }
+
+
+class OutboxDispatcher:
+    """Consumes outbox events in batches and hands them to subscribers.
+
+    Subscribers run in the transaction that marks the batch processed, so
+    derived tables are updated exactly once. One process per host leads;
+    rows are claimed with SKIP LOCKED so dispatchers on other hosts can
+    share the backlog.
+    """
+
+    def __init__(self):
+        self._subscribers = [update_daily_stats]
+        self._thread = None
+        self._stop = threading.Event()
+        self._leader_fd = None
+        self.metrics = {"running": False, "batches": 0, "dispatched": 0, "failures": 0, "last_batch_seconds": None}
+
+    def subscribe(self, handler):
+        self._subscribers.append(handler)
+
+    def start(self):
+        if self._thread is not None or not self._acquire_leadership():
+            return
+        self._thread = threading.Thread(target=self._loop, name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+        self.metrics["running"] = True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.metrics["running"] = False
+        if self._leader_fd is not None:
+            os.close(self._leader_fd)
+            self._leader_fd = None
+
+    def _acquire_leadership(self) -> bool:
+        try:
+            import fcntl
+        except ImportError:
+            return True
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        fd = os.open(LEADER_LOCK_PATH, os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._leader_fd = fd
+        return True
+
+    def dispatch_once(self, db: Session) -> int:
+        started = time.perf_counter()
+        events = db.query(OutboxEvent).filter(OutboxEvent.processed_at == None).order_by(
+            OutboxEvent.id
+        ).limit(OUTBOX_BATCH_SIZE).with_for_update(skip_locked=True).all()
+        if not events:
+            db.rollback()
+            return 0
+
+        for handler in self._subscribers:
+            handler(db, events)
+        now = datetime.utcnow()
+        for e in events:
+            e.processed_at = now
+        db.commit()
+
+        self.metrics["batches"] += 1
+        self.metrics["dispatched"] += len(events)
+        self.metrics["last_batch_seconds"] = round(time.perf_counter() - started, 4)
+        return len(events)
+
+    def prune(self, db: Session):
+        cutoff = datetime.utcnow() - timedelta(days=OUTBOX_RETENTION_DAYS)
+        db.execute(delete(OutboxEvent).where(OutboxEvent.processed_at < cutoff))
+        batch_cutoff = datetime.utcnow() - timedelta(days=GATEWAY_BATCH_RETENTION_DAYS)
+        db.execute(delete(GatewayBatch).where(GatewayBatch.received_at < batch_cutoff))
+        db.commit()
+
+    def _loop(self):
+        from database import SessionLocal
+
+        last_prune = 0.0
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                while self.dispatch_once(db) == OUTBOX_BATCH_SIZE and not self._stop.is_set():
+                    pass
+                if time.monotonic() - last_prune > 3600:
+                    self.prune(db)
+                    last_prune = time.monotonic()
+            except Exception as e:
+                db.rollback()
+                self.metrics["failures"] += 1
+                print("Outbox dispatch failed:", e)
+            finally:
+                db.close()
+            self._stop.wait(OUTBOX_INTERVAL_SECONDS)
+
+
+dispatcher = OutboxDispatcher()
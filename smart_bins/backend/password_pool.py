@@ -0,0 +1,79 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+import auth
+
+# bcrypt releases the GIL while hashing, so a small dedicated thread pool
+# gives real parallelism without taking slots from FastAPI's threadpool.
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_MAX_QUEUE = int(os.getenv("PASSWORD_MAX_QUEUE", "256"))
+
+
+class PasswordPool:
+    def __init__(self, workers: int = PASSWORD_WORKERS, max_queue: int = PASSWORD_MAX_QUEUE):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+        self.max_wait = 0.0
+
+    def _timed(self, fn, enqueued: float, *args):
+        started = time.perf_counter()
+        with self._lock:
+            self.running += 1
+            wait = started - enqueued
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.pending -= 1
+                self.completed += 1
+                self.total_run += time.perf_counter() - started
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_queue:
+                self.rejected += 1
+                raise HTTPException(status_code=503, detail="Authentication busy, retry shortly",
+                                    headers={"Retry-After": "1"})
+            self.pending += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._timed, fn, time.perf_counter(), *args)
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        return await self.run(auth.verify_password, plain, hashed)
+
+    async def hash(self, password: str) -> str:
+        return await self.run(auth.hash_password, password)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            done = self.completed or 1
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait / done * 1000, 2),
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "avg_run_ms": round(self.total_run / done * 1000, 2),
+            }
+
+
+password_pool = PasswordPool()
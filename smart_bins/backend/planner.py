@@ -0,0 +1,154 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models import Bin, FillHistory
+from model_registry import to_epoch
+
+HISTORY_DAYS = 28
+EMPTY_DROP_PCT = 20
+OVERFLOW_PCT = 100
+# Each simulation chunk is capped at this many float32 cells (~64 MB).
+MAX_CHUNK_CELLS = 16_000_000
+# Bins whose overflow risk over the whole horizon stays below this need no
+# pickup in the planning window.
+MIN_RISK = 0.01
+
+
+def daily_gain_stats(db: Session, bin_ids: list[str], zone: str | None = None,
+                     days: int = HISTORY_DAYS) -> tuple[np.ndarray, np.ndarray]:
+    """Mean and standard deviation of each bin's daily fill gain.
+
+    Gains are the sum of in-cycle increases per 24h window. Drops count as
+    pickups and are ignored. Bins without history get the fleet average.
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    index = {b: i for i, b in enumerate(bin_ids)}
+    query = db.query(FillHistory.bin_id, FillHistory.ts, FillHistory.fill_pct).filter(
+        FillHistory.ts >= since, FillHistory.quarantined == False
+    )
+    if zone is not None:
+        query = query.filter(FillHistory.zone == zone)
+    rows = [r for r in query.order_by(FillHistory.bin_id, FillHistory.ts).all() if r[0] in index]
+
+    n = len(bin_ids)
+    if len(rows) < 2:
+        return np.zeros(n), np.zeros(n)
+
+    b = np.fromiter((index[r[0]] for r in rows), dtype=np.int64, count=len(rows))
+    ts = np.fromiter((to_epoch(r[1]) for r in rows), dtype=np.float64, count=len(rows))
+    fill = np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows))
+
+    same = b[1:] == b[:-1]
+    df = np.diff(fill)
+    keep = same & (df > -EMPTY_DROP_PCT)
+    gain = np.where(keep, np.clip(df, 0, None), 0.0)
+    day = ((ts[1:] - since.timestamp()) // 86400).astype(np.int64).clip(0, days - 1)
+
+    per_day = np.bincount(b[1:] * days + day, weights=gain, minlength=n * days).reshape(n, days)
+    seen = np.bincount(b[1:][same] * days + day[same], minlength=n * days).reshape(n, days) > 0
+
+    observed = seen.sum(axis=1)
+    mean = np.where(observed > 0, (per_day * seen).sum(axis=1) / np.maximum(observed, 1), np.nan)
+    var = np.where(
+        observed > 1,
+        ((per_day - mean[:, None]) ** 2 * seen).sum(axis=1) / np.maximum(observed - 1, 1),
+        np.nan,
+    )
+    std = np.sqrt(var)
+
+    fleet_mean = np.nanmean(mean) if np.any(observed > 0) else 0.0
+    fleet_std = np.nanmean(std) if np.any(observed > 1) else fleet_mean * 0.5
+    mean = np.where(np.isnan(mean), fleet_mean, mean)
+    std = np.where(np.isnan(std), fleet_std, std)
+    return mean, std
+
+
+def simulate_overflow(current: np.ndarray, mean: np.ndarray, std: np.ndarray,
+                      days: int, scenarios: int, seed: int | None = None) -> np.ndarray:
+    """P(fill >= OVERFLOW_PCT by the end of each day), shape (bins, days).
+
+    Daily gains are drawn from a gamma distribution with each bin's mean and
+    variance, for every bin, scenario and day in one array per chunk.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(current)
+    out = np.zeros((n, days), dtype=np.float32)
+    chunk = max(1, MAX_CHUNK_CELLS // (scenarios * days))
+
+    mean = np.maximum(mean, 0.0)
+    var = np.maximum(std, 0.0) ** 2
+    stochastic = (mean > 0) & (var > 0)
+    shape = np.where(stochastic, mean ** 2 / np.where(var > 0, var, 1), 1.0)
+    scale = np.where(stochastic, var / np.where(mean > 0, mean, 1), 0.0)
+
+    for start in range(0, n, chunk):
+        sl = slice(start, min(start + chunk, n))
+        gains = rng.gamma(
+            shape[sl, None, None].astype(np.float32),
+            scale[sl, None, None].astype(np.float32),
+            size=(sl.stop - start, scenarios, days),
+        ).astype(np.float32)
+        deterministic = ~stochastic[sl]
+        gains[deterministic] = mean[sl][deterministic, None, None]
+        fill = current[sl, None, None].astype(np.float32) + np.cumsum(gains, axis=2)
+        out[sl] = (fill >= OVERFLOW_PCT).mean(axis=1)
+    return out
+
+
+def recommend(overflow_by_day: np.ndarray, overflow_cost: float, pickup_cost: float) -> tuple[np.ndarray, np.ndarray]:
+    """Pick the pickup day with the lowest expected cost per day of cover.
+
+    A pickup at the start of day d risks overflow on days before d, and its
+    cost is spread over the d + 1 days it covers. Day 0 means pick up today.
+    """
+    n, days = overflow_by_day.shape
+    risk_before = np.concatenate([np.zeros((n, 1), dtype=np.float32), overflow_by_day[:, :-1]], axis=1)
+    cover = np.arange(1, days + 1, dtype=np.float32)
+    cost = (pickup_cost + overflow_cost * risk_before) / cover
+    best = cost.argmin(axis=1)
+    best = np.where(overflow_by_day[:, -1] < MIN_RISK, -1, best)
+    return best, cost[np.arange(n), np.maximum(best, 0)]
+
+
+def plan_pickups(db: Session, days: int = 7, scenarios: int = 1000,
+                 overflow_cost: float = 10.0, pickup_cost: float = 1.0, seed: int | None = None,
+                 zone: str | None = None) -> dict:
+    started = time.perf_counter()
+    query = db.query(Bin.bin_id, Bin.current_fill_pct)
+    if zone is not None:
+        query = query.filter(Bin.zone == zone)
+    bins = query.order_by(Bin.bin_id).all()
+    bin_ids = [b for b, _ in bins]
+    current = np.array([f or 0 for _, f in bins], dtype=np.float64)
+
+    mean, std = daily_gain_stats(db, bin_ids, zone)
+    overflow = simulate_overflow(current, mean, std, days, scenarios, seed)
+    best, cost = recommend(overflow, overflow_cost, pickup_cost)
+
+    today = datetime.now(timezone.utc).date()
+    plan = []
+    for i, bin_id in enumerate(bin_ids):
+        day = int(best[i])
+        plan.append({
+            "bin_id": bin_id,
+            "current_fill": int(current[i]),
+            "daily_gain_mean": round(float(mean[i]), 2),
+            "daily_gain_std": round(float(std[i]), 2),
+            "recommended_day": day if day >= 0 else None,
+            "pickup_date": (today + timedelta(days=day)).isoformat() if day >= 0 else None,
+            "overflow_risk_before_pickup": round(float(overflow[i, day - 1]), 3) if day > 0 else 0.0,
+            "expected_cost_per_day": round(float(cost[i]), 3) if day >= 0 else 0.0,
+            "overflow_by_day": [round(float(p), 3) for p in overflow[i]],
+        })
+    plan.sort(key=lambda p: (p["recommended_day"] is None, p["recommended_day"] or 0, -p["current_fill"]))
+
+    return {
+        "days": days,
+        "scenarios": scenarios,
+        "bins": len(bin_ids),
+        "seconds": round(time.perf_counter() - started, 3),
+        "plan": plan,
+    }
@@ -0,0 +1,322 @@
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+PROFILE_DIR = "profiles"
+CONFIG_PATH = os.path.join(PROFILE_DIR, "config.json")
+SAMPLE_INTERVAL_SECONDS = 0.001
+MAX_STACK_DEPTH = 64
+SLOWEST_STATEMENTS = 10
+CONFIG_POLL_SECONDS = 2
+
+_current: ContextVar["RequestProfile | None"] = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.started_at = datetime.now(timezone.utc)
+        # thread id -> frame of the profiled() call running this request's code there
+        self.threads = {}
+        self.samples = Counter()
+        self.queries = []
+        self.status = None
+
+    def record_query(self, statement: str, seconds: float):
+        self.queries.append((seconds, statement))
+
+    def summary(self) -> dict:
+        total = time.perf_counter() - self.started
+        self_counts = Counter()
+        cumulative = Counter()
+        for stack, n in self.samples.items():
+            self_counts[stack[-1]] += n
+            for frame in set(stack):
+                cumulative[frame] += n
+        n_samples = sum(self.samples.values()) or 1
+
+        def fmt(frame):
+            filename, lineno, name = frame
+            return f"{name} ({filename}:{lineno})"
+
+        slowest = sorted(self.queries, reverse=True)[:SLOWEST_STATEMENTS]
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(total * 1000, 2),
+            "sql": {
+                "count": len(self.queries),
+                "total_ms": round(sum(s for s, _ in self.queries) * 1000, 2),
+                "slowest": [{"ms": round(s * 1000, 2), "statement": q} for s, q in slowest],
+            },
+            "samples": sum(self.samples.values()),
+            "top_self": [
+                {"function": fmt(f), "pct": round(100 * n / n_samples, 1)} for f, n in self_counts.most_common(25)
+            ],
+            "top_cumulative": [
+                {"function": fmt(f), "pct": round(100 * n / n_samples, 1)} for f, n in cumulative.most_common(25)
+            ],
+            "collapsed_stacks": [
+                ";".join(f"{name} ({os.path.basename(filename)})" for filename, _, name in stack) + f" {n}"
+                for stack, n in self.samples.most_common(200)
+            ],
+        }
+
+
+class Profiler:
+    """Opt-in request profiling: stack sampling plus SQL capture.
+
+    When disabled the middleware does one attribute check per request and
+    no SQLAlchemy listeners are attached. Settings are shared between
+    workers through profiles/config.json, which each worker polls.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.route_prefix = None
+        self.sample_rate = 1.0
+        self.max_profiles = 50
+        self._active = set()
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._engines = []
+        self._listening = False
+        self._config_mtime = None
+        self._poller = None
+        self._stop = threading.Event()
+
+    def settings(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "route_prefix": self.route_prefix,
+            "sample_rate": self.sample_rate,
+            "max_profiles": self.max_profiles,
+        }
+
+    def configure(self, enabled: bool, route_prefix: str | None = None,
+                  sample_rate: float = 1.0, max_profiles: int = 50, persist: bool = True):
+        self.route_prefix = route_prefix or None
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.max_profiles = max(1, max_profiles)
+        self.enabled = enabled
+        self._set_listeners(enabled)
+        if persist:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            tmp = f"{CONFIG_PATH}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.settings(), f)
+            os.replace(tmp, CONFIG_PATH)
+            self._config_mtime = os.stat(CONFIG_PATH).st_mtime_ns
+
+    def attach(self, *engines):
+        self._engines.extend(engines)
+
+    def _set_listeners(self, on: bool):
+        if on == self._listening:
+            return
+        for engine in self._engines:
+            if on:
+                event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+                event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+            else:
+                event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+                event.remove(engine, "after_cursor_execute", _after_cursor_execute)
+        self._listening = on
+
+    def should_profile(self, path: str) -> bool:
+        if self.route_prefix and not path.startswith(self.route_prefix):
+            return False
+        if path.startswith("/admin/profiling"):
+            return False
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def begin(self, profile: RequestProfile):
+        with self._lock:
+            self._active.add(profile)
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+                self._sampler.start()
+
+    def end(self, profile: RequestProfile):
+        with self._lock:
+            self._active.discard(profile)
+        self._write(profile.summary())
+
+    def _sample_loop(self):
+        while True:
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._sampler = None
+                    return
+            frames = sys._current_frames()
+            for profile in active:
+                for tid, root in list(profile.threads.items()):
+                    # Only the frames above this request's profiled() call count. An
+                    # async endpoint's frame is off the loop thread's stack while it
+                    # awaits, so other requests' work on that thread is not sampled.
+                    frame = frames.get(tid)
+                    stack = []
+                    while frame is not None and frame is not root:
+                        stack.append(frame)
+                        frame = frame.f_back
+                    if frame is None or not stack:
+                        continue
+                    stack = stack[:MAX_STACK_DEPTH]
+                    profile.samples[tuple(
+                        (f.f_code.co_filename, f.f_lineno, f.f_code.co_name) for f in reversed(stack)
+                    )] += 1
+            time.sleep(SAMPLE_INTERVAL_SECONDS)
+
+    def _write(self, summary: dict):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", summary["path"]).strip("_") or "root"
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        name = f"{stamp}_{summary['method']}_{slug}.json"
+        tmp = os.path.join(PROFILE_DIR, f".{name}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(summary, f)
+        os.replace(tmp, os.path.join(PROFILE_DIR, name))
+
+        artifacts = list_profiles()
+        for old in artifacts[self.max_profiles:]:
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old))
+            except FileNotFoundError:
+                pass
+
+    def start_polling(self):
+        if self._poller is None:
+            self._poll_config()
+            self._poller = threading.Thread(target=self._poll_loop, name="profiler-config", daemon=True)
+            self._poller.start()
+
+    def stop_polling(self):
+        self._stop.set()
+
+    def _poll_loop(self):
+        while not self._stop.wait(CONFIG_POLL_SECONDS):
+            self._poll_config()
+
+    def _poll_config(self):
+        try:
+            mtime = os.stat(CONFIG_PATH).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._config_mtime:
+            return
+        self._config_mtime = mtime
+        try:
+            with open(CONFIG_PATH) as f:
+                settings = json.load(f)
+        except ValueError:
+            return
+        self.configure(persist=False, **settings)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    starts = conn.info.get("profile_query_start")
+    if profile is not None and starts:
+        profile.record_query(statement, time.perf_counter() - starts.pop())
+
+
+def profiled(fn):
+    """Wrap fn so the thread running it is sampled for the current request, from its first line.
+
+    Endpoints get this through ProfiledRoute; async endpoints also wrap
+    the functions they hand to run_in_threadpool.
+    """
+    if getattr(fn, "_profiled", False):
+        return fn
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def run(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return await fn(*args, **kwargs)
+            tid = threading.get_ident()
+            profile.threads[tid] = sys._getframe()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                profile.threads.pop(tid, None)
+    else:
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return fn(*args, **kwargs)
+            tid = threading.get_ident()
+            profile.threads[tid] = sys._getframe()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.threads.pop(tid, None)
+    run._profiled = True
+    return run
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint registers its thread with the request's profile when it starts."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+def list_profiles() -> list[str]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    names = [f for f in os.listdir(PROFILE_DIR) if f.endswith(".json") and f != "config.json"]
+    return sorted(names, reverse=True)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not profiler.enabled or scope["type"] != "http" or not profiler.should_profile(scope["path"]):
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+            await send(message)
+
+        token = _current.set(profile)
+        profiler.begin(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            # summarising and writing the artifact is file I/O; keep it off the event loop
+            await run_in_threadpool(profiler.end, profile)
+
+
+profiler = Profiler()
@@ -0,0 +1,26 @@
+import argparse
+import json
+
+from model_training import rebuild_all, REBUILD_WORKERS, REBUILD_CHUNK_BINS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild every bin's fill model in parallel.")
+    parser.add_argument("--workers", type=int, default=REBUILD_WORKERS)
+    parser.add_argument("--chunk-bins", type=int, default=REBUILD_CHUNK_BINS)
+    parser.add_argument("--clear", action="store_true", help="drop models for bins that could not be trained")
+    args = parser.parse_args()
+
+    def progress(exported=None, trained=None):
+        if exported is not None:
+            print(f"exported history for {exported} bins")
+        if trained is not None:
+            print(f"trained {trained} models", end="\r")
+
+    report = rebuild_all(args.workers, args.chunk_bins, args.clear, progress)
+    print()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
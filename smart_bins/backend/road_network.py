@@ -0,0 +1,411 @@
+import bz2
+import gzip
+import heapq
+import math
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+import numpy as np
+
+ROAD_NETWORK_PATH = os.getenv("ROAD_NETWORK_PATH", "")
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "20000"))
+# Snapped points further than this from any road are rejected.
+MAX_SNAP_METERS = float(os.getenv("ROUTE_MAX_SNAP_METERS", "2000"))
+EARTH_RADIUS_M = 6371008.8
+SNAP_CELL_DEG = 0.01
+
+# Free-flow speeds (km/h) for roads a collection truck may use, when the way has no maxspeed.
+SPEEDS_KPH = {
+    "motorway": 90, "motorway_link": 45,
+    "trunk": 80, "trunk_link": 40,
+    "primary": 60, "primary_link": 30,
+    "secondary": 50, "secondary_link": 25,
+    "tertiary": 40, "tertiary_link": 20,
+    "unclassified": 30, "residential": 25, "living_street": 10,
+    "service": 15, "road": 25,
+}
+ONEWAY_YES = {"yes", "1", "true"}
+NO_ACCESS = {"no", "private"}
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres; works on floats or numpy arrays."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def _speed_kph(tags: dict) -> float:
+    raw = tags.get("maxspeed", "")
+    digits = raw.split()[0] if raw else ""
+    if digits.isdigit():
+        kph = float(digits) * (1.609 if "mph" in raw else 1.0)
+        if kph > 0:
+            return kph
+    return SPEEDS_KPH[tags["highway"]]
+
+
+def parse_osm(path: str):
+    """Drivable ways from an OSM XML extract (.osm, .osm.gz or .osm.bz2).
+
+    Returns (node coordinates by OSM id, [(node ids, km/h, direction)]) where
+    direction is 1 for forward-only, -1 for reverse-only and 0 for both.
+    """
+    opener = bz2.open if path.endswith(".bz2") else gzip.open if path.endswith(".gz") else open
+    coords, ways = {}, []
+    with opener(path, "rb") as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        for event, el in context:
+            if event != "end":
+                continue
+            if el.tag == "node":
+                coords[int(el.get("id"))] = (float(el.get("lat")), float(el.get("lon")))
+                root.clear()
+            elif el.tag == "way":
+                tags = {t.get("k"): t.get("v") for t in el.iter("tag")}
+                if (tags.get("highway") in SPEEDS_KPH and tags.get("area") != "yes"
+                        and tags.get("access") not in NO_ACCESS and tags.get("motor_vehicle") not in NO_ACCESS):
+                    oneway = tags.get("oneway", "")
+                    if oneway == "-1":
+                        direction = -1
+                    elif (oneway in ONEWAY_YES or tags.get("junction") in ("roundabout", "circular")
+                          or (tags["highway"] == "motorway" and oneway != "no")):
+                        direction = 1
+                    else:
+                        direction = 0
+                    ways.append(([int(n.get("ref")) for n in el.iter("nd")], _speed_kph(tags), direction))
+                root.clear()
+    return coords, ways
+
+
+def _csr(n: int, src: np.ndarray, dst: np.ndarray, *weights: np.ndarray):
+    order = np.argsort(src, kind="stable")
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+    return (offsets, dst[order].astype(np.int32), *(w[order] for w in weights))
+
+
+def build_graph(coords: dict, ways: list) -> dict:
+    """CSR adjacency with travel seconds and metres per edge, plus node coordinates."""
+    src, dst, kph = [], [], []
+    for refs, speed, direction in ways:
+        refs = [r for r in refs if r in coords]
+        for a, b in zip(refs, refs[1:]):
+            if a == b:
+                continue
+            if direction >= 0:
+                src.append(a), dst.append(b), kph.append(speed)
+            if direction <= 0:
+                src.append(b), dst.append(a), kph.append(speed)
+
+    osm_ids = np.unique(np.array(src + dst, dtype=np.int64))
+    lat = np.array([coords[i][0] for i in osm_ids], dtype=np.float64)
+    lon = np.array([coords[i][1] for i in osm_ids], dtype=np.float64)
+    src = np.searchsorted(osm_ids, np.array(src, dtype=np.int64))
+    dst = np.searchsorted(osm_ids, np.array(dst, dtype=np.int64))
+    meters = haversine_m(lat[src], lon[src], lat[dst], lon[dst]).astype(np.float32)
+    seconds = (meters / (np.array(kph, dtype=np.float32) / 3.6)).astype(np.float32)
+
+    n = len(osm_ids)
+    offsets, targets, w_seconds, w_meters = _csr(n, src, dst, seconds, meters)
+    r_offsets, r_targets = _csr(n, dst, src)
+    return {
+        "lat": lat, "lon": lon,
+        "offsets": offsets, "targets": targets, "seconds": w_seconds, "meters": w_meters,
+        "component": _routable_nodes(n, offsets, targets, r_offsets, r_targets),
+        "max_speed": np.float32(max(kph) / 3.6 if kph else 1.0),
+    }
+
+
+def _routable_nodes(n, offsets, targets, r_offsets, r_targets) -> np.ndarray:
+    """Mask of nodes that can reach, and be reached from, the best-connected node.
+
+    Snapping only to these nodes keeps clipped road stubs at the edge of an
+    extract from producing unreachable legs.
+    """
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    degree = np.diff(offsets)
+    start = int(degree.argmax())
+
+    def reach(off, tgt):
+        off, tgt = memoryview(np.ascontiguousarray(off)), memoryview(np.ascontiguousarray(tgt))
+        seen = bytearray(n)
+        seen[start] = 1
+        stack = [start]
+        while stack:
+            u = stack.pop()
+            for i in range(off[u], off[u + 1]):
+                v = tgt[i]
+                if not seen[v]:
+                    seen[v] = 1
+                    stack.append(v)
+        return np.frombuffer(bytes(seen), dtype=np.uint8).astype(bool)
+
+    return reach(offsets, targets) & reach(r_offsets, r_targets)
+
+
+class LegCache:
+    """LRU of routed legs keyed by (from node, to node)."""
+
+    def __init__(self, size: int = ROUTE_CACHE_SIZE):
+        self.size = size
+        self._legs = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            leg = self._legs.get(key)
+            if leg is None:
+                self.misses += 1
+                return None
+            self._legs.move_to_end(key)
+            self.hits += 1
+            return leg
+
+    def put(self, key, leg):
+        with self._lock:
+            self._legs[key] = leg
+            self._legs.move_to_end(key)
+            while len(self._legs) > self.size:
+                self._legs.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._legs.clear()
+
+    def __len__(self):
+        return len(self._legs)
+
+
+class RoadNetwork:
+    """A road graph loaded from an OpenStreetMap extract, routed in-process.
+
+    The graph is kept as CSR arrays (node offsets into flat target/weight
+    arrays). Legs use A* on travel time with a straight-line-at-top-speed
+    heuristic, matrices use one-to-many Dijkstra that stops once every
+    target is settled. The compiled graph is cached next to the extract as
+    .npz so restarts skip the XML parse.
+    """
+
+    def __init__(self, path: str = ROAD_NETWORK_PATH):
+        self.path = path
+        self.legs = LegCache()
+        self.loaded_at = None
+        self.load_seconds = None
+        self.error = None
+        self._graph = None
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self._graph is not None
+
+    def load(self, path: str | None = None):
+        path = path or self.path
+        started = time.perf_counter()
+        cache = path + ".graph.npz"
+        if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+            with np.load(cache) as data:
+                arrays = {k: data[k] for k in data.files}
+        else:
+            arrays = build_graph(*parse_osm(path))
+            tmp = cache + ".tmp.npz"
+            np.savez(tmp, **arrays)
+            os.replace(tmp, cache)
+        self._install(arrays)
+        self.path = path
+        self.load_seconds = round(time.perf_counter() - started, 3)
+        self.loaded_at = time.time()
+
+    def _install(self, arrays: dict):
+        lat, lon = arrays["lat"], arrays["lon"]
+        # Earth-centred metres for the A* heuristic. The straight chord is
+        # never longer than the great-circle distance, which is never longer
+        # than the road, so it stays admissible however wide the extract;
+        # shrunk a hair for the float32 edge weights.
+        phi, lam = np.radians(lat), np.radians(lon)
+        scale = EARTH_RADIUS_M * (1 - 1e-6)
+        # The graph stays in numpy arrays (4-8 bytes per element, not a boxed
+        # Python number each). The search loops index memoryviews of them,
+        # which return plain ints and floats about as fast as lists do.
+        offsets, targets = np.ascontiguousarray(arrays["offsets"]), np.ascontiguousarray(arrays["targets"])
+        seconds, meters = np.ascontiguousarray(arrays["seconds"]), np.ascontiguousarray(arrays["meters"])
+        x, y, z = scale * np.cos(phi) * np.cos(lam), scale * np.cos(phi) * np.sin(lam), scale * np.sin(phi)
+        graph = {
+            "lat": lat, "lon": lon,
+            "x": memoryview(x), "y": memoryview(y), "z": memoryview(z),
+            "offsets": memoryview(offsets), "targets": memoryview(targets),
+            "seconds": memoryview(seconds), "meters": memoryview(meters),
+            "max_speed": float(arrays["max_speed"]),
+            "n_edges": len(targets),
+        }
+        cells = {}
+        main = np.nonzero(arrays["component"])[0]
+        keys = zip((lat[main] // SNAP_CELL_DEG).astype(int).tolist(), (lon[main] // SNAP_CELL_DEG).astype(int).tolist())
+        for node, key in zip(main.tolist(), keys):
+            cells.setdefault(key, []).append(node)
+        graph["cells"] = {k: np.array(v, dtype=np.int32) for k, v in cells.items()}
+        self.legs.clear()
+        self._graph = graph
+
+    def start(self):
+        """Load in the background so a large extract does not hold up startup."""
+        if not self.path or self._thread is not None:
+            return
+
+        def run():
+            try:
+                self.load()
+            except Exception as e:
+                self.error = str(e)
+                print("Road network load failed:", e)
+
+        self._thread = threading.Thread(target=run, name="road-network-load", daemon=True)
+        self._thread.start()
+
+    def status(self) -> dict:
+        g = self._graph
+        return {
+            "path": self.path or None,
+            "ready": g is not None,
+            "error": self.error,
+            "nodes": len(g["lat"]) if g else 0,
+            "edges": g["n_edges"] if g else 0,
+            "load_seconds": self.load_seconds,
+            "cached_legs": len(self.legs),
+            "cache_hits": self.legs.hits,
+            "cache_misses": self.legs.misses,
+        }
+
+    def snap(self, lat: float, lon: float) -> int | None:
+        g = self._graph
+        ci, cj = int(lat // SNAP_CELL_DEG), int(lon // SNAP_CELL_DEG)
+        # enough cells each way to cover MAX_SNAP_METERS; cells narrow east-west
+        # with latitude, so the longitude span grows as cos(lat) shrinks
+        cell_m = math.radians(SNAP_CELL_DEG) * EARTH_RADIUS_M
+        di = math.ceil(MAX_SNAP_METERS / cell_m)
+        dj = math.ceil(MAX_SNAP_METERS / (cell_m * max(math.cos(math.radians(lat)), 0.01)))
+        cells = [g["cells"].get((i, j)) for i in range(ci - di, ci + di + 1) for j in range(cj - dj, cj + dj + 1)]
+        cells = [c for c in cells if c is not None]
+        if not cells:
+            return None
+        nodes = np.concatenate(cells)
+        d = haversine_m(lat, lon, g["lat"][nodes], g["lon"][nodes])
+        k = int(d.argmin())
+        return int(nodes[k]) if d[k] <= MAX_SNAP_METERS else None
+
+    def _leg(self, a: int, b: int):
+        """(seconds, metres, node path) for the fastest a -> b, or None when unreachable."""
+        key = (a, b)
+        leg = self.legs.get(key)
+        if leg is not None:
+            return leg
+        g = self._graph
+        offsets, targets, seconds, meters = g["offsets"], g["targets"], g["seconds"], g["meters"]
+        xs, ys, zs = g["x"], g["y"], g["z"]
+        tx, ty, tz, inv_speed = xs[b], ys[b], zs[b], 1.0 / g["max_speed"]
+
+        dist = {a: 0.0}
+        parent = {a: (-1, 0.0)}
+        done = set()
+        heap = [(math.hypot(xs[a] - tx, ys[a] - ty, zs[a] - tz) * inv_speed, a)]
+        while heap:
+            _, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            if u == b:
+                break
+            done.add(u)
+            du = dist[u]
+            for i in range(offsets[u], offsets[u + 1]):
+                v = targets[i]
+                nd = du + seconds[i]
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    parent[v] = (u, meters[i])
+                    heapq.heappush(heap, (nd + math.hypot(xs[v] - tx, ys[v] - ty, zs[v] - tz) * inv_speed, v))
+        if b not in dist:
+            leg = (None, None, [])
+        else:
+            path, total_m, node = [], 0.0, b
+            while node != -1:
+                path.append(node)
+                node, m = parent[node]
+                total_m += m
+            path.reverse()
+            leg = (dist[b], total_m, path)
+        self.legs.put(key, leg)
+        return leg
+
+    def route(self, points: list[tuple[float, float]]) -> dict:
+        """Road route visiting points in order, with per-leg time and distance."""
+        g = self._graph
+        nodes = [self.snap(lat, lon) for lat, lon in points]
+        geometry, legs = [], []
+        total_s = total_m = 0.0
+        for k in range(len(points) - 1):
+            a, b = nodes[k], nodes[k + 1]
+            seconds, meters, path = self._leg(a, b) if a is not None and b is not None else (None, None, [])
+            legs.append({
+                "seconds": round(seconds, 1) if seconds is not None else None,
+                "meters": round(meters, 1) if meters is not None else None,
+            })
+            if seconds is None:
+                # no road path: draw the leg straight so the map stays complete
+                geometry.extend([list(points[k]), list(points[k + 1])])
+                continue
+            total_s += seconds
+            total_m += meters
+            geometry.append(list(points[k]))
+            geometry.extend(np.column_stack((g["lat"][path], g["lon"][path])).tolist())
+            geometry.append(list(points[k + 1]))
+        return {
+            "seconds": round(total_s, 1),
+            "meters": round(total_m, 1),
+            "legs": legs,
+            "unroutable": [i for i, n in enumerate(nodes) if n is None],
+            "geometry": geometry,
+        }
+
+    def _one_to_many(self, a: int, wanted: set) -> dict:
+        g = self._graph
+        offsets, targets, seconds = g["offsets"], g["targets"], g["seconds"]
+        dist = {a: 0.0}
+        found = {}
+        heap = [(0.0, a)]
+        remaining = set(wanted)
+        while heap and remaining:
+            du, u = heapq.heappop(heap)
+            if du > dist[u]:
+                continue
+            if u in remaining:
+                found[u] = du
+                remaining.discard(u)
+            for i in range(offsets[u], offsets[u + 1]):
+                v = targets[i]
+                nd = du + seconds[i]
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return found
+
+    def matrix(self, sources: list[tuple[float, float]], destinations: list[tuple[float, float]]) -> dict:
+        """Travel seconds from every source to every destination (None where unreachable)."""
+        src = [self.snap(lat, lon) for lat, lon in sources]
+        dst = [self.snap(lat, lon) for lat, lon in destinations]
+        wanted = {n for n in dst if n is not None}
+        rows = []
+        for a in src:
+            found = self._one_to_many(a, wanted) if a is not None else {}
+            rows.append([round(found[b], 1) if b in found else None for b in dst])
+        return {"seconds": rows}
+
+
+road_network = RoadNetwork()
@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from database import SessionLocal
-from models import Alert
-from schemas import AlertOut
+from database import SessionLocal, read_session
+from models import Alert, Task
+from schemas import AlertOut, AlertBulkResolve
 from auth import require_admin
+from fast_response import query_response
+from outbox import record_many, resolve_seconds, ALERT_RESOLVED, TASK_CANCELLED
+from map_grid import grid
+from alert_queue import alert_queue
+from zones import zone_scope, scoped
+from feature_store import apply_events
+from datetime import datetime
+from profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+ALERT_COLUMNS = [Alert.id, Alert.bin_id, Alert.zone, Alert.is_resolved, Alert.created_at, Alert.resolved_at]
 
 def get_db():
     db = SessionLocal()
@@ -14,11 +24,59 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
 @router.get("/active", response_model=list[AlertOut], dependencies=[Depends(require_admin)])
-def get_active_alerts(db: Session = Depends(get_db)):
-    return db.query(Alert).filter(Alert.is_resolved == False).all()
+def get_active_alerts(db: Session = Depends(get_read_db), zone: str | None = Depends(zone_scope)):
+    query = scoped(db.query(Alert), Alert.zone, zone).filter(Alert.is_resolved == False).order_by(Alert.priority.desc().nulls_last(), Alert.id)
+    return query_response(query, ALERT_COLUMNS)
+
+
+@router.get("/queue", dependencies=[Depends(require_admin)])
+def get_alert_queue(limit: int = Query(50, ge=1, le=200), offset: int = Query(0, ge=0, le=10000),
+                    zone: str | None = Depends(zone_scope)):
+    return {"total": alert_queue.count(zone), "alerts": alert_queue.top_alerts(limit, offset, zone)}
 
 
 @router.get("/resolved", response_model=list[AlertOut], dependencies=[Depends(require_admin)])
-def get_resolved_alerts(db: Session = Depends(get_db)):
-    return db.query(Alert).filter(Alert.is_resolved == True).all()
+def get_resolved_alerts(db: Session = Depends(get_read_db), zone: str | None = Depends(zone_scope)):
+    return scoped(db.query(Alert), Alert.zone, zone).filter(Alert.is_resolved == True).all()
+
+
+@router.post("/bulk/resolve", dependencies=[Depends(require_admin)])
+def resolve_alerts(body: AlertBulkResolve, db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    alerts = scoped(db.query(Alert), Alert.zone, zone).filter(Alert.id.in_(body.alert_ids), Alert.is_resolved == False).all()
+    now = datetime.utcnow()
+    events = []
+    for alert in alerts:
+        alert.is_resolved = True
+        alert.resolved_at = now
+        events.append((ALERT_RESOLVED, alert.bin_id, {"alert_id": alert.id, "resolve_seconds": resolve_seconds(alert, now)}))
+    resolved = [a.id for a in alerts]
+    bins = {a.bin_id for a in alerts}
+    # Resolved without a pickup, so open tasks are cancelled rather than completed.
+    bin_of = {a.id: a.bin_id for a in alerts}
+    tasks = db.query(Task).filter(Task.alert_id.in_(resolved), Task.status == "assigned").all() if resolved else []
+    for task in tasks:
+        task.status = "cancelled"
+        events.append((TASK_CANCELLED, bin_of[task.alert_id], {"task_id": task.id, "alert_id": task.alert_id, "worker_id": task.worker_id}))
+    cancelled = [t.id for t in tasks]
+    record_many(db, events)
+    apply_events(db, events, now)
+    db.commit()
+
+    still_open = {b for (b,) in db.query(Alert.bin_id).filter(
+        Alert.bin_id.in_(list(bins)), Alert.is_resolved == False
+    ).distinct().all()} if bins else set()
+    for bin_id in bins - still_open:
+        grid.set_alert(bin_id, False)
+    for task_id in cancelled:
+        alert_queue.remove_task(task_id)
+    for alert_id in resolved:
+        alert_queue.remove_alert(alert_id)
+    return {"resolved": resolved, "cancelled_tasks": cancelled, "skipped": sorted(set(body.alert_ids) - set(resolved))}
@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
 from collections import defaultdict, Counter
+import numpy as np
 
-from database import SessionLocal
+from database import read_session
 from models import Bin, FillHistory, Alert
+from zones import zone_scope, scoped
+from sketches import (load_window, fill_distribution, active_bins, top_full_bins, percentiles, hour_bucket, fold_history,
+                      FILL_LEVELS, HLL_RELATIVE_ERROR)
 
-router = APIRouter(prefix="/analytics", tags=["analytics"])
+from profiling import ProfiledRoute
+PERCENTILES = (0.5, 0.9, 0.99)
+
+router = APIRouter(prefix="/analytics", tags=["analytics"], route_class=ProfiledRoute)
 
 def get_db():
-    db = SessionLocal()
+    db = read_session()
     try:
         yield db
     finally:
@@ -17,20 +25,22 @@ def get_db():
 
 
 @router.get("/bin-distribution")
-def bin_distribution(db: Session = Depends(get_db)):
-    bins = db.query(Bin).all()
-    total = len(bins)
-    low = sum(1 for b in bins if (b.current_fill_pct or 0) < 50)
-    medium = sum(1 for b in bins if 50 <= (b.current_fill_pct or 0) < 80)
-    high = sum(1 for b in bins if (b.current_fill_pct or 0) >= 80)
+def bin_distribution(db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    """Bins at each fill level right now, counted in one aggregate over the bins table."""
+    fill = func.coalesce(Bin.current_fill_pct, 0)
+    count = lambda cond: func.coalesce(func.sum(case((cond, 1), else_=0)), 0)
+    total, low, medium, high = scoped(db.query(
+        func.count(Bin.id), count(fill < 50), count((fill >= 50) & (fill < 80)), count(fill >= 80)
+    ), Bin.zone, zone).one()
     return {"total_bins": total, "low": low, "medium": medium, "high": high}
 
 
 @router.get("/alerts-summary")
-def alerts_summary(db: Session = Depends(get_db)):
-    total_alerts = db.query(Alert).count()
-    active = db.query(Alert).filter(Alert.is_resolved == False).count()
-    resolved = db.query(Alert).filter(Alert.is_resolved == True).count()
+def alerts_summary(db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    alerts = scoped(db.query(Alert), Alert.zone, zone)
+    total_alerts = alerts.count()
+    active = alerts.filter(Alert.is_resolved == False).count()
+    resolved = alerts.filter(Alert.is_resolved == True).count()
     return {
         "total_alerts": total_alerts,
         "active_alerts": active,
@@ -39,38 +49,125 @@ def alerts_summary(db: Session = Depends(get_db)):
 
 
 @router.get("/hourly-waste")
-def hourly_waste(db: Session = Depends(get_db)):
+def hourly_waste(db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
     now = datetime.now(timezone.utc)
     start = now - timedelta(days=7)
 
-    rows = db.query(FillHistory).filter(FillHistory.ts >= start).order_by(
+    rows = scoped(db.query(FillHistory), FillHistory.zone, zone).filter(
+        FillHistory.ts >= start, FillHistory.quarantined == False
+    ).order_by(
         FillHistory.bin_id, FillHistory.ts
     ).all()
 
     counts = Counter()
+    added = Counter()
     prev = {}
 
     for r in rows:
         b = r.bin_id
         if b in prev and r.fill_pct > prev[b].fill_pct:
-            counts[r.ts.astimezone(timezone.utc).hour] += 1
+            hour = r.ts.astimezone(timezone.utc).hour
+            counts[hour] += 1
+            added[hour] += r.fill_pct - prev[b].fill_pct
         prev[b] = r
 
-    result = [{"hour": h, "count": counts.get(h, 0)} for h in range(24)]
+    # History is deadband-compressed, so "count" is the number of stored
+    # increases; "fill_added" is the total rise and does not depend on how
+    # many readings were kept.
+    result = [{"hour": h, "count": counts.get(h, 0), "fill_added": added.get(h, 0)} for h in range(24)]
     return {"last_7_days": result}
 
 
 @router.get("/frequent-full-bins")
-def frequent_full_bins(db: Session = Depends(get_db)):
-    rows = db.query(Alert).all()
-    c = Counter(a.bin_id for a in rows)
-    top = c.most_common(10)
-    return {"top_bins": [{"bin_id": b, "alerts": cnt} for b, cnt in top]}
+def frequent_full_bins(days: int | None = Query(None, ge=1), exact: bool = False,
+                       db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    start = datetime.now(timezone.utc) - timedelta(days=days) if days else datetime.min
+    if exact:
+        query = scoped(db.query(Alert.bin_id), Alert.zone, zone)
+        if days:
+            query = query.filter(Alert.created_at >= start.replace(tzinfo=None))
+        c = Counter(b for (b,) in query.all())
+        return {"top_bins": [{"bin_id": b, "alerts": cnt, "error": 0} for b, cnt in c.most_common(10)],
+                "alerts_total": sum(c.values()), "unlisted_max_alerts": 0}
+
+    # Counts are upper bounds: each bin raised between alerts - error and alerts.
+    top, floor, total = top_full_bins(load_window(db, start, zone=zone))
+    return {"top_bins": [{"bin_id": b, "alerts": cnt, "error": err} for b, (cnt, err) in top],
+            "alerts_total": total, "unlisted_max_alerts": floor}
+
+
+def _window_start(hours: int) -> datetime:
+    return hour_bucket(datetime.now(timezone.utc) - timedelta(hours=hours - 1))
+
+
+def _exact_deltas(db: Session, zone: str | None, start: datetime) -> dict:
+    """The same per-hour deltas the sketches hold, folded from stored history in the window.
+
+    Sketches fold every accepted reading and exact=true folds the stored,
+    deadband-thinned rows. Both weight each fill by how long it held, so
+    they measure the same bin-time statistic: fills agree to within
+    HISTORY_DEADBAND_PCT and active-bin hours to within one heartbeat.
+    """
+    rows = scoped(db.query(FillHistory.zone, FillHistory.bin_id, FillHistory.ts, FillHistory.fill_pct),
+                  FillHistory.zone, zone).filter(
+        FillHistory.ts >= start, FillHistory.quarantined == False
+    ).order_by(FillHistory.zone, FillHistory.bin_id, FillHistory.ts)
+    return fold_history(rows.yield_per(10000))
+
+
+def _exact_distribution(db: Session, zone: str | None, start: datetime) -> tuple[np.ndarray, dict]:
+    hist = np.zeros(FILL_LEVELS, dtype=np.int64)
+    daily = {}
+    for (_, hour), delta in _exact_deltas(db, zone, start).items():
+        hist += delta.hist
+        day = daily.setdefault(hour.date().isoformat(), np.zeros(FILL_LEVELS, dtype=np.int64))
+        day += delta.hist
+    return hist, daily
+
+
+@router.get("/fill-percentiles")
+def fill_percentiles(hours: int = Query(24, ge=1, le=24 * 366), exact: bool = False,
+                     db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    """Time-weighted fill distribution: the share of bin-time spent at each level."""
+    start = _window_start(hours)
+    if exact:
+        hist, _ = _exact_distribution(db, zone, start)
+    else:
+        hist, _ = fill_distribution(load_window(db, start, zone=zone))
+    return {
+        "window_hours": hours,
+        "bin_hours": round(int(hist.sum()) / 3600, 1),
+        "percentiles": {f"p{round(q * 100)}": v for q, v in percentiles(hist, PERCENTILES).items()},
+        "low": round(int(hist[:50].sum()) / 3600, 1),
+        "medium": round(int(hist[50:80].sum()) / 3600, 1),
+        "high": round(int(hist[80:].sum()) / 3600, 1),
+    }
+
+
+@router.get("/active-bins")
+def active_bins_per_hour(hours: int = Query(24, ge=1, le=24 * 366), exact: bool = False,
+                         db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    start = _window_start(hours)
+    if exact:
+        per_hour = defaultdict(set)
+        for (_, hour), delta in _exact_deltas(db, zone, start).items():
+            per_hour[hour] |= delta.bins
+        by_hour = {h: len(b) for h, b in per_hour.items() if b}
+        distinct = len(set().union(*per_hour.values()))
+    else:
+        by_hour, distinct = active_bins(load_window(db, start, zone=zone))
+    return {
+        "hours": [{"hour": h.isoformat(), "active_bins": round(by_hour[h])} for h in sorted(by_hour)],
+        "distinct_bins": round(distinct),
+        "relative_error": 0.0 if exact else round(HLL_RELATIVE_ERROR, 4),
+    }
 
 
 @router.get("/average-fill-time")
-def average_fill_time(db: Session = Depends(get_db)):
-    rows = db.query(FillHistory).order_by(FillHistory.bin_id, FillHistory.ts).all()
+def average_fill_time(db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    rows = scoped(db.query(FillHistory), FillHistory.zone, zone).filter(
+        FillHistory.quarantined == False
+    ).order_by(FillHistory.bin_id, FillHistory.ts).all()
     by = defaultdict(list)
 
     for r in rows:
@@ -100,8 +197,10 @@ def average_fill_time(db: Session = Depends(get_db)):
 
 
 @router.get("/overflow-incidents")
-def overflow_incidents(db: Session = Depends(get_db)):
-    rows = db.query(FillHistory).filter(FillHistory.fill_pct >= 100).order_by(
+def overflow_incidents(db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    rows = scoped(db.query(FillHistory), FillHistory.zone, zone).filter(
+        FillHistory.fill_pct >= 100, FillHistory.quarantined == False
+    ).order_by(
         FillHistory.ts.desc()
     ).limit(50).all() 
 
@@ -114,26 +213,25 @@ def overflow_incidents(db: Session = Depends(get_db)):
 
 
 @router.get("/trend-30days")
-def trend_30days(db: Session = Depends(get_db)):
-    end = datetime.now(timezone.utc)
-    start = end - timedelta(days=30)
-
-    rows = db.query(FillHistory).filter(FillHistory.ts >= start).all()
-    by_day = defaultdict(list)
-
-    for r in rows:
-        by_day[r.ts.date().isoformat()].append(r.fill_pct)
-
-    result = [
-        {"date": day, "avg_fill": round(sum(vals) / len(vals), 2)}
-        for day, vals in sorted(by_day.items())
-    ]
-    return {"trend_30days": result}
+def trend_30days(exact: bool = False, db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    # Stored readings are sparse (deadband + heartbeat), so each fill is
+    # weighted by how long it stayed the bin's latest value rather than
+    # counted once; the sketches are weighted the same way on ingest.
+    if exact:
+        _, daily = _exact_distribution(db, zone, hour_bucket(start))
+    else:
+        _, daily = fill_distribution(load_window(db, start, zone=zone))
+    levels = np.arange(FILL_LEVELS)
+    return {"trend_30days": [
+        {"date": day, "avg_fill": round(float(hist @ levels) / int(hist.sum()), 2)}
+        for day, hist in sorted(daily.items()) if hist.sum()
+    ]}
 
 
 @router.get("/bin-utilization")
-def bin_utilization(db: Session = Depends(get_db)):
-    fill_time_data = average_fill_time(db) 
+def bin_utilization(db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    fill_time_data = average_fill_time(db, zone)
     per_bin = fill_time_data.get("per_bin_hours", {})
     
     high_count, medium_count, low_count, no_data_count = 0, 0, 0, 0
@@ -146,7 +244,7 @@ def bin_utilization(db: Session = Depends(get_db)):
         else: 
             low_count += 1
 
-    all_bins = db.query(Bin).count()
+    all_bins = scoped(db.query(Bin), Bin.zone, zone).count()
     no_data_count = all_bins - len(per_bin)
     
     return {
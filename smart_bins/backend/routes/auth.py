@@ -1,12 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from database import SessionLocal
 from models import User
-from schemas import UserCreate, LoginRequest, UserOut
+from schemas import UserCreate, LoginRequest, RefreshRequest, UserOut
 from auth import require_admin
 import auth
+from password_pool import password_pool
+from zones import zone_scope, scoped
+from profiling import ProfiledRoute, profiled
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 def get_db():
     db = SessionLocal()
@@ -15,37 +19,56 @@ def get_db():
     finally:
         db.close()
 
+def _find_user(db: Session, **filters):
+    return db.query(User).filter_by(**filters).first()
+
 @router.post("/register", response_model=UserOut)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    exists = db.query(User).filter(User.username == user.username).first()
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    exists = await run_in_threadpool(profiled(_find_user), db, username=user.username)
     if exists:
         raise HTTPException(400, "Username already exists")
 
-    hashed_pw = auth.hash_password(user.password)
-    new_user = User(username=user.username, password=hashed_pw, role=user.role)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
+    hashed_pw = await password_pool.hash(user.password)
+    new_user = User(username=user.username, password=hashed_pw, role=user.role, zone=user.zone)
+
+    def save():
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
+        return new_user
+
+    return await run_in_threadpool(profiled(save))
 
 @router.post("/login")
-def login(data: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == data.username).first()
+async def login(data: LoginRequest, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(profiled(_find_user), db, username=data.username)
 
-    if not user or not auth.verify_password(data.password, user.password):
+    if not user or not await password_pool.verify(data.password, user.password):
         raise HTTPException(401, "Invalid username/password")
 
-    token = auth.create_token({"user_id": user.id, "role": user.role})
-    return {"token": token, "role": user.role}
+    return auth.issue_tokens(user)
+
+@router.post("/refresh")
+def refresh(data: RefreshRequest, db: Session = Depends(get_db)):
+    user_id = auth.decode_refresh_token(data.refresh_token)
+    user = _find_user(db, id=user_id)
+    if not user:
+        raise HTTPException(401, "User not found")
+    return auth.issue_tokens(user)
+
+@router.get("/metrics", dependencies=[Depends(require_admin)])
+def password_pool_metrics():
+    return password_pool.metrics()
 
 @router.get("/users")
-def get_users(db: Session = Depends(get_db),dependencies=[Depends(require_admin)]):
-    users = db.query(User).all()
+def get_users(db: Session = Depends(get_db),dependencies=[Depends(require_admin)], zone: str | None = Depends(zone_scope)):
+    users = scoped(db.query(User), User.zone, zone).all()
     return [
         {
             "id": u.id,
             "username": u.username,
-            "role": u.role
+            "role": u.role,
+            "zone": u.zone
         }
         for u in users
     ]
\ No newline at end of file
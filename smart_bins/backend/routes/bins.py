@@ -1,11 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from database import SessionLocal
-from models import Bin
+from datetime import datetime, timedelta, timezone
+from database import SessionLocal, read_session
+from models import Bin, BinFeatures, FillHistory, Alert, Task
 from schemas import BinCreate, BinOut
 from auth import get_current_user, require_admin
+from fast_response import query_response
+from map_grid import grid
+from sensor_health import monitor
+from bin_io import import_bins, export_bins, ImportFormatError
+from zones import zone_scope, scoped, target_zone
+from feature_store import rename
+import io
+import tempfile
+from profiling import ProfiledRoute, profiled
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+BIN_COLUMNS = [Bin.id, Bin.bin_id, Bin.latitude, Bin.longitude, Bin.capacity_litres,
+               Bin.current_fill_pct, Bin.status, Bin.zone, Bin.created_at]
 
 def get_db():
     db = SessionLocal()
@@ -14,48 +30,139 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
 @router.post("/", response_model=BinOut, dependencies=[Depends(require_admin)])
-def create_bin(bin: BinCreate, db: Session = Depends(get_db)):
+def create_bin(bin: BinCreate, db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
     db_bin = db.query(Bin).filter(Bin.bin_id == bin.bin_id).first()
     if db_bin:
         raise HTTPException(status_code=400, detail="Bin ID already exists")
-    new_bin = Bin(bin_id=bin.bin_id, latitude=bin.latitude, longitude=bin.longitude, capacity_litres=bin.capacity_litres)
+    new_bin = Bin(bin_id=bin.bin_id, latitude=bin.latitude, longitude=bin.longitude, capacity_litres=bin.capacity_litres,
+                  zone=target_zone(bin.zone, zone))
     db.add(new_bin)
     db.commit()
     db.refresh(new_bin)
+    grid.upsert_bin(new_bin.bin_id, new_bin.latitude, new_bin.longitude, new_bin.current_fill_pct, zone=new_bin.zone)
     return new_bin
 
+def sync_grid(db: Session, bin_ids: list[str]):
+    rows = db.query(Bin.bin_id, Bin.latitude, Bin.longitude, Bin.current_fill_pct, Bin.zone).filter(
+        Bin.bin_id.in_(bin_ids)
+    ).all()
+    for bin_id, lat, lon, fill, zone in rows:
+        grid.upsert_bin(bin_id, lat, lon, fill, zone=zone)
+
+def move_zone(db: Session, bin_id: str, zone: str):
+    db.query(FillHistory).filter(FillHistory.bin_id == bin_id).update({"zone": zone}, synchronize_session=False)
+    alert_ids = db.query(Alert.id).filter(Alert.bin_id == bin_id).scalar_subquery()
+    db.query(Task).filter(Task.alert_id.in_(alert_ids)).update({"zone": zone}, synchronize_session=False)
+    db.query(Alert).filter(Alert.bin_id == bin_id).update({"zone": zone}, synchronize_session=False)
+
+@router.post("/import", dependencies=[Depends(require_admin)])
+async def import_bins_file(request: Request, format: str = Query("csv", pattern="^(csv|ndjson)$"),
+                           db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    with tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024) as spool:
+        async for block in request.stream():
+            spool.write(block)
+        spool.seek(0)
+        lines = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+        try:
+            return await run_in_threadpool(profiled(import_bins), db, lines, format, zone=zone,
+                                           on_chunk=lambda ids: sync_grid(db, ids))
+        except ImportFormatError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="file must be UTF-8")
+
+@router.get("/export", dependencies=[Depends(require_admin)])
+def export_bins_file(format: str = Query("csv", pattern="^(csv|ndjson)$"), zone: str | None = Depends(zone_scope)):
+    def stream():
+        db = read_session()
+        try:
+            yield from export_bins(db, format, zone)
+        finally:
+            db.close()
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename=bins.{format}"})
+
 @router.get("/", response_model=list[BinOut])
-def get_all_bins(db: Session = Depends(get_db)):
-    return db.query(Bin).all()
+def get_all_bins(db: Session = Depends(get_read_db), zone: str | None = Depends(zone_scope)):
+    return query_response(scoped(db.query(Bin), Bin.zone, zone).order_by(Bin.id), BIN_COLUMNS)
+
+@router.get("/clusters")
+def get_bin_clusters(south: float, west: float, north: float, east: float, zoom: int,
+                     zone: str | None = Depends(zone_scope)):
+    return {"zoom": zoom, "clusters": grid.clusters(south, west, north, east, zoom, zone)}
+
+@router.get("/sensor-health", dependencies=[Depends(require_admin)])
+def get_sensor_health(limit: int = Query(50, ge=1, le=1000), db: Session = Depends(get_read_db),
+                      zone: str | None = Depends(zone_scope)):
+    rows = scoped(db.query(Bin.id, Bin.bin_id, Bin.sensor_health), Bin.zone, zone).order_by(
+        Bin.sensor_health, Bin.id
+    ).limit(limit).all()
+    return [{"bin_id": bin_id, "score": score, **monitor.stats(i)} for i, bin_id, score in rows]
+
+@router.get("/{bin_id}/sensor-health", dependencies=[Depends(require_admin)])
+def get_bin_sensor_health(bin_id: str, days: int = 7, db: Session = Depends(get_read_db),
+                          zone: str | None = Depends(zone_scope)):
+    b = scoped(db.query(Bin.id, Bin.sensor_health), Bin.zone, zone).filter(Bin.bin_id == bin_id).first()
+    if not b:
+        raise HTTPException(status_code=404, detail="Bin not found")
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    count, last = db.query(func.count(FillHistory.id), func.max(FillHistory.ts)).filter(
+        FillHistory.bin_id == bin_id, FillHistory.quarantined == True, FillHistory.ts >= since
+    ).one()
+    return {
+        "bin_id": bin_id,
+        "score": b.sensor_health,
+        "quarantined_readings": count,
+        "last_quarantined_at": last,
+        **monitor.stats(b.id),
+    }
 
 @router.get("/{bin_id}", response_model=BinOut)
-def get_bin(bin_id: str, db: Session = Depends(get_db)):
-    b = db.query(Bin).filter(Bin.bin_id == bin_id).first()
+def get_bin(bin_id: str, db: Session = Depends(get_read_db), zone: str | None = Depends(zone_scope)):
+    b = scoped(db.query(Bin), Bin.zone, zone).filter(Bin.bin_id == bin_id).first()
     if not b:
         raise HTTPException(status_code=404, detail="Bin not found")
     return b
 
 @router.delete("/{bin_id}", dependencies=[Depends(require_admin)])
-def delete_bin(bin_id: str, db: Session = Depends(get_db)):
-    b = db.query(Bin).filter(Bin.bin_id == bin_id).first()
+def delete_bin(bin_id: str, db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    b = scoped(db.query(Bin), Bin.zone, zone).filter(Bin.bin_id == bin_id).first()
     if not b:
         raise HTTPException(status_code=404, detail="Bin not found")
+    db.query(BinFeatures).filter(BinFeatures.bin_id == bin_id).delete(synchronize_session=False)
     db.delete(b)
     db.commit()
+    grid.remove_bin(bin_id)
     return {"detail": "deleted"}
 
 @router.put("/{bin_id}", response_model=BinOut, dependencies=[Depends(require_admin)])
-def update_bin(bin_id: str, updated: BinCreate, db: Session = Depends(get_db)):
-    bin_obj = db.query(Bin).filter(Bin.bin_id == bin_id).first()
+def update_bin(bin_id: str, updated: BinCreate, db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    bin_obj = scoped(db.query(Bin), Bin.zone, zone).filter(Bin.bin_id == bin_id).first()
     if not bin_obj:
         raise HTTPException(status_code=404, detail="Bin not found")
 
-    bin_obj.bin_id = updated.bin_id
+    if updated.bin_id != bin_id:
+        rename(db, bin_obj, updated.bin_id)
     bin_obj.latitude = updated.latitude
     bin_obj.longitude = updated.longitude
     bin_obj.capacity_litres = updated.capacity_litres
+    if updated.zone is not None and updated.zone != bin_obj.zone:
+        bin_obj.zone = target_zone(updated.zone, zone)
+        move_zone(db, bin_id, bin_obj.zone)
 
     db.commit()
     db.refresh(bin_obj)
+    if bin_obj.bin_id != bin_id:
+        grid.remove_bin(bin_id)
+    grid.upsert_bin(bin_obj.bin_id, bin_obj.latitude, bin_obj.longitude, bin_obj.current_fill_pct, zone=bin_obj.zone)
     return bin_obj
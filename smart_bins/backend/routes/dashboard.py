@@ -1,13 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from database import SessionLocal
-from models import Bin, Alert, Task, User
+from database import read_session, replica
+from models import Bin, Alert, Task, User, DailyServiceStats
 from auth import get_current_user, require_admin
+from outbox import backlog
+from alert_queue import alert_queue
+from admission import admission
+from binary_ingest import udp_stats
+from config import BINARY_UDP_HOST, BINARY_UDP_PORT
+from zones import zone_scope, scoped
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 def get_db():
-    db = SessionLocal()
+    db = read_session()
     try:
         yield db
     finally:
@@ -15,16 +24,73 @@ def get_db():
 
 
 @router.get("/admin")
-def admin_dashboard(db: Session = Depends(get_db), user=Depends(require_admin)):
+def admin_dashboard(db: Session = Depends(get_db), user=Depends(require_admin), zone: str | None = Depends(zone_scope)):
+    tasks = scoped(db.query(Task), Task.zone, zone)
     return {
-        "total_bins": db.query(Bin).count(),
-        "active_alerts": db.query(Alert).filter(Alert.is_resolved == False).count(),
-        "workers": db.query(User).filter(User.role == "worker").count(),
-        "assigned_tasks": db.query(Task).filter(Task.status == "assigned").count(),
-        "completed_tasks": db.query(Task).filter(Task.status == "completed").count(),
+        "total_bins": scoped(db.query(Bin), Bin.zone, zone).count(),
+        "active_alerts": scoped(db.query(Alert), Alert.zone, zone).filter(Alert.is_resolved == False).count(),
+        "workers": scoped(db.query(User), User.zone, zone).filter(User.role == "worker").count(),
+        "assigned_tasks": tasks.filter(Task.status == "assigned").count(),
+        "completed_tasks": tasks.filter(Task.status == "completed").count(),
     }
 
 
+@router.get("/admin/service")
+def service_stats(days: int = 30, db: Session = Depends(get_db), user=Depends(require_admin),
+                  zone: str | None = Depends(zone_scope)):
+    since = date.today() - timedelta(days=days)
+    if zone is not None:
+        # daily_service_stats is fleet-wide; count one zone's alerts and tasks directly
+        return {"days": _zone_service_days(db, zone, datetime.combine(since, datetime.min.time()))}
+    rows = db.query(DailyServiceStats).filter(DailyServiceStats.day >= since).order_by(DailyServiceStats.day).all()
+    return {
+        "days": [_service_day(r.day, r.alerts_created, r.alerts_resolved, r.tasks_completed, r.resolve_seconds_total)
+                 for r in rows],
+        "outbox": backlog(db),
+    }
+
+
+def _service_day(day: date, created: int, resolved: int, completed: int, resolve_seconds: float) -> dict:
+    return {
+        "day": day.isoformat(),
+        "alerts_created": created,
+        "alerts_resolved": resolved,
+        "tasks_completed": completed,
+        "avg_resolve_hours": round(resolve_seconds / resolved / 3600, 2) if resolved else None,
+    }
+
+
+def _zone_service_days(db: Session, zone: str, since: datetime) -> list[dict]:
+    days = defaultdict(lambda: [0, 0, 0, 0.0])
+    for (created_at,) in db.query(Alert.created_at).filter(Alert.zone == zone, Alert.created_at >= since):
+        days[created_at.date()][0] += 1
+    for created_at, resolved_at in db.query(Alert.created_at, Alert.resolved_at).filter(
+        Alert.zone == zone, Alert.resolved_at >= since
+    ):
+        d = days[resolved_at.date()]
+        d[1] += 1
+        if created_at is not None:
+            d[3] += max((resolved_at.replace(tzinfo=None) - created_at.replace(tzinfo=None)).total_seconds(), 0.0)
+    for (completed_at,) in db.query(Task.completed_at).filter(Task.zone == zone, Task.completed_at >= since):
+        days[completed_at.date()][2] += 1
+    return [_service_day(day, *days[day]) for day in sorted(days)]
+
+
+@router.get("/admin/replica")
+def replica_status(user=Depends(require_admin)):
+    return replica.status()
+
+
+@router.get("/admin/admission")
+def admission_status(user=Depends(require_admin)):
+    return admission.metrics()
+
+
+@router.get("/admin/udp-ingest")
+def udp_ingest_status(user=Depends(require_admin)):
+    return {"enabled": bool(BINARY_UDP_PORT), "host": BINARY_UDP_HOST, "port": BINARY_UDP_PORT, **udp_stats}
+
+
 @router.get("/worker")
 def worker_dashboard(user=Depends(get_current_user), db: Session = Depends(get_db)):
     if user.role != "worker":
@@ -34,17 +100,16 @@ def worker_dashboard(user=Depends(get_current_user), db: Session = Depends(get_d
     completed = db.query(Task).filter(Task.worker_id == user.id, Task.status == "completed").count()
     pending = total - completed
 
-    next_task = db.query(Task).filter(
-        Task.worker_id == user.id,
-        Task.status == "assigned"
-    ).first()
+    next_task = alert_queue.next_task(user.id)
 
     return {
         "total_tasks": total,
         "completed_tasks": completed,
         "pending_tasks": pending,
         "next_task": {
-            "id": next_task.id,
-            "alert_id": next_task.alert_id,
+            "id": next_task["task_id"],
+            "alert_id": next_task["alert_id"],
+            "bin_id": next_task["bin_id"],
+            "score": next_task["score"],
         } if next_task else None
     }
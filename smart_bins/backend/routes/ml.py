@@ -1,69 +1,200 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, ORJSONResponse
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
-import numpy as np
-import joblib
+import json
 import os
-import traceback
-from collections import Counter, defaultdict
-
-from sklearn.linear_model import LinearRegression
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from sklearn.neighbors import NearestNeighbors
-
-from database import SessionLocal
-from models import Bin, FillHistory 
+import numpy as np
 
-router = APIRouter(prefix="/ml", tags=["ml"])
+from database import read_session
+from model_registry import registry, MODEL_DIR
+from model_training import read_metrics, rebuild_all
+from forecaster import hours_to_full_many, importance_scores, MIN_SAMPLES
+from feature_store import load_frame
+from evaluation import run_evaluation, list_runs, load_run, render_plot
+from planner import plan_pickups
+from auth import require_admin
+from zones import zone_scope
+import threading
+from profiling import ProfiledRoute
 
-MODEL_DIR = "models_store"
-os.makedirs(MODEL_DIR, exist_ok=True)
+router = APIRouter(prefix="/ml", tags=["ml"], route_class=ProfiledRoute)
 
 def get_db():
-    db = SessionLocal()
+    db = read_session()
     try:
         yield db
     finally:
         db.close()
 
-def load_or_train_model(bin_id: str, db: Session):
-    path = f"{MODEL_DIR}/{bin_id}.pkl"
+@router.get("/retrain/metrics")
+def retrain_metrics():
+    return read_metrics()
+
 
-    if os.path.exists(path):
+class JobStatus:
+    """Status of a background admin job, shared by every uvicorn worker.
+
+    The worker that starts the job holds an flock on lock_path until the job
+    ends, so a start from any other worker gets 409. Progress is written to
+    path the same way the retrain metrics are (tmp file + os.replace), so a
+    status request sees it whichever worker serves it.
+    """
+
+    def __init__(self, path: str, lock_path: str, **idle):
+        self.path = path
+        self.lock_path = lock_path
+        self.idle = {"running": False, **idle, "error": None}
+        self._state = None
+        self._fd = None
+
+    def acquire(self) -> bool:
+        try:
+            import fcntl
+        except ImportError:
+            if self._state is not None and self._state["running"]:
+                return False
+        else:
+            os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_RDWR)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            self._fd = fd
+        self._state = {**self.idle, "running": True}
+        self._write()
+        return True
+
+    def update(self, **fields):
+        self._state.update(fields)
+        self._write()
+
+    def release(self, **fields):
+        self._state.update(fields, running=False)
+        self._write()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def read(self) -> dict:
         try:
-            packed = joblib.load(path)
-            if isinstance(packed, dict) and "model" in packed and "t0" in packed:
-                return packed
-        except Exception:
-            pass
+            with open(self.path) as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return dict(self.idle)
+        if state.get("running") and self._fd is None and not self._held():
+            # the worker running it died without releasing the lock
+            state.update(running=False, error=state.get("error") or "interrupted")
+        return state
+
+    def _held(self) -> bool:
+        try:
+            import fcntl
+        except ImportError:
+            return True
+        try:
+            fd = os.open(self.lock_path, os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        finally:
+            os.close(fd)
+        return False
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._state, f)
+        os.replace(tmp, self.path)
+
+
+rebuild_status = JobStatus(os.path.join(MODEL_DIR, "rebuild_status.json"), os.path.join(MODEL_DIR, "rebuild.lock"),
+                           exported=0, trained=0, report=None)
+
+def _run_rebuild(workers: int | None, clear: bool):
+    def progress(exported=None, trained=None):
+        if exported is not None:
+            rebuild_status.update(exported=exported)
+        if trained is not None:
+            rebuild_status.update(trained=trained)
+
+    try:
+        kwargs = {"workers": workers} if workers else {}
+        rebuild_status.release(report=rebuild_all(clear=clear, progress=progress, **kwargs))
+    except Exception as e:
+        rebuild_status.release(error=str(e))
+
+
+@router.post("/models/rebuild", dependencies=[Depends(require_admin)])
+def rebuild_models(workers: int | None = None, clear: bool = False):
+    if not rebuild_status.acquire():
+        raise HTTPException(status_code=409, detail="Rebuild already running")
+    threading.Thread(target=_run_rebuild, args=(workers, clear), daemon=True).start()
+    return rebuild_status.read()
 
-    rows = db.query(FillHistory).filter(
-        FillHistory.bin_id == bin_id,
-        FillHistory.fill_pct >= 0
-    ).order_by(FillHistory.ts.desc()).limit(1000).all()
-    rows = list(reversed(rows))
 
-    if len(rows) < 5:
-        raise HTTPException(status_code=400, detail="insufficient_data")
+@router.get("/models/rebuild", dependencies=[Depends(require_admin)])
+def rebuild_models_status():
+    return rebuild_status.read()
 
-    rows = list(reversed(rows))
-    t0 = rows[0].ts
-    X = np.array([(r.ts - t0).total_seconds() / 3600.0 for r in rows]).reshape(-1, 1)
-    y = np.array([r.fill_pct for r in rows])
 
-    model = LinearRegression().fit(X, y)
+def _predictions(frame: dict, now: datetime) -> dict:
+    """Fill forecasts for every bin in the frame, with the same rules as a single-bin prediction."""
+    slope, profile, found = registry.get_many(list(frame["bin_id"]))
+    # Bins the retrain worker has not reached yet use their long-run EWMA rate.
+    fallback = ~found & (frame["samples"] >= MIN_SAMPLES) & ~np.isnan(frame["ewma_rate_long"])
+    slope = np.where(fallback, frame["ewma_rate_long"], slope)
+    usable = found | fallback
+    slope = np.where(usable & ~np.isnan(slope), slope, 0.0)
 
-    packed = {"model": model, "t0": t0}
-    joblib.dump(packed, path)
+    fill = np.where(frame["has_data"], frame["fill"], 0.0)
+    hours = hours_to_full_many(slope, profile, fill, now.timestamp())
+    hours = np.where(slope > 0.05, hours, np.nan)
+    full = fill >= 99
+    hours[full] = 0.0
 
-    return packed
+    status = np.full(len(fill), "slow_or_no_fill", dtype=object)
+    status[~np.isnan(hours)] = "predicting"
+    status[hours <= 0] = "already_full"
+    status[~usable] = "insufficient_data"
+    status[~frame["has_data"]] = "no_sensor_data"
+    hours[~usable | ~frame["has_data"]] = np.nan
+    return {"current_fill": fill, "hours_left": np.round(hours, 2), "status": status, "slope": np.round(slope, 3)}
+
+
+def _prediction_rows(frame: dict, pred: dict, now: datetime) -> list[dict]:
+    return [
+        {
+            "bin_id": bin_id,
+            "current_fill": int(fill),
+            "hours_left": None if np.isnan(h) else float(h),
+            "eta_iso": None if np.isnan(h) else (now + timedelta(hours=float(h))).isoformat(),
+            "status": status,
+            "slope": float(slope),
+        }
+        for bin_id, fill, h, status, slope in zip(
+            frame["bin_id"], pred["current_fill"], pred["hours_left"], pred["status"], pred["slope"]
+        )
+    ]
+
+
+def _importance(frame: dict, now: datetime) -> np.ndarray:
+    pred = _predictions(frame, now)
+    return importance_scores(pred["current_fill"], pred["hours_left"], pred["status"], pred["slope"])
 
 
 @router.get("/predict/{bin_id}")
-def predict_for_bin(bin_id: str, db: Session = Depends(get_db)):
-    latest = db.query(FillHistory).filter(FillHistory.bin_id == bin_id).order_by(FillHistory.ts.desc()).first()
-    if not latest:
+def predict_for_bin(bin_id: str, db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    frame = load_frame(db, zone, bin_ids=[bin_id])
+    if zone is not None and not len(frame["bin_id"]):
+        raise HTTPException(status_code=404, detail="Bin not found")
+    if not len(frame["bin_id"]) or not frame["has_data"][0]:
         return {
             "bin_id": bin_id,
             "current_fill": 0,
@@ -72,125 +203,42 @@ def predict_for_bin(bin_id: str, db: Session = Depends(get_db)):
             "status": "no_sensor_data",
             "slope": 0.0
         }
-
-    try:
-        packed = load_or_train_model(bin_id, db)
-        model = packed["model"]
-        t0 = packed["t0"]
-
-        slope = float(model.coef_[0])
-        
-        target_fill = 100.0
-        
-        hours_left = None
-        eta = None
-        status = "slow_or_no_fill"
-
-        if latest.fill_pct >= 99:
-            hours_left = 0.0
-            eta = datetime.now(timezone.utc)
-            status = "already_full"
-        elif slope > 0.05:
-            fill_remaining = target_fill - latest.fill_pct
-            if fill_remaining > 0:
-                hours_left = fill_remaining / slope
-                eta = datetime.now(timezone.utc) + timedelta(hours=hours_left)
-                status = "predicting"
-            else: # If fill_remaining is 0 or negative, it means it's effectively full or over
-                hours_left = 0.0
-                eta = datetime.now(timezone.utc)
-                status = "already_full"
-        
-    except HTTPException as e:
-        slope = 0.0
-        hours_left = None
-        eta = None
-        status = e.detail
-    except Exception as e:
-        slope = 0.0
-        hours_left = None
-        eta = None
-        status = "prediction_error"
-
-    return {
-        "bin_id": bin_id,
-        "current_fill": latest.fill_pct,
-        "hours_left": round(hours_left, 2) if hours_left is not None else None,
-        "eta_iso": eta.isoformat() if eta else None,
-        "status": status,
-        "slope": round(slope, 3)
-    }
+    # A bin without a model is served from its EWMA rate; stale_bins puts
+    # untrained bins first, so the retrain worker fits it on its next pass.
+    now = datetime.now(timezone.utc)
+    return _prediction_rows(frame, _predictions(frame, now), now)[0]
 
 @router.get("/predictions")
-def predict_all(db: Session = Depends(get_db)):
-    bins = db.query(Bin).all()
-    results = []
-
-    for b in bins:
-        res = predict_for_bin(b.bin_id, db=db)
-        results.append(res)
-    results.sort(key=lambda x: x.get('hours_left') if x.get('hours_left') is not None else float('inf'))
-    return {"predictions": results}
-
-def calculate_bin_importance_score(
-    current_fill: float,
-    hours_left: float | None,
-    status: str,
-    slope: float
-) -> float:
-    score = 0.0
-
-    score += current_fill * 0.5
-
-    if status == "already_full":
-        score += 100
-    elif hours_left is not None and hours_left <= 48:
-        score += (48 - hours_left) * (100 / 48.0)
-    elif hours_left is None and current_fill >= 90:
-        score += 50
-
-    if slope > 0:
-        score += min(slope * 10, 20)
-
-    if score < 1.0 and (current_fill > 0 or slope > 0 or status == "predicting"):
-        score = 1.0
-    
-    return min(score, 150.0)
+def predict_all(db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    frame = load_frame(db, zone)
+    now = datetime.now(timezone.utc)
+    pred = _predictions(frame, now)
+    results = _prediction_rows(frame, pred, now)
+    order = np.argsort(np.nan_to_num(pred["hours_left"], nan=np.inf), kind="stable")
+    return ORJSONResponse({"predictions": [results[i] for i in order]})
+
+@router.get("/plan")
+def pickup_plan(days: int = Query(7, ge=1, le=30),
+                scenarios: int = Query(1000, ge=10, le=10000),
+                overflow_cost: float = Query(10.0, gt=0),
+                pickup_cost: float = Query(1.0, gt=0),
+                db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    return ORJSONResponse(plan_pickups(db, days, scenarios, overflow_cost, pickup_cost, zone=zone))
 
 @router.get("/hotspots")
-def hotspots(db: Session = Depends(get_db)):
-    bins = db.query(Bin).all()
-    
-    data_for_clustering = []
-    bin_metadata = []
+def hotspots(db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import StandardScaler
 
-    for b in bins:
-        try:
-            prediction_res = predict_for_bin(b.bin_id, db)
-            
-            current_fill = prediction_res.get("current_fill", 0)
-            hours_left = prediction_res.get("hours_left")
-            status = prediction_res.get("status", "unknown")
-            bin_slope = prediction_res.get("slope", 0.0)
-
-            importance_score = calculate_bin_importance_score(
-                current_fill=current_fill,
-                hours_left=hours_left,
-                status=status,
-                slope=bin_slope
-            )
-
-            if importance_score > 0 and b.latitude is not None and b.longitude is not None:
-                data_for_clustering.append([float(b.latitude), float(b.longitude), importance_score])
-                bin_metadata.append({"bin_id": b.bin_id, "latitude": float(b.latitude), "longitude": float(b.longitude), "importance_score": importance_score})
-
-        except Exception as e:
-            pass
-
-    if len(data_for_clustering) < 2:
+    frame = load_frame(db, zone)
+    importance = _importance(frame, datetime.now(timezone.utc))
+    keep = np.flatnonzero((importance > 0) & ~np.isnan(frame["latitude"]) & ~np.isnan(frame["longitude"]))
+
+    if len(keep) < 2:
         return {"hotspot_centers": []}
 
-    X = np.array(data_for_clustering)
+    X = np.column_stack([frame["latitude"][keep], frame["longitude"][keep], importance[keep]])
+    bin_ids = frame["bin_id"][keep]
     
     lat_lon_scaler = StandardScaler()
     X_lat_lon_scaled = lat_lon_scaler.fit_transform(X[:, :2])
@@ -220,15 +268,13 @@ def hotspots(db: Session = Depends(get_db)):
         avg_lon = np.mean(original_cluster_points[:, 1])
         avg_importance = np.mean(original_cluster_points[:, 2])
 
-        bins_in_cluster = [bin_metadata[idx] for idx in cluster_points_indices]
-        
         hotspot_centers.append({
             "cluster_id": int(i),
             "latitude": float(avg_lat),
             "longitude": float(avg_lon),
             "average_importance_score": round(float(avg_importance), 2),
-            "num_bins_in_hotspot": len(bins_in_cluster),
-            "example_bin_ids": sorted([bm["bin_id"] for bm in bins_in_cluster], key=lambda x: bin_metadata[np.where([b['bin_id'] == x for b in bin_metadata])[0][0]]['importance_score'], reverse=True)[:3]
+            "num_bins_in_hotspot": len(cluster_points_indices),
+            "example_bin_ids": [str(b) for b in bin_ids[cluster_points_indices[np.argsort(-original_cluster_points[:, 2], kind="stable")]][:3]]
         })
     
     hotspot_centers.sort(key=lambda x: x.get('average_importance_score', 0), reverse=True)
@@ -236,38 +282,23 @@ def hotspots(db: Session = Depends(get_db)):
     return {"hotspot_centers": hotspot_centers}
 
 @router.get("/patterns")
-def detect_patterns(db: Session = Depends(get_db)):
-    try:
-        from routes.analytics import average_fill_time
-        fill_time_data = average_fill_time(db)
-        per_bin_avg_hours = fill_time_data.get("per_bin_hours", {})
-    except ImportError:
-        per_bin_avg_hours = {}
-    except Exception as e:
-        per_bin_avg_hours = {}
-
-    all_bins = db.query(Bin).all()
-    current_fills = {b.bin_id: b.current_fill_pct for b in all_bins}
-
-    patterns = defaultdict(list)
-
-    for bin_id, avg_hours in per_bin_avg_hours.items():
-        if avg_hours is None:
-            continue
-        if avg_hours < 12:
-            patterns["very_fast_filling_bins"].append(bin_id)
-        elif avg_hours < 24:
-            patterns["fast_filling_bins"].append(bin_id)
-        elif avg_hours > 72:
-            patterns["slow_filling_bins"].append(bin_id)
-
-    for bin_id, fill_pct in current_fills.items():
-        if fill_pct is None:
-            continue
-        if fill_pct >= 90 and bin_id in patterns["fast_filling_bins"]:
-            patterns["critical_pickup_needed"].append(bin_id)
-        if fill_pct < 10 and bin_id in patterns["slow_filling_bins"]:
-            patterns["rarely_used_or_oversized"].append(bin_id)
+def detect_patterns(db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    frame = load_frame(db, zone)
+    avg_hours = frame["avg_fill_hours"]
+    fill = frame["fill"]
+    bin_ids = frame["bin_id"]
+    with np.errstate(invalid="ignore"):
+        very_fast = avg_hours < 12
+        fast = (avg_hours >= 12) & (avg_hours < 24)
+        slow = avg_hours > 72
+
+    patterns = {
+        "very_fast_filling_bins": list(bin_ids[very_fast]),
+        "fast_filling_bins": list(bin_ids[fast]),
+        "slow_filling_bins": list(bin_ids[slow]),
+        "critical_pickup_needed": list(bin_ids[fast & (fill >= 90)]),
+        "rarely_used_or_oversized": list(bin_ids[slow & (fill < 10)]),
+    }
 
     result_patterns = []
     if patterns["critical_pickup_needed"]:
@@ -301,8 +332,7 @@ def detect_patterns(db: Session = Depends(get_db)):
             "insight": "These bins are consistently empty despite being slow to fill. May be oversized or in very low-usage areas."
         })
 
-    bins_with_data = set(per_bin_avg_hours.keys())
-    no_fill_history_bins = [b.bin_id for b in all_bins if b.bin_id not in bins_with_data and current_fills.get(b.bin_id) is not None]
+    no_fill_history_bins = list(bin_ids[np.isnan(avg_hours)])
     if no_fill_history_bins:
         result_patterns.append({
             "type": "New/No Data Bins",
@@ -313,131 +343,67 @@ def detect_patterns(db: Session = Depends(get_db)):
     return {"patterns": result_patterns}
 
 
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-import math
-
-
-@router.get("/eval/regression")
-def evaluate_regression(db: Session = Depends(get_db)):
-    
-    bins = db.query(Bin).all()
-
-    actual_times = []
-    predicted_times = []
-    evaluated_bins = []
-
-    for b in bins:
-        try:
-            result = predict_for_bin(b.bin_id, db)
-            pred_hours = result.get("hours_left")
-            if pred_hours is None:
-                continue
-
-            rows = db.query(FillHistory).filter(
-                FillHistory.bin_id == b.bin_id
-            ).order_by(FillHistory.ts.desc()).limit(1000).all()
-            rows = list(reversed(rows))
-
+eval_status = JobStatus(os.path.join(MODEL_DIR, "eval_status.json"), os.path.join(MODEL_DIR, "eval.lock"),
+                        chunks_done=0, chunks_total=0, run_id=None)
 
-            if not rows or len(rows) < 2:
-                continue
+def _run_evaluation(workers: int | None):
+    def progress(chunks_done, chunks_total):
+        eval_status.update(chunks_done=chunks_done, chunks_total=chunks_total)
 
-            full_rows = [r for r in rows if r.fill_pct >= 99]
-            if not full_rows:
-                continue
+    try:
+        kwargs = {"workers": workers} if workers else {}
+        eval_status.release(run_id=run_evaluation(progress=progress, **kwargs)["run_id"])
+    except Exception as e:
+        eval_status.release(error=str(e))
 
-            t0 = rows[0].ts
-            t_full = full_rows[0].ts
-            actual_hours = (t_full - t0).total_seconds() / 3600.0
 
-            actual_times.append(actual_hours)
-            predicted_times.append(float(pred_hours))
-            evaluated_bins.append(b.bin_id)
+@router.post("/eval/runs", dependencies=[Depends(require_admin)])
+def start_evaluation(workers: int | None = None):
+    if not eval_status.acquire():
+        raise HTTPException(status_code=409, detail="Evaluation already running")
+    threading.Thread(target=_run_evaluation, args=(workers,), daemon=True).start()
+    return eval_status.read()
 
-        except Exception as e:
-            print("Evaluation skipped for bin", b.bin_id, "error:", e)
-            continue
 
-    n = len(actual_times)
-    if n == 0:
-        raise HTTPException(status_code=400, detail="No bins with both prediction and full-history available for evaluation")
-    if n == 1:
-        mse = mean_squared_error(actual_times, predicted_times)  
-        rmse = float(mse) ** 0.5
-
-        mae = float(mean_absolute_error(actual_times, predicted_times))
-        r2 = float(r2_score(actual_times, predicted_times)) if len(actual_times) > 1 else float("nan")
-    else:
-        mse = mean_squared_error(actual_times, predicted_times)  
-        rmse = float(mse) ** 0.5
-        mae = float(mean_absolute_error(actual_times, predicted_times))
-        r2 = float(r2_score(actual_times, predicted_times))
+@router.get("/eval/runs")
+def evaluation_runs(zone: str | None = Depends(zone_scope)):
+    runs = list_runs()
+    if zone is not None:
+        runs = [r for r in runs if load_run(r, zone) is not None]
+    return {"status": eval_status.read(), "runs": runs}
 
-    return {
-        "bins_evaluated": n,
-        "bin_ids": evaluated_bins,
-        "RMSE_hours": round(rmse, 3),
-        "MAE_hours": round(mae, 3),
-        "R2_score": None if math.isnan(r2) else round(r2, 3),
-        "actual_hours": [round(float(x), 3) for x in actual_times],
-        "predicted_hours": [round(float(x), 3) for x in predicted_times]
-    }
 
-import matplotlib
-matplotlib.use('Agg')  
+@router.get("/eval/regression")
+def evaluate_regression(run_id: str | None = None, zone: str | None = Depends(zone_scope)):
+    run = load_run(run_id, zone)
+    if run is None:
+        raise HTTPException(status_code=404, detail="No evaluation run available; start one with POST /ml/eval/runs")
+    return run
 
-import matplotlib.pyplot as plt
-from io import BytesIO
-from fastapi.responses import StreamingResponse
 
 @router.get("/eval/regression/plot")
-def regression_plot():
-    actual = np.array([0.575, 146.99, 146.972, 31.948, 0.33, 95.913, 16.243, 0.032, 146.967, 0.324])
-    predicted = np.array([0, 16.94, 279.65, 85.58, 0, 103.39, 30.06, 40.04, 113.46, 0])
-    labels = ["RB777", "bin001", "bin003", "bin005", "bin008", "bin004", "bin006", "bin007", "bin002", "bin009"]
-
-    plt.figure(figsize=(10, 6))
-    plt.plot(labels, actual, marker='o')
-    plt.plot(labels, predicted, marker='o')
-    plt.xticks(rotation=45)
-    plt.xlabel("Bin ID")
-    plt.ylabel("Time-to-Full (Hours)")
-    plt.title("Actual vs Predicted Time-to-Full")
-    plt.legend(["Actual", "Predicted"])
-    plt.tight_layout()
-
-    buf = BytesIO()
-    plt.savefig(buf, format="png")
-    plt.close()
-    buf.seek(0)
-
-    return StreamingResponse(buf, media_type="image/png")
-
-from sklearn.metrics import silhouette_score
+def regression_plot(run_id: str | None = None, zone: str | None = Depends(zone_scope)):
+    run = load_run(run_id, zone)
+    if run is None:
+        raise HTTPException(status_code=404, detail="No evaluation run available; start one with POST /ml/eval/runs")
+    return FileResponse(render_plot(run), media_type="image/png")
 
 @router.get("/eval/hotspot-metrics")
-def evaluate_hotspots(db: Session = Depends(get_db)):
-    bins = db.query(Bin).all()
-    
-    data = []
-    for b in bins:
-        try:
-            result = predict_for_bin(b.bin_id, db)
-            imp = calculate_bin_importance_score(
-                result.get("current_fill", 0),
-                result.get("hours_left"),
-                result.get("status", "unknown"),
-                result.get("slope", 0.0)
-            )
-            if imp > 0 and b.latitude and b.longitude:
-                data.append([float(b.latitude), float(b.longitude), imp])
-        except:
-            continue
-
-    if len(data) < 3:
+def evaluate_hotspots(db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.metrics import silhouette_score
+
+    frame = load_frame(db, zone)
+    importance = _importance(frame, datetime.now(timezone.utc))
+    lat = np.nan_to_num(frame["latitude"])
+    lon = np.nan_to_num(frame["longitude"])
+    keep = (importance > 0) & (lat != 0) & (lon != 0)
+
+    if keep.sum() < 3:
         raise HTTPException(status_code=400, detail="Not enough bins for metrics")
 
-    X = np.array(data)
+    X = np.column_stack([lat[keep], lon[keep], importance[keep]])
 
     lat_lon_scaled = StandardScaler().fit_transform(X[:, :2])
     imp_scaled = StandardScaler().fit_transform(X[:, 2].reshape(-1, 1))
@@ -0,0 +1,28 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from auth import require_admin
+from schemas import ProfilingSettings
+from profiling import profiler, list_profiles, PROFILE_DIR
+
+router = APIRouter(prefix="/admin/profiling", tags=["profiling"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/")
+def get_profiling():
+    return {**profiler.settings(), "profiles": list_profiles()}
+
+
+@router.put("/")
+def set_profiling(settings: ProfilingSettings):
+    if not 0 <= settings.sample_rate <= 1:
+        raise HTTPException(status_code=422, detail="sample_rate must be between 0 and 1")
+    profiler.configure(**settings.dict())
+    return profiler.settings()
+
+
+@router.get("/{name}")
+def download_profile(name: str):
+    if name not in list_profiles():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(os.path.join(PROFILE_DIR, name), media_type="application/json", filename=name)
@@ -1,13 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from database import SessionLocal
+from database import SessionLocal, read_session
 from models import Bin, FillHistory, Alert, Task
 from schemas import BinReadingCreate, BinReadingOut
 from auth import get_current_user, require_admin
-from datetime import datetime, timezone
-from config import USE_HARDWARE, IOT_SECRET_KEY
+from datetime import datetime, timedelta, timezone
+from config import USE_HARDWARE, IOT_SECRET_KEY, READING_MAX_AGE_DAYS, READING_MAX_SKEW_SECONDS
+from fast_response import query_response
+from binary_ingest import ingest_frame, FrameError, MAX_FRAME_BYTES
+from storage_policy import apply_policy
+from sensor_health import screen
+from map_grid import grid
+from alert_queue import alert_queue
+from outbox import record, record_many, ALERT_CREATED
+from zones import zone_scope, scoped
+from feature_store import features_for, observe, apply_events
+from model_registry import to_epoch
+from sketches import sketches
+from profiling import ProfiledRoute, profiled
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+READING_COLUMNS = [FillHistory.id, FillHistory.bin_id, FillHistory.ts, FillHistory.fill_pct, FillHistory.quarantined]
 
 def get_db():
     db = SessionLocal()
@@ -16,6 +32,13 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
 @router.post("/", response_model=BinReadingOut)
 def create_reading(reading: BinReadingCreate, db: Session = Depends(get_db)):
     
@@ -23,33 +46,171 @@ def create_reading(reading: BinReadingCreate, db: Session = Depends(get_db)):
     if not bin_data:
         raise HTTPException(status_code=404, detail="Bin not found")
     new_val = reading.fill_pct
-    bin_data.current_fill_pct = new_val
-    bin_data.status = "full" if new_val > 80 else "not full"
+    now = datetime.now(timezone.utc)
+    _, quarantined = screen(bin_data, [(now, new_val)])
+    if quarantined:
+        suspect = FillHistory(bin_id=reading.bin_id, zone=bin_data.zone, fill_pct=new_val, ts=now, quarantined=True)
+        db.add(suspect)
+        db.commit()
+        db.refresh(suspect)
+        return suspect
+
+    features = features_for(db, [bin_data.bin_id])
+    f = features[bin_data.bin_id]
+    previous = (f.last_ts, f.fill)
+    if previous[0] is None or to_epoch(now) > to_epoch(previous[0]):
+        bin_data.current_fill_pct = new_val
+        bin_data.status = "full" if new_val > 80 else "not full"
+    observe(f, now, new_val)
     alert = db.query(Alert).filter(Alert.bin_id == bin_data.bin_id, Alert.is_resolved == False).first()
+    new_alert_id = None
     if new_val > 80:
         if not alert:
             new_alert = Alert(
                 bin_id=bin_data.bin_id,
+                zone=bin_data.zone,
                 is_resolved=False,
-                created_at=datetime.now(timezone.utc)
+                created_at=now
             )
             db.add(new_alert)
-    
+            db.flush()
+            record(db, ALERT_CREATED, bin_data.bin_id, alert_id=new_alert.id, fill_pct=new_val)
+            apply_events(db, [(ALERT_CREATED, bin_data.bin_id, {})], now, features)
+            new_alert_id = new_alert.id
 
-    new_reading = FillHistory(bin_id=reading.bin_id, fill_pct=new_val, ts=datetime.now(timezone.utc))
-    db.add(new_reading)
+    stored = apply_policy(bin_data, [(now, new_val)])
+    if stored:
+        bin_data.readings_since_train = (bin_data.readings_since_train or 0) + 1
+        new_reading = FillHistory(bin_id=reading.bin_id, zone=bin_data.zone, fill_pct=new_val, ts=now)
+        db.add(new_reading)
     db.commit()
+    grid.update_fill(reading.bin_id, new_val)
+    if new_val > 80:
+        grid.set_alert(reading.bin_id, True)
+    if new_alert_id is not None:
+        alert_queue.add_alert(new_alert_id, reading.bin_id, new_val, bin_data.zone)
+        sketches.alert(bin_data.zone, reading.bin_id, now)
+    sketches.observe(bin_data.zone, reading.bin_id, [(now, new_val)], previous)
+    alert_queue.update_bin(reading.bin_id, new_val)
+    if not stored:
+        return {"id": None, "bin_id": reading.bin_id, "ts": now, "fill_pct": new_val, "quarantined": False}
     db.refresh(new_reading)
     return new_reading
 
+def ingest_readings(db: Session, readings: list[tuple[str, datetime, int]]) -> dict:
+    now = datetime.now(timezone.utc)
+    oldest = to_epoch(now - timedelta(days=READING_MAX_AGE_DAYS))
+    newest = to_epoch(now + timedelta(seconds=READING_MAX_SKEW_SECONDS))
+    by_bin = {}
+    out_of_window = 0
+    for bin_id, ts, fill_pct in readings:
+        if not oldest <= to_epoch(ts) <= newest:
+            out_of_window += 1
+            continue
+        by_bin.setdefault(bin_id, []).append((ts, fill_pct))
+
+    bins = db.query(Bin).filter(Bin.bin_id.in_(list(by_bin))).all()
+    known = {b.bin_id: b for b in bins}
+    open_alerts = {a for (a,) in db.query(Alert.bin_id).filter(
+        Alert.bin_id.in_(list(known)), Alert.is_resolved == False
+    ).all()}
+
+    features = features_for(db, known)
+    rows = []
+    accepted = 0
+    new_alerts = []
+    observed = []
+    for bin_id, recs in by_bin.items():
+        bin_data = known.get(bin_id)
+        if bin_data is None:
+            continue
+        recs.sort(key=lambda r: r[0])
+        accepted += len(recs)
+        good, suspect = screen(bin_data, recs)
+        zone = bin_data.zone
+        rows.extend({"bin_id": bin_id, "zone": zone, "ts": ts, "fill_pct": f, "quarantined": True} for ts, f in suspect)
+        if not good:
+            continue
+        previous = (features[bin_id].last_ts, features[bin_id].fill)
+        for ts, f in good:
+            observe(features[bin_id], ts, f)
+        observed.append((zone, bin_id, good, previous))
+        # Late readings are stored as history but must not roll the bin back.
+        fresh = good if previous[0] is None else [r for r in good if to_epoch(r[0]) > to_epoch(previous[0])]
+        if fresh:
+            new_val = fresh[-1][1]
+            bin_data.current_fill_pct = new_val
+            bin_data.status = "full" if new_val > 80 else "not full"
+        if bin_id not in open_alerts and any(f > 80 for _, f in fresh):
+            alert = Alert(bin_id=bin_id, zone=zone, is_resolved=False, created_at=now)
+            db.add(alert)
+            new_alerts.append((alert, max(f for _, f in fresh)))
+        kept = apply_policy(bin_data, good)
+        bin_data.readings_since_train = (bin_data.readings_since_train or 0) + len(kept)
+        rows.extend({"bin_id": bin_id, "zone": zone, "ts": ts, "fill_pct": f, "quarantined": False} for ts, f in kept)
+
+    if new_alerts:
+        db.flush()
+        events = [(ALERT_CREATED, a.bin_id, {"alert_id": a.id, "fill_pct": f}) for a, f in new_alerts]
+        record_many(db, events)
+        apply_events(db, events, now, features)
+    if rows:
+        db.execute(insert(FillHistory), rows)
+    fills = {bin_id: b.current_fill_pct for bin_id, b in known.items()}
+    alerted = [(a.id, a.bin_id, a.zone) for a, _ in new_alerts]
+    db.commit()
+    for bin_id, fill in fills.items():
+        grid.update_fill(bin_id, fill)
+    for alert_id, bin_id, zone in alerted:
+        grid.set_alert(bin_id, True)
+        alert_queue.add_alert(alert_id, bin_id, fills[bin_id], zone)
+        sketches.alert(zone, bin_id, now)
+    for zone, bin_id, good, previous in observed:
+        sketches.observe(zone, bin_id, good, previous)
+    for bin_id, fill in fills.items():
+        alert_queue.update_bin(bin_id, fill)
+    return {
+        "accepted": accepted,
+        "stored": len(rows),
+        "rejected": len(readings) - accepted,
+        "out_of_window": out_of_window,
+        "unknown_bins": sorted(b for b in by_bin if b not in known),
+    }
+
+
+@router.post("/batch")
+def create_readings_batch(readings: list[BinReadingCreate], db: Session = Depends(get_db)):
+    now = datetime.now(timezone.utc)
+    return ingest_readings(db, [(r.bin_id, now, r.fill_pct) for r in readings])
+
+
+@router.post("/binary")
+async def create_readings_binary(request: Request, db: Session = Depends(get_db)):
+    length = request.headers.get("content-length")
+    if length is not None and int(length) > MAX_FRAME_BYTES:
+        raise HTTPException(status_code=413, detail="Frame too large")
+    # Chunked bodies have no length up front, so they are capped as they arrive.
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_FRAME_BYTES:
+            raise HTTPException(status_code=413, detail="Frame too large")
+    try:
+        return await run_in_threadpool(profiled(ingest_frame), body, db)
+    except FrameError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/", response_model=list[BinReadingOut], dependencies=[Depends(require_admin)])
-def get_all_readings(db: Session = Depends(get_db)):
-    return db.query(FillHistory).all()
+def get_all_readings(db: Session = Depends(get_read_db), zone: str | None = Depends(zone_scope)):
+    return scoped(db.query(FillHistory), FillHistory.zone, zone).all()
 
 @router.get("/{bin_id}", response_model=list[BinReadingOut], dependencies=[Depends(require_admin)])
-def get_readings_for_bin(bin_id: str, db: Session = Depends(get_db)):
-    bin_exists = db.query(Bin).filter(Bin.bin_id == bin_id).first()
+def get_readings_for_bin(bin_id: str, db: Session = Depends(get_read_db), zone: str | None = Depends(zone_scope)):
+    bin_exists = scoped(db.query(Bin.zone), Bin.zone, zone).filter(Bin.bin_id == bin_id).first()
     if not bin_exists:
         raise HTTPException(status_code=404, detail="Bin not found")
-    readings = db.query(FillHistory).filter(FillHistory.bin_id == bin_id).order_by(FillHistory.ts.desc()).all()
-    return readings
\ No newline at end of file
+    readings = db.query(FillHistory).filter(
+        FillHistory.zone == bin_exists.zone, FillHistory.bin_id == bin_id
+    ).order_by(FillHistory.ts.desc())
+    return query_response(readings, READING_COLUMNS)
\ No newline at end of file
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
+from schemas import RouteRequest, MatrixRequest
+from road_network import road_network
+from profiling import ProfiledRoute
+
+router = APIRouter(prefix="/routing", tags=["routing"], route_class=ProfiledRoute)
+
+
+def _require_network():
+    if not road_network.ready:
+        detail = "Road network not loaded" if road_network.path else "Road network not configured (set ROAD_NETWORK_PATH)"
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "30"})
+
+
+@router.get("/status")
+def routing_status():
+    return road_network.status()
+
+
+@router.post("/route")
+def route(body: RouteRequest):
+    _require_network()
+    return ORJSONResponse(road_network.route(body.points))
+
+
+@router.post("/matrix")
+def matrix(body: MatrixRequest):
+    _require_network()
+    return ORJSONResponse(road_network.matrix(body.sources, body.destinations or body.sources))
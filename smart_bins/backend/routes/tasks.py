@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session, joinedload, contains_eager
 from database import SessionLocal
 from models import Task, Alert, User, Bin
-from schemas import TaskCreate, TaskOut
+from schemas import TaskCreate, TaskOut, TaskBulkComplete
 from auth import get_current_user, require_admin
 from datetime import datetime
 from config import USE_HARDWARE, IOT_SECRET_KEY
+from map_grid import grid
+from alert_queue import alert_queue
+from outbox import record_many, resolve_seconds, TASK_COMPLETED, ALERT_RESOLVED
+from zones import zone_scope, scoped
+from feature_store import apply_events
+from profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+# Task listings return one page by default; X-Next-After-Id continues from it.
+TASK_PAGE_SIZE = 200
 
 def get_db():
     db = SessionLocal()
@@ -17,79 +26,171 @@ def get_db():
         db.close()
 
 @router.post("/", response_model=TaskOut, dependencies=[Depends(require_admin)])
-def assign_task(task: TaskCreate, db: Session = Depends(get_db)):
-    alert = db.query(Alert).filter(Alert.id == task.alert_id, Alert.is_resolved == False).first()
+def assign_task(task: TaskCreate, db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    alert = scoped(db.query(Alert), Alert.zone, zone).filter(Alert.id == task.alert_id, Alert.is_resolved == False).first()
     if not alert:
         raise HTTPException(404, "Alert not found or resolved")
 
     worker = db.query(User).filter(User.id == task.worker_id, User.role == "worker").first()
     if not worker:
         raise HTTPException(400, "Worker not found")
+    if worker.zone is not None and worker.zone != alert.zone:
+        raise HTTPException(400, "Worker is assigned to another zone")
 
     exists = db.query(Task).filter(Task.alert_id == task.alert_id, Task.status == "assigned").first()
     if exists:
         raise HTTPException(400, "Alert already assigned")
 
-    new_task = Task(alert_id=task.alert_id, worker_id=task.worker_id)
+    new_task = Task(alert_id=task.alert_id, worker_id=task.worker_id, zone=alert.zone)
     db.add(new_task)
+    bin_id = alert.bin_id
     db.commit()
     db.refresh(new_task)
+    alert_queue.add_task(new_task.id, new_task.worker_id, new_task.alert_id, bin_id)
     return new_task
 
 
-@router.post("/{task_id}/complete", response_model=TaskOut)
-def complete_task(task_id: int, user = Depends(get_current_user),
-                  db: Session = Depends(get_db)):
+def _load_for_completion(db: Session, task_ids: list[int]):
+    return db.query(Task, Alert, Bin).outerjoin(Alert, Alert.id == Task.alert_id).outerjoin(
+        Bin, Bin.bin_id == Alert.bin_id
+    ).filter(Task.id.in_(task_ids)).all()
 
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        raise HTTPException(404, "Task not found")
 
+def _completion_error(user, task, alert, bin_obj) -> tuple[int, str] | None:
     if user.role != "worker" or user.id != task.worker_id:
-        raise HTTPException(403, "Unauthorized")
-
+        return 403, "Unauthorized"
     if task.status == "completed":
-        raise HTTPException(400, "Task already completed")
-
-    alert = db.query(Alert).filter(Alert.id == task.alert_id).first()
+        return 400, "Task already completed"
+    if task.status == "cancelled":
+        return 400, "Task was cancelled"
     if not alert:
-        raise HTTPException(404, "Associated alert not found")
-
-    bin_obj = db.query(Bin).filter(Bin.bin_id == alert.bin_id).first()
+        return 404, "Associated alert not found"
     if not bin_obj:
-        raise HTTPException(404, "Associated bin not found")
-
-    if USE_HARDWARE:
-        if bin_obj.current_fill_pct <= 5:
-            task.status = "completed"
-            task.completed_at = datetime.utcnow()
-            alert.is_resolved = True
-            alert.resolved_at = datetime.utcnow()
-            bin_obj.current_fill_pct = 0
-            bin_obj.status = "not full"
-        else:
-            raise HTTPException(400, "Bin not clean enough according to sensor. Please re-check and try again.")
-    else:
-        task.status = "completed"
-        task.completed_at = datetime.utcnow()
+        return 404, "Associated bin not found"
+    if USE_HARDWARE and bin_obj.current_fill_pct > 5:
+        return 400, "Bin not clean enough according to sensor. Please re-check and try again."
+    return None
+
+
+def _complete(task, alert, bin_obj, now: datetime) -> list[tuple[str, str, dict]]:
+    task.status = "completed"
+    task.completed_at = now
+    bin_obj.current_fill_pct = 0
+    bin_obj.status = "not full"
+    events = [(TASK_COMPLETED, bin_obj.bin_id, {"task_id": task.id, "alert_id": alert.id, "worker_id": task.worker_id})]
+    if not alert.is_resolved:
         alert.is_resolved = True
-        alert.resolved_at = datetime.utcnow()
-        bin_obj.current_fill_pct = 0
-        bin_obj.status = "not full"
+        alert.resolved_at = now
+        events.append((ALERT_RESOLVED, bin_obj.bin_id, {"alert_id": alert.id, "resolve_seconds": resolve_seconds(alert, now)}))
+    return events
+
 
+@router.post("/{task_id}/complete", response_model=TaskOut)
+def complete_task(task_id: int, user = Depends(get_current_user),
+                  db: Session = Depends(get_db)):
+
+    rows = _load_for_completion(db, [task_id])
+    if not rows:
+        raise HTTPException(404, "Task not found")
+    task, alert, bin_obj = rows[0]
+
+    error = _completion_error(user, task, alert, bin_obj)
+    if error:
+        raise HTTPException(*error)
+
+    now = datetime.utcnow()
+    events = _complete(task, alert, bin_obj, now)
+    record_many(db, events)
+    apply_events(db, events, now)
+    bin_id, alert_id = bin_obj.bin_id, alert.id
     db.commit()
     db.refresh(task)
+    grid.update_fill(bin_id, 0)
+    grid.set_alert(bin_id, False)
+    alert_queue.remove_task(task_id)
+    alert_queue.remove_alert(alert_id)
     return task
 
 
+@router.post("/bulk/complete")
+def complete_tasks(body: TaskBulkComplete, user = Depends(get_current_user), db: Session = Depends(get_db)):
+    rows = {task.id: (task, alert, bin_obj) for task, alert, bin_obj in _load_for_completion(db, body.task_ids)}
+    now = datetime.utcnow()
+    completed, failed, events, alerts, bins = [], [], [], set(), set()
+    for task_id in dict.fromkeys(body.task_ids):
+        row = rows.get(task_id)
+        error = (404, "Task not found") if row is None else _completion_error(user, *row)
+        if error:
+            failed.append({"id": task_id, "status": error[0], "detail": error[1]})
+            continue
+        events.extend(_complete(*row, now))
+        completed.append(task_id)
+        alerts.add(row[1].id)
+        bins.add(row[2].bin_id)
+
+    record_many(db, events)
+    apply_events(db, events, now)
+    db.commit()
+    for bin_id in bins:
+        grid.update_fill(bin_id, 0)
+        grid.set_alert(bin_id, False)
+    for task_id in completed:
+        alert_queue.remove_task(task_id)
+    for alert_id in alerts:
+        alert_queue.remove_alert(alert_id)
+    return {"completed": completed, "failed": failed}
+
+
+def _filter_and_page(query, response: Response, status: str | None, created_from: datetime | None,
+                     created_to: datetime | None, after_id: int | None, limit: int | None):
+    if status:
+        query = query.filter(Task.status == status)
+    if created_from:
+        query = query.filter(Task.created_at >= created_from)
+    if created_to:
+        query = query.filter(Task.created_at < created_to)
+    if after_id is not None:
+        query = query.filter(Task.id > after_id)
+    query = query.order_by(Task.id)
+    if limit is None:
+        return query.all()
+
+    tasks = query.limit(limit).all()
+    if len(tasks) == limit:
+        response.headers["X-Next-After-Id"] = str(tasks[-1].id)
+    return tasks
+
+
 @router.get("/admin/list", response_model=list[TaskOut], dependencies=[Depends(require_admin)])
-def list_all_tasks(db: Session = Depends(get_db)):
-    return db.query(Task).all()
+def list_all_tasks(response: Response,
+                   status: str | None = None,
+                   created_from: datetime | None = None,
+                   created_to: datetime | None = None,
+                   after_id: int | None = None,
+                   limit: int = Query(TASK_PAGE_SIZE, ge=1, le=1000),
+                   db: Session = Depends(get_db), zone: str | None = Depends(zone_scope)):
+    query = scoped(db.query(Task), Task.zone, zone).options(joinedload(Task.alert))
+    return _filter_and_page(query, response, status, created_from, created_to, after_id, limit)
 
 
 @router.get("/worker/list", response_model=list[TaskOut])
-def worker_tasks(user = Depends(get_current_user), db: Session = Depends(get_db)):
+def worker_tasks(response: Response,
+                 status: str | None = None,
+                 created_from: datetime | None = None,
+                 created_to: datetime | None = None,
+                 after_id: int | None = None,
+                 limit: int = Query(TASK_PAGE_SIZE, ge=1, le=1000),
+                 user = Depends(get_current_user), db: Session = Depends(get_db)):
     if user.role != "worker":
         raise HTTPException(403, "Only workers")
 
-    return db.query(Task).join(Alert).filter(Task.worker_id == user.id).all()
\ No newline at end of file
+    query = db.query(Task).join(Task.alert).options(contains_eager(Task.alert)).filter(Task.worker_id == user.id)
+    return _filter_and_page(query, response, status, created_from, created_to, after_id, limit)
+
+
+@router.get("/worker/queue")
+def worker_task_queue(limit: int = Query(20, ge=1, le=200), offset: int = Query(0, ge=0, le=10000),
+                      user = Depends(get_current_user)):
+    if user.role != "worker":
+        raise HTTPException(403, "Only workers")
+    return alert_queue.top_tasks(user.id, limit, offset)
@@ -0,0 +1,22 @@
+import argparse
+import json
+
+from evaluation import run_evaluation
+from model_training import REBUILD_WORKERS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the fill forecaster over stored history.")
+    parser.add_argument("--workers", type=int, default=REBUILD_WORKERS)
+    args = parser.parse_args()
+
+    def progress(chunks_done, chunks_total):
+        print(f"backtested {chunks_done}/{chunks_total} chunks", end="\r")
+
+    run = run_evaluation(args.workers, progress)
+    print()
+    print(json.dumps({k: v for k, v in run.items() if k != "per_bin"}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ class BinCreate(BaseModel):
     latitude: float
     longitude: float
     capacity_litres: int
+    zone: str | None = Field(None, pattern=r"^[a-z0-9_]{1,32}$")
 
 class BinOut(BaseModel):
     id: int
@@ -16,6 +17,7 @@ class BinOut(BaseModel):
     current_fill_pct: int
     status: str
     created_at: datetime
+    zone: str = "default"
 
     class Config:
         orm_mode = True
@@ -27,10 +29,11 @@ class BinReadingCreate(BaseModel):
 
 
 class BinReadingOut(BaseModel):
-    id: int
+    id: int | None
     bin_id: str
     ts: datetime
     fill_pct: int
+    quarantined: bool = False
 
     class Config:
         orm_mode = True
@@ -39,11 +42,13 @@ class UserCreate(BaseModel):
     username: str = Field(..., min_length=3, max_length=50)
     password: str = Field(..., min_length=4, max_length=72)
     role:str
+    zone: str | None = Field(None, pattern=r"^[a-z0-9_]{1,32}$")
 
 class UserOut(BaseModel):
     id:int
     username:str
     role:str
+    zone: str | None = None
 
     class Config:
         orm_mode =True
@@ -52,9 +57,19 @@ class LoginRequest(BaseModel):
     username:str
     password:str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class ProfilingSettings(BaseModel):
+    enabled: bool
+    route_prefix: str | None = None
+    sample_rate: float = 1.0
+    max_profiles: int = 50
+
 class AlertOut(BaseModel):
     id: int
     bin_id: str
+    zone: str = "default"
     is_resolved: bool
     created_at: datetime
     resolved_at: datetime | None
@@ -67,6 +82,19 @@ class TaskCreate(BaseModel):
     worker_id: int
 
 
+class TaskBulkComplete(BaseModel):
+    task_ids: list[int] = Field(..., max_length=1000)
+
+class AlertBulkResolve(BaseModel):
+    alert_ids: list[int] = Field(..., max_length=1000)
+
+class RouteRequest(BaseModel):
+    points: list[tuple[float, float]] = Field(..., min_length=2, max_length=500)
+
+class MatrixRequest(BaseModel):
+    sources: list[tuple[float, float]] = Field(..., min_length=1, max_length=200)
+    destinations: list[tuple[float, float]] | None = Field(None, min_length=1, max_length=200)
+
 class TaskOut(BaseModel):
     id: int
     alert:AlertOut
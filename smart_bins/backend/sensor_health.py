@@ -0,0 +1,170 @@
+import math
+import os
+import threading
+
+import numpy as np
+
+from model_registry import to_epoch
+
+# Flags returned by SensorMonitor.check; 0 means the reading looks sane.
+SPIKE = 1
+STUCK = 2
+RATE = 4
+RANGE = 8
+FLAG_NAMES = {SPIKE: "spike", STUCK: "stuck", RATE: "rate", RANGE: "range"}
+
+SPIKE_PCT = int(os.getenv("SENSOR_SPIKE_PCT", "40"))
+MAX_RISE_PCT_PER_HOUR = float(os.getenv("SENSOR_MAX_RISE_PCT_PER_HOUR", "30"))
+RATE_MIN_DELTA_PCT = 10
+RATE_Z = 6.0
+STUCK_HOURS = float(os.getenv("SENSOR_STUCK_HOURS", "48"))
+# A bin only counts as stuck if it normally moves at least this fast.
+STUCK_MIN_RISE_PCT_PER_HOUR = 0.2
+# Full bins legitimately sit at one level until picked up; same "full" level as storage_policy.
+STUCK_MAX_FILL = 80
+# Drops to at most this fill are pickups, never anomalies.
+PICKUP_MAX_FILL = 15
+# A spiked or fast-rising level is accepted once this many consecutive readings
+# agree on it; a stuck level never is.
+CONFIRM_READINGS = 3
+CONFIRM_TOLERANCE_PCT = 5
+EWM_ALPHA = 0.05
+
+FLOAT_FIELDS = ("last_ts", "last_seen", "same_since", "rise_mean", "rise_var", "pending", "before_drop", "health")
+INT_FIELDS = ("pending_n", "readings", "spike", "stuck", "rate", "range")
+
+
+class SensorMonitor:
+    """Streaming per-bin sensor checks, O(1) per reading.
+
+    State lives in flat arrays indexed by bins.id. The comparison baseline
+    is the bin's current_fill_pct, which quarantined readings never update,
+    so every worker compares against the same accepted level; rolling rates,
+    stuck timers and counters are per process.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._alloc(capacity)
+
+    def _alloc(self, capacity: int):
+        old = getattr(self, "capacity", 0)
+        for name in FLOAT_FIELDS:
+            arr = np.full(capacity, np.nan if name in ("last_ts", "last_seen", "pending", "before_drop") else 0.0)
+            if name == "health":
+                arr[old:] = 1.0
+            if old:
+                arr[:old] = getattr(self, name)
+            setattr(self, name, arr)
+        for name in INT_FIELDS:
+            arr = np.zeros(capacity, dtype=np.int32)
+            if old:
+                arr[:old] = getattr(self, name)
+            setattr(self, name, arr)
+        self.capacity = capacity
+
+    def check(self, i: int, ts: float, fill: int, baseline: int | None) -> int:
+        with self._lock:
+            if i >= self.capacity:
+                self._alloc(max(i + 1, self.capacity * 2))
+            flags = self._check(i, ts, fill, baseline)
+            self.readings[i] += 1
+            self.health[i] += EWM_ALPHA * ((0.0 if flags else 1.0) - self.health[i])
+            if flags:
+                for bit, name in FLAG_NAMES.items():
+                    if flags & bit:
+                        getattr(self, name)[i] += 1
+            return flags
+
+    def _check(self, i: int, ts: float, fill: int, baseline: int | None) -> int:
+        if fill < 0 or fill > 100:
+            return RANGE
+
+        last_ts = self.last_ts[i]
+        if fill != self.last_seen[i]:
+            self.same_since[i] = ts
+        self.last_seen[i] = fill
+        self.last_ts[i] = ts
+        if baseline is None or math.isnan(last_ts):
+            return 0
+
+        delta = fill - baseline
+        if delta <= 0 and (fill <= PICKUP_MAX_FILL or delta > -SPIKE_PCT):
+            self.before_drop[i] = baseline if delta <= -SPIKE_PCT else np.nan
+            return self._stuck(i, ts, fill)
+
+        flags = 0
+        if abs(delta) >= SPIKE_PCT:
+            flags |= SPIKE
+        hours = max(ts - last_ts, 1.0) / 3600.0
+        rise = delta / hours
+        limit = max(MAX_RISE_PCT_PER_HOUR, self.rise_mean[i] + RATE_Z * math.sqrt(self.rise_var[i]))
+        if delta >= RATE_MIN_DELTA_PCT and rise > limit:
+            flags |= RATE
+
+        if flags and abs(fill - self.before_drop[i]) <= CONFIRM_TOLERANCE_PCT:
+            # back to the level before a drop to empty: the drop was the glitch
+            self.before_drop[i] = np.nan
+            self.pending_n[i] = 0
+            return 0
+        self.before_drop[i] = np.nan
+
+        if flags:
+            # a confirmed level change is accepted without skewing the rise stats
+            return self._confirm(i, fill, flags)
+
+        diff = rise - self.rise_mean[i]
+        self.rise_mean[i] += EWM_ALPHA * diff
+        self.rise_var[i] = (1 - EWM_ALPHA) * (self.rise_var[i] + EWM_ALPHA * diff * diff)
+        return self._stuck(i, ts, fill)
+
+    def _confirm(self, i: int, fill: int, flags: int) -> int:
+        if self.pending_n[i] and abs(fill - self.pending[i]) <= CONFIRM_TOLERANCE_PCT:
+            self.pending_n[i] += 1
+        else:
+            self.pending[i] = fill
+            self.pending_n[i] = 1
+        if self.pending_n[i] < CONFIRM_READINGS:
+            return flags
+        self.pending_n[i] = 0
+        return 0
+
+    def _stuck(self, i: int, ts: float, fill: int) -> int:
+        # A frozen level is quarantined until the reading moves or a pickup
+        # resets it; agreeing readings are what a frozen sensor sends, so they
+        # do not confirm it. A genuine plateau ends with a small move, which
+        # restarts same_since and is accepted like any other reading.
+        if (fill >= STUCK_MAX_FILL or ts - self.same_since[i] < STUCK_HOURS * 3600
+                or self.rise_mean[i] < STUCK_MIN_RISE_PCT_PER_HOUR):
+            self.pending_n[i] = 0
+            return 0
+        return STUCK
+
+    def score(self, i: int) -> float:
+        return round(100 * float(self.health[i]), 1) if i < self.capacity else 100.0
+
+    def stats(self, i: int) -> dict:
+        if i >= self.capacity:
+            return {"readings": 0, **{name: 0 for name in FLAG_NAMES.values()}}
+        return {"readings": int(self.readings[i]), **{name: int(getattr(self, name)[i]) for name in FLAG_NAMES.values()}}
+
+
+def flag_names(flags: int) -> list[str]:
+    return [name for bit, name in FLAG_NAMES.items() if flags & bit]
+
+
+def screen(bin_data, readings: list) -> tuple[list, list]:
+    """Split time-ordered (ts, fill) readings into accepted and quarantined."""
+    good, bad = [], []
+    baseline = bin_data.current_fill_pct
+    for ts, fill in readings:
+        if monitor.check(bin_data.id, to_epoch(ts), fill, baseline):
+            bad.append((ts, fill))
+        else:
+            good.append((ts, fill))
+            baseline = fill
+    bin_data.sensor_health = monitor.score(bin_data.id)
+    return good, bad
+
+
+monitor = SensorMonitor()
@@ -0,0 +1,368 @@
+import hashlib
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from config import HISTORY_HEARTBEAT_SECONDS
+
+SKETCH_FLUSH_SECONDS = float(os.getenv("SKETCH_FLUSH_SECONDS", "10"))
+FILL_LEVELS = 101
+HLL_P = 12
+HLL_M = 1 << HLL_P
+HLL_RELATIVE_ERROR = 1.04 / HLL_M ** 0.5
+TOP_CAPACITY = 128
+_HASH_BITS = 64 - HLL_P
+
+
+def hour_bucket(ts: datetime) -> datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _hashes(keys) -> np.ndarray:
+    return np.array([int.from_bytes(hashlib.blake2b(k.encode(), digest_size=8).digest(), "little") for k in keys],
+                    dtype=np.uint64)
+
+
+def hll_add(registers: np.ndarray, keys):
+    h = _hashes(keys)
+    if not len(h):
+        return
+    index = (h >> np.uint64(_HASH_BITS)).astype(np.int64)
+    rest = (h & np.uint64((1 << _HASH_BITS) - 1)).astype(np.float64)
+    # Position of the first 1 bit in the remaining bits; exact because they fit in a float64 mantissa.
+    rank = (_HASH_BITS + 1 - np.frexp(rest)[1]).astype(np.uint8)
+    np.maximum.at(registers, index, rank)
+
+
+def hll_count(registers: np.ndarray) -> np.ndarray:
+    """Cardinality estimate per row of a (..., HLL_M) register array."""
+    registers = np.asarray(registers, dtype=np.float64)
+    alpha = 0.7213 / (1 + 1.079 / HLL_M)
+    raw = alpha * HLL_M * HLL_M / np.sum(np.exp2(-registers), axis=-1)
+    zeros = np.sum(registers == 0, axis=-1)
+    with np.errstate(divide="ignore"):
+        linear = HLL_M * np.log(HLL_M / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * HLL_M) & (zeros > 0), linear, raw)
+
+
+def top_merge(a: dict, b: dict, capacity: int = TOP_CAPACITY) -> dict:
+    """Merge two space-saving summaries {"items": {key: [count, error]}, "floor": n}."""
+    a_items, b_items = a["items"], b["items"]
+    a_floor, b_floor = a["floor"], b["floor"]
+    merged = {}
+    for key in a_items.keys() | b_items.keys():
+        ca, ea = a_items.get(key, (a_floor, a_floor))
+        cb, eb = b_items.get(key, (b_floor, b_floor))
+        merged[key] = [ca + cb, ea + eb]
+    floor = a_floor + b_floor
+    if len(merged) > capacity:
+        ranked = sorted(merged.items(), key=lambda kv: -kv[1][0])
+        floor = max(floor, ranked[capacity][1][0])
+        merged = dict(ranked[:capacity])
+    return {"items": merged, "floor": floor}
+
+
+def percentiles(hist: np.ndarray, qs) -> dict:
+    total = hist.sum()
+    if not total:
+        return {q: None for q in qs}
+    cum = np.cumsum(hist)
+    return {q: int(np.searchsorted(cum, q * total)) for q in qs}
+
+
+class _Delta:
+    __slots__ = ("hist", "bins", "alerts", "readings")
+
+    def __init__(self):
+        self.hist = np.zeros(FILL_LEVELS, dtype=np.int64)
+        self.bins = set()
+        self.alerts = Counter()
+        self.readings = 0
+
+
+def _naive(ts: datetime) -> datetime:
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo is not None else ts
+
+
+def fold(delta_for, bin_id: str, readings: list[tuple[datetime, int]], until: datetime | None = None):
+    """Add one bin's time-ordered (ts, fill) readings to the deltas returned by delta_for(hour).
+
+    Each fill is weighted by the seconds it stayed the bin's latest value,
+    capped at HISTORY_HEARTBEAT_SECONDS, so histograms count bin-seconds per
+    fill level and a reading stream and the deadband-thinned rows stored
+    from it give the same distribution to within the deadband. The bin is
+    active in every hour a held interval touches. The last reading is held
+    until `until`, or only marked active when that is None.
+    """
+    nexts = [ts for ts, _ in readings[1:]] + [until]
+    for (ts, fill), nxt in zip(readings, nexts):
+        ts = _naive(ts)
+        hour = hour_bucket(ts)
+        delta = delta_for(hour)
+        delta.bins.add(bin_id)
+        if nxt is None:
+            continue
+        seconds = min(max((_naive(nxt) - ts).total_seconds(), 0), HISTORY_HEARTBEAT_SECONDS)
+        delta.hist[min(max(int(fill), 0), FILL_LEVELS - 1)] += int(seconds)
+        spill = (ts - hour).total_seconds() + seconds
+        while spill > 3600:
+            hour += timedelta(hours=1)
+            spill -= 3600
+            delta_for(hour).bins.add(bin_id)
+
+
+class StreamSketches:
+    """Mergeable per-hour, per-zone summaries of the reading stream for fleet dashboards.
+
+    Each (zone, hour) row of stat_sketches holds:
+
+    * bin-seconds per integer fill level 0..100 (see fold()). Fills are
+      integer percentages, so this histogram is exact (no KLL/t-digest rank
+      error) and merges by addition.
+    * a HyperLogLog of the bins that reported: 2**HLL_P one-byte registers,
+      merged by element-wise max, relative standard error 1.04 / sqrt(2**HLL_P)
+      (1.6% at HLL_P=12). Small counts use linear counting and are near exact.
+    * a space-saving summary of bins that raised full alerts, at most
+      TOP_CAPACITY entries of [count, error] with the true count in
+      [count - error, count]. An absent bin raised at most `floor` alerts;
+      error and floor stay below alerts / TOP_CAPACITY.
+
+    Ingest adds to an in-memory delta per bucket and a background thread
+    merges the deltas into the table every SKETCH_FLUSH_SECONDS, so a window
+    query reads O(hours x zones) rows instead of raw history and lags ingest
+    by at most that interval.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self.metrics = {"flushes": 0, "buckets_written": 0, "failures": 0}
+
+    def _delta(self, zone: str, ts: datetime) -> _Delta:
+        return self._bucket(zone, hour_bucket(ts))
+
+    def _bucket(self, zone: str, hour: datetime) -> _Delta:
+        key = (zone, hour)
+        delta = self._pending.get(key)
+        if delta is None:
+            delta = self._pending[key] = _Delta()
+        return delta
+
+    def observe(self, zone: str, bin_id: str, readings: list[tuple[datetime, int]],
+                previous: tuple[datetime, int] | None = None):
+        """Fold accepted readings in; `previous` is the bin's last accepted (ts, fill) before them.
+
+        A fill is only weighted once the next reading shows how long it held,
+        so each bin's latest reading is not counted yet.
+        """
+        if previous is not None and previous[0] is not None:
+            readings = [r for r in readings if _naive(r[0]) > _naive(previous[0])]
+            chain = [previous] + readings
+        else:
+            chain = readings
+        if not readings:
+            return
+        with self._lock:
+            for ts, _ in readings:
+                self._delta(zone, ts).readings += 1
+            fold(lambda hour: self._bucket(zone, hour), bin_id, chain)
+
+    def alert(self, zone: str, bin_id: str, ts: datetime):
+        with self._lock:
+            self._delta(zone, ts).alerts[bin_id] += 1
+
+    def flush(self, db: Session) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            apply_deltas(db, pending)
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                for key, delta in pending.items():
+                    _merge_delta(self._delta(*key), delta)
+            raise
+        self.metrics["flushes"] += 1
+        self.metrics["buckets_written"] += len(pending)
+        return len(pending)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="sketch-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def _loop(self):
+        from database import SessionLocal
+
+        while True:
+            stopping = self._stop.wait(SKETCH_FLUSH_SECONDS)
+            db = SessionLocal()
+            try:
+                self.flush(db)
+            except Exception as e:
+                self.metrics["failures"] += 1
+                print("Sketch flush failed:", e)
+            finally:
+                db.close()
+            if stopping:
+                return
+
+
+def _merge_delta(into: _Delta, delta: _Delta):
+    into.hist += delta.hist
+    into.readings += delta.readings
+    into.bins |= delta.bins
+    into.alerts.update(delta.alerts)
+
+
+def _summary(alerts: Counter) -> dict:
+    return top_merge({"items": {b: [c, 0] for b, c in alerts.items()}, "floor": 0}, {"items": {}, "floor": 0})
+
+
+def apply_deltas(db: Session, pending: dict):
+    """Merge {(zone, hour): _Delta} into stat_sketches in the caller's transaction."""
+    from models import StatSketch
+
+    keys = sorted(pending)
+    rows = {}
+    for zone in sorted({z for z, _ in keys}):
+        hours = [h for z, h in keys if z == zone]
+        for row in db.query(StatSketch).filter(StatSketch.zone == zone, StatSketch.hour.in_(hours)).order_by(
+            StatSketch.hour
+        ).with_for_update():
+            rows[(row.zone, row.hour)] = row
+    for key in keys:
+        delta = pending[key]
+        row = rows.get(key)
+        if row is None:
+            row = StatSketch(zone=key[0], hour=key[1], readings=0, alerts=0,
+                             fill_hist=np.zeros(FILL_LEVELS, dtype=np.int64).tobytes(),
+                             hll=np.zeros(HLL_M, dtype=np.uint8).tobytes(),
+                             top_bins={"items": {}, "floor": 0})
+            db.add(row)
+        hist = np.frombuffer(row.fill_hist, dtype=np.int64) + delta.hist
+        hll = np.frombuffer(row.hll, dtype=np.uint8).copy()
+        hll_add(hll, delta.bins)
+        row.fill_hist = hist.tobytes()
+        row.hll = hll.tobytes()
+        row.readings = (row.readings or 0) + delta.readings
+        row.alerts = (row.alerts or 0) + sum(delta.alerts.values())
+        row.top_bins = top_merge(row.top_bins, _summary(delta.alerts))
+
+
+def load_window(db: Session, start: datetime, end: datetime | None = None, zone: str | None = None):
+    from models import StatSketch
+
+    query = db.query(StatSketch.hour, StatSketch.fill_hist, StatSketch.hll, StatSketch.top_bins,
+                     StatSketch.alerts).filter(StatSketch.hour >= hour_bucket(start))
+    if end is not None:
+        query = query.filter(StatSketch.hour <= hour_bucket(end))
+    if zone is not None:
+        query = query.filter(StatSketch.zone == zone)
+    return query.order_by(StatSketch.hour).all()
+
+
+def fill_distribution(rows) -> tuple[np.ndarray, dict]:
+    hist = np.zeros(FILL_LEVELS, dtype=np.int64)
+    daily = {}
+    for hour, fill_hist, _, _, _ in rows:
+        h = np.frombuffer(fill_hist, dtype=np.int64)
+        hist += h
+        day = daily.setdefault(hour.date().isoformat(), np.zeros(FILL_LEVELS, dtype=np.int64))
+        day += h
+    return hist, daily
+
+
+def active_bins(rows) -> tuple[dict, float]:
+    """Estimated distinct reporting bins per hour, and across the whole window."""
+    if not rows:
+        return {}, 0.0
+    by_hour = {}
+    for hour, _, hll, _, _ in rows:
+        registers = np.frombuffer(hll, dtype=np.uint8)
+        by_hour[hour] = np.maximum(by_hour[hour], registers) if hour in by_hour else registers
+    hours = sorted(by_hour)
+    stacked = np.stack([by_hour[h] for h in hours])
+    counts = hll_count(stacked)
+    return dict(zip(hours, counts.tolist())), float(hll_count(stacked.max(axis=0)))
+
+
+def top_full_bins(rows, k: int = 10) -> tuple[list, int, int]:
+    """Top k of all buckets' summaries merged at once, the upper bound for unlisted bins, and total alerts.
+
+    Merging in one pass only adds the floors of buckets a bin is missing
+    from, so untruncated hourly summaries combine without any error.
+    """
+    counts, errors = Counter(), Counter()
+    floor = total = 0
+    for _, _, _, top, alerts in rows:
+        f = top["floor"]
+        for key, (c, e) in top["items"].items():
+            counts[key] += c - f
+            errors[key] += e - f
+        floor += f
+        total += alerts or 0
+    ranked = counts.most_common(k + 1)
+    unlisted = max(floor, ranked[k][1] + floor if len(ranked) > k else 0)
+    return [(key, (c + floor, errors[key] + floor)) for key, c in ranked[:k]], unlisted, total
+
+
+def fold_history(rows, until: datetime | None = None) -> dict:
+    """{(zone, hour): _Delta} from stored (zone, bin_id, ts, fill) rows ordered by bin and time."""
+    pending = {}
+
+    def delta_for(zone):
+        def get(hour):
+            key = (zone, hour)
+            if key not in pending:
+                pending[key] = _Delta()
+            return pending[key]
+        return get
+
+    current, readings = None, []
+    for zone, bin_id, ts, fill in rows:
+        if (zone, bin_id) != current:
+            if current is not None:
+                fold(delta_for(current[0]), current[1], readings, until)
+            current, readings = (zone, bin_id), []
+        readings.append((ts, fill))
+        delta_for(zone)(hour_bucket(ts)).readings += 1
+    if current is not None:
+        fold(delta_for(current[0]), current[1], readings, until)
+    return pending
+
+
+def backfill(db: Session) -> int:
+    """Rebuild stat_sketches from stored (deadband-thinned) history and alerts."""
+    from models import FillHistory, Alert, StatSketch
+
+    db.query(StatSketch).delete(synchronize_session=False)
+    pending = fold_history(db.query(FillHistory.zone, FillHistory.bin_id, FillHistory.ts, FillHistory.fill_pct).filter(
+        FillHistory.quarantined == False, FillHistory.ts.isnot(None)
+    ).order_by(FillHistory.zone, FillHistory.bin_id, FillHistory.ts).yield_per(10000))
+    for zone, bin_id, ts in db.query(Alert.zone, Alert.bin_id, Alert.created_at).filter(Alert.created_at.isnot(None)):
+        key = (zone, hour_bucket(ts))
+        pending.setdefault(key, _Delta()).alerts[bin_id] += 1
+    apply_deltas(db, pending)
+    db.commit()
+    return len(pending)
+
+
+sketches = StreamSketches()
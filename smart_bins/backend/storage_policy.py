@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+
+from config import HISTORY_DEADBAND_PCT, HISTORY_HEARTBEAT_SECONDS, HISTORY_KEEP_ALL
+
+# Readings that cross one of these levels are always stored, so analytics
+# that look for "emptied" (<= 5), "full" (>= 80) and "overflowing" (>= 99)
+# rows still find the exact crossing.
+THRESHOLDS = (5, 80, 99)
+EMPTY_DROP_PCT = 20
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+def should_persist(last_fill: int | None, last_ts: datetime | None, new_fill: int, ts: datetime) -> bool:
+    if HISTORY_KEEP_ALL or last_fill is None or last_ts is None:
+        return True
+    if last_fill - new_fill >= EMPTY_DROP_PCT:
+        return True
+    if abs(new_fill - last_fill) > HISTORY_DEADBAND_PCT:
+        return True
+    if any((last_fill < t) != (new_fill < t) for t in THRESHOLDS):
+        return True
+    return (_utc(ts) - _utc(last_ts)).total_seconds() >= HISTORY_HEARTBEAT_SECONDS
+
+
+def apply_policy(bin_data, readings: list[tuple[datetime, int]]) -> list[tuple[datetime, int]]:
+    kept = []
+    last_fill, last_ts = bin_data.last_persisted_fill, bin_data.last_persisted_at
+    for ts, fill in readings:
+        if should_persist(last_fill, last_ts, fill, ts):
+            kept.append((ts, fill))
+            last_fill, last_ts = fill, ts
+    bin_data.last_persisted_fill, bin_data.last_persisted_at = last_fill, last_ts
+    return kept
@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from models import Bin, Alert, Task, User, OutboxEvent
+from outbox import TASK_CANCELLED
+from schemas import AlertBulkResolve
+from routes.alerts import resolve_alerts
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def test_bulk_resolve_cancels_open_tasks(db):
+    db.add(User(id=1, username="worker", password="x", role="worker"))
+    db.add(Bin(bin_id="b1", latitude=0.0, longitude=0.0))
+    db.add(Alert(id=1, bin_id="b1", is_resolved=False))
+    db.add(Task(id=1, alert_id=1, worker_id=1, status="assigned"))
+    db.commit()
+
+    result = resolve_alerts(AlertBulkResolve(alert_ids=[1]), db, None)
+
+    assert result["resolved"] == [1] and result["cancelled_tasks"] == [1]
+    db.expire_all()
+    assert db.get(Task, 1).status == "cancelled"
+    events = [(e.event_type, e.payload) for e in db.query(OutboxEvent).all()]
+    assert (TASK_CANCELLED, {"task_id": 1, "alert_id": 1, "worker_id": 1}) in events
@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from models import Bin, BinFeatures
+from schemas import BinCreate
+from routes.bins import update_bin
+from routes.readings import ingest_readings
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    # SQLite only enforces foreign keys when asked, as Postgres always does
+    event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys=ON"))
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def test_rename_bin_with_feature_row(db):
+    db.add(Bin(bin_id="old", latitude=17.4, longitude=78.5, capacity_litres=100))
+    db.commit()
+    start = datetime.now(timezone.utc) - timedelta(hours=3)
+    ingest_readings(db, [("old", start + timedelta(hours=h), 10 + 5 * h) for h in range(3)])
+    assert db.get(BinFeatures, "old").samples == 3
+
+    update_bin("old", BinCreate(bin_id="new", latitude=17.4, longitude=78.5, capacity_litres=100), db, None)
+
+    db.expire_all()
+    assert db.query(Bin).filter(Bin.bin_id == "new").one().current_fill_pct == 20
+    assert db.get(BinFeatures, "old") is None
+    moved = db.get(BinFeatures, "new")
+    assert moved.samples == 3 and moved.fill == 20
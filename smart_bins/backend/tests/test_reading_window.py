@@ -0,0 +1,79 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from fastapi import HTTPException
+from starlette.requests import Request
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import sensor_health
+from database import Base
+from models import Bin, FillHistory
+from binary_ingest import encode_frame, ingest_frame, FrameError, RECORD_DTYPE, FLAG_IDEMPOTENT, MAX_FRAME_BYTES
+from routes.readings import ingest_readings, create_readings_binary
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # Sensor state is keyed by bins.id, which every test database reuses.
+    monkeypatch.setattr(sensor_health, "monitor", sensor_health.SensorMonitor())
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Bin(bin_id="b1", latitude=17.4, longitude=78.5, capacity_litres=100))
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def test_late_reading_does_not_roll_back_bin(db):
+    now = datetime.now(timezone.utc)
+    ingest_readings(db, [("b1", now - timedelta(minutes=10), 40)])
+    result = ingest_readings(db, [("b1", now - timedelta(hours=2), 10)])
+
+    assert result["accepted"] == 1
+    assert db.query(Bin).one().current_fill_pct == 40
+
+
+def test_readings_outside_window_are_rejected(db):
+    now = datetime.now(timezone.utc)
+    result = ingest_readings(db, [
+        ("b1", now - timedelta(days=30), 50),
+        ("b1", now + timedelta(days=1), 60),
+        ("b1", now, 30),
+    ])
+
+    assert result["out_of_window"] == 2 and result["rejected"] == 2
+    assert [f for (f,) in db.query(FillHistory.fill_pct).all()] == [30]
+
+
+def test_binary_frame_requires_batch_key(db):
+    bin_index = db.query(Bin.id).scalar()
+    records = np.array([(bin_index, int(datetime.now(timezone.utc).timestamp()), 25)], dtype=RECORD_DTYPE)
+
+    with pytest.raises(FrameError):
+        ingest_frame(encode_frame(records, gateway_id=1, seq=7), db)
+
+    frame = encode_frame(records, gateway_id=1, seq=7, flags=FLAG_IDEMPOTENT)
+    assert ingest_frame(frame, db)["accepted"] == 1
+    assert ingest_frame(frame, db)["duplicate"] is True
+
+
+def test_oversized_binary_body_is_refused_before_reading(db):
+    async def receive():
+        raise AssertionError("body read despite Content-Length")
+
+    scope = {"type": "http", "method": "POST", "path": "/readings/binary",
+             "headers": [(b"content-length", str(MAX_FRAME_BYTES + 1).encode())]}
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(create_readings_binary(Request(scope, receive), db))
+    assert e.value.status_code == 413
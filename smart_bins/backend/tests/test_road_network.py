@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from road_network import RoadNetwork, build_graph
+
+
+def wide_grid(size: int = 25, lat0: float = 5.0, lat1: float = 70.0, lon0: float = 0.0, lon1: float = 60.0):
+    """A jittered street grid spanning most of a hemisphere, where a flat
+    projection at one latitude is furthest off."""
+    rng = random.Random(1)
+    coords = {}
+    for i in range(size):
+        for j in range(size):
+            coords[i * size + j] = (lat0 + (lat1 - lat0) * (i + rng.uniform(-0.3, 0.3)) / (size - 1),
+                                    lon0 + (lon1 - lon0) * (j + rng.uniform(-0.3, 0.3)) / (size - 1))
+    ways = []
+    for i in range(size):
+        ways.append(([i * size + j for j in range(size)], 130 if i % 6 == 0 else 50, 0))
+        ways.append(([j * size + i for j in range(size)], 130 if i % 6 == 3 else 50, 1 if i % 4 == 1 else 0))
+    for i in range(size - 1):
+        for j in range(size - 1):
+            if rng.random() < 0.3:
+                ways.append(([i * size + j, (i + 1) * size + j + 1], 90, 0))
+    return build_graph(coords, ways)
+
+
+def test_astar_legs_match_dijkstra_on_a_wide_extract():
+    network = RoadNetwork(None)
+    network._install(wide_grid())
+    n = len(network._graph["lat"])
+    rng = random.Random(2)
+    for _ in range(200):
+        a, b = rng.randrange(n), rng.randrange(n)
+        seconds, _, path = network._leg(a, b)
+        expected = network._one_to_many(a, {b}).get(b)
+        assert seconds == pytest.approx(expected, rel=1e-6)
+        assert path[0] == a and path[-1] == b
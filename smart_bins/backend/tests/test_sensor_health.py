@@ -0,0 +1,22 @@
+from sensor_health import SensorMonitor, STUCK, STUCK_HOURS
+
+
+def test_stuck_sensor_stays_quarantined_until_it_moves():
+    monitor = SensorMonitor(1)
+    baseline = None
+    flags = []
+    # fills 1% an hour up to 40%, then the sensor freezes there for four days
+    for hour in range(40 + 96):
+        fill = min(hour, 40)
+        flag = monitor.check(0, 1_700_000_000 + hour * 3600, fill, baseline)
+        flags.append(flag)
+        if not flag:
+            baseline = fill
+
+    frozen = flags[40:]
+    assert not any(frozen[:int(STUCK_HOURS)])
+    assert all(f == STUCK for f in frozen[int(STUCK_HOURS) + 1:])
+
+    # the level moves again: accepted, and the stuck timer restarts
+    assert monitor.check(0, 1_700_000_000 + 136 * 3600, 41, baseline) == 0
+    assert monitor.check(0, 1_700_000_000 + 137 * 3600, 41, 41) == 0
@@ -0,0 +1,74 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import Response
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from models import Bin, Alert, Task, User
+from routes.tasks import list_all_tasks, worker_tasks
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id=1, username="worker", password="x", role="worker"))
+    session.commit()
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    session.statements = statements
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def add_tasks(db, n: int):
+    start = db.query(Task).count()
+    for i in range(start, start + n):
+        db.add(Bin(bin_id=f"bin{i}", latitude=0.0, longitude=0.0))
+        db.add(Alert(id=i + 1, bin_id=f"bin{i}"))
+        db.add(Task(id=i + 1, alert_id=i + 1, worker_id=1))
+    db.commit()
+    db.expunge_all()
+
+
+def count_queries(db, list_tasks) -> int:
+    db.expunge_all()
+    db.statements.clear()
+    tasks = list_tasks()
+    # what TaskOut serialization touches
+    for task in tasks:
+        task.alert.bin_id
+    return len(db.statements)
+
+
+def admin_list(db, limit=None):
+    return lambda: list_all_tasks(Response(), status=None, created_from=None, created_to=None,
+                                  after_id=None, limit=limit, db=db, zone=None)
+
+
+def worker_list(db, limit=None):
+    worker = db.get(User, 1)
+    return lambda: worker_tasks(Response(), status=None, created_from=None, created_to=None,
+                                after_id=None, limit=limit, user=worker, db=db)
+
+
+@pytest.mark.parametrize("listing", [admin_list, worker_list])
+def test_task_listing_query_count_is_constant(db, listing):
+    add_tasks(db, 5)
+    small = count_queries(db, listing(db))
+    add_tasks(db, 45)
+    assert count_queries(db, listing(db)) == small == 1
+
+
+@pytest.mark.parametrize("listing", [admin_list, worker_list])
+def test_task_page_query_count_is_constant(db, listing):
+    add_tasks(db, 50)
+    assert count_queries(db, listing(db, limit=10)) == count_queries(db, listing(db, limit=40)) == 1
@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+
+import auth
+from zones import zone_scope
+
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setattr(auth, "SECRET_KEY", "test-secret")
+
+
+def bearer(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def test_access_token_scopes_to_its_zone():
+    token = auth.create_token({"user_id": 1, "role": "worker", "zone": "north"})
+
+    assert zone_scope(None, bearer(token)) == "north"
+    with pytest.raises(HTTPException) as e:
+        zone_scope("south", bearer(token))
+    assert e.value.status_code == 403
+
+
+def test_tokens_that_do_not_authenticate_are_not_scoped():
+    refresh = auth.create_token({"user_id": 1, "zone": "north"}, "refresh")
+    untyped = jwt.encode({"user_id": 1, "zone": "north"}, "test-secret", algorithm=auth.ALGORITHM)
+
+    for token in (refresh, untyped):
+        with pytest.raises(HTTPException):
+            auth.decode_access_token(token)
+        assert zone_scope("south", bearer(token)) == "south"
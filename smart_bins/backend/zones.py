@@ -0,0 +1,101 @@
+from fastapi import Depends, HTTPException, Query
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import text
+
+from auth import decode_access_token
+from models import DEFAULT_ZONE, ZONE_PATTERN
+
+HISTORY_INDEXES = {
+    "ix_fill_history_id": "id",
+    "ix_fill_history_bin_id": "bin_id",
+    "ix_fill_history_zone_ts": "zone, ts",
+}
+
+optional_bearer = HTTPBearer(auto_error=False)
+
+
+def zone_scope(zone: str | None = Query(None, pattern=ZONE_PATTERN.pattern),
+               credentials: HTTPAuthorizationCredentials | None = Depends(optional_bearer)) -> str | None:
+    """The zone a request is limited to, or None for the whole fleet.
+
+    Users bound to a zone are always limited to it; everyone else may
+    narrow a query with ?zone=. The zone comes from the access token, which
+    get_current_user accepts under the same rules, so scoping costs no
+    database session; a user moved to another zone gets it with their next
+    token refresh.
+    """
+    if credentials is not None:
+        try:
+            user_zone = decode_access_token(credentials.credentials).get("zone")
+        except HTTPException:
+            user_zone = None
+        if user_zone:
+            if zone and zone != user_zone:
+                raise HTTPException(status_code=403, detail="Not allowed to access this zone")
+            return user_zone
+    return zone
+
+
+def scoped(query, column, zone: str | None):
+    return query if zone is None else query.filter(column == zone)
+
+
+def target_zone(requested: str | None, scope: str | None) -> str:
+    """The zone a new or edited record goes in, refusing zones outside the caller's scope."""
+    if scope is not None and requested is not None and requested != scope:
+        raise HTTPException(status_code=403, detail="Not allowed to access this zone")
+    return requested or scope or DEFAULT_ZONE
+
+
+def partition_name(zone: str) -> str:
+    if not ZONE_PATTERN.match(zone):
+        raise ValueError(f"invalid zone {zone!r}")
+    return f"fill_history_z_{zone}"
+
+
+def partition_history(bind) -> list[str]:
+    """Turn fill_history into a LIST partitioned table with one partition per zone (Postgres).
+
+    The first run swaps the plain table for a partitioned copy with a
+    DEFAULT partition; every run then splits zones that only have rows in
+    the default partition out into their own. Returns the zones created.
+    """
+    if bind.dialect.name != "postgresql":
+        raise RuntimeError("fill_history partitioning needs PostgreSQL")
+
+    created = []
+    with bind.begin() as conn:
+        kind = conn.execute(text("SELECT relkind FROM pg_class WHERE relname = 'fill_history'")).scalar()
+        if kind != "p":
+            conn.execute(text("ALTER TABLE fill_history RENAME TO fill_history_unpartitioned"))
+            conn.execute(text(
+                "ALTER TABLE fill_history_unpartitioned RENAME CONSTRAINT fill_history_pkey TO fill_history_unpartitioned_pkey"
+            ))
+            conn.execute(text("""
+                CREATE TABLE fill_history (
+                    LIKE fill_history_unpartitioned INCLUDING DEFAULTS,
+                    PRIMARY KEY (zone, id)
+                ) PARTITION BY LIST (zone)
+            """))
+            conn.execute(text("ALTER SEQUENCE fill_history_id_seq OWNED BY fill_history.id"))
+            conn.execute(text("CREATE TABLE fill_history_z_default_part PARTITION OF fill_history DEFAULT"))
+            conn.execute(text("INSERT INTO fill_history SELECT * FROM fill_history_unpartitioned"))
+            conn.execute(text("DROP TABLE fill_history_unpartitioned"))
+            for name, columns in HISTORY_INDEXES.items():
+                conn.execute(text(f"CREATE INDEX {name} ON fill_history ({columns})"))
+
+        existing = {r for (r,) in conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'fill_history'"
+        ))}
+        zones = {z for (z,) in conn.execute(text("SELECT DISTINCT zone FROM bins"))} | {DEFAULT_ZONE}
+        for zone in sorted(zones):
+            name = partition_name(zone)
+            if name in existing:
+                continue
+            conn.execute(text(f"CREATE TABLE {name} (LIKE fill_history INCLUDING DEFAULTS)"))
+            conn.execute(text(f"INSERT INTO {name} SELECT * FROM fill_history_z_default_part WHERE zone = :z"), {"z": zone})
+            conn.execute(text("DELETE FROM fill_history_z_default_part WHERE zone = :z"), {"z": zone})
+            conn.execute(text(f"ALTER TABLE fill_history ATTACH PARTITION {name} FOR VALUES IN ('{zone}')"))
+            created.append(zone)
+    return created
@@ -13,17 +13,19 @@ export function AuthProvider({ children }) {
     else localStorage.removeItem("role");
   }, [token, role]);
 
-const login = ({ token, role }) => {
+const login = ({ token, role, refreshToken }) => {
   const formattedToken = token?.startsWith("Bearer ")
     ? token
     : `Bearer ${token}`;
 
+  if (refreshToken) localStorage.setItem("refresh_token", refreshToken);
   setToken(formattedToken);
   setRole(role);
 };
 
 
   const logout = () => {
+    localStorage.removeItem("refresh_token");
     setToken("");
     setRole("");
   };
@@ -23,7 +23,7 @@ export default function AdminLogin() {
       if (!role) {
        throw new Error("No role returned from server");
       }
-      login({ token, role: role || "admin" });
+      login({ token, role: role || "admin", refreshToken: data.refresh_token });
 
       if ((role || "admin") === "admin") navigate("/admin/dashboard");
       else if ((role || "").toLowerCase() === "worker") navigate("/worker/dashboard");
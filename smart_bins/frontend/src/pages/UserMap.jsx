@@ -144,23 +144,14 @@ export default function UserMap() {
 
     async function fetchRoute() {
       if (closestBin) {
-        const userCoords = `${userLocation[1]},${userLocation[0]}`;
-        const binCoords = `${Number(closestBin.longitude)},${Number(closestBin.latitude)}`;
-        const url = `https://router.project-osrm.org/route/v1/driving/${userCoords};${binCoords}?overview=full&geometries=geojson`;
+        const binCoords = [Number(closestBin.latitude), Number(closestBin.longitude)];
 
         try {
-          const res = await fetch(url);
-          const data = await res.json();
-          if (data.routes?.[0]?.geometry?.coordinates) {
-            const coords = data.routes[0].geometry.coordinates.map((c) => [c[1], c[0]]);
-            setRoute(coords);
-          } else {
-            console.warn("No route found from OSRM.");
-            setRoute([]);
-          }
+          const data = await API.post("/routing/route", { points: [userLocation, binCoords] });
+          setRoute(data.geometry);
         } catch (e) {
-          console.error("Error fetching route from OSRM:", e);
-          setRoute([]);
+          console.warn("Road routing unavailable, drawing a straight line:", e.message);
+          setRoute([userLocation, binCoords]);
         }
       } else {
         setRoute([]); 
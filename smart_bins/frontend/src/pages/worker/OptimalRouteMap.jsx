@@ -47,23 +47,14 @@ export default function OptimalRouteMap() {
 
     let ordered = nearestOrder(workerPos, bins);
 
-    let routePoints = [];
-
     async function fetchRoute() {
-      for (let i = 0; i < ordered.length - 1; i++) {
-        const a = ordered[i];
-        const b = ordered[i + 1];
-
-        const url = `https://router.project-osrm.org/route/v1/driving/${a[1]},${a[0]};${b[1]},${b[0]}?overview=full&geometries=geojson`;
-
-        const res = await fetch(url);
-        const data = await res.json();
-        if (data.routes?.[0]?.geometry?.coordinates) {
-          const coords = data.routes[0].geometry.coordinates.map(c => [c[1], c[0]]);
-          routePoints.push(...coords);
-        }
+      try {
+        const data = await API.post("/routing/route", { points: ordered });
+        setRoute(data.geometry);
+      } catch (e) {
+        console.warn("Road routing unavailable, drawing straight lines:", e.message);
+        setRoute(ordered);
       }
-      setRoute(routePoints);
     }
 
     fetchRoute();
@@ -1,6 +1,23 @@
 const API_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
 
-async function request(path, options = {}) {
+let refreshing = null;
+
+async function refreshAccessToken() {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (!refreshToken) return false;
+  const res = await fetch(`${API_URL}/auth/refresh`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ refresh_token: refreshToken }),
+  });
+  if (!res.ok) return false;
+  const body = await res.json();
+  localStorage.setItem("token", `Bearer ${body.token}`);
+  localStorage.setItem("refresh_token", body.refresh_token);
+  return true;
+}
+
+async function request(path, options = {}, retried = false) {
   const headers = options.headers || {};
   const token = localStorage.getItem("token");
   if (token) headers["Authorization"] = token;
@@ -11,6 +28,11 @@ async function request(path, options = {}) {
     headers,
   });
 
+  if (res.status === 401 && !retried && !path.startsWith("/auth/")) {
+    refreshing = refreshing || refreshAccessToken().finally(() => { refreshing = null; });
+    if (await refreshing) return request(path, options, true);
+  }
+
   const contentType = res.headers.get("content-type") || "";
   let body = null;
   if (contentType.includes("application/json")) {